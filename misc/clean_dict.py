@@ -14,6 +14,8 @@ import sys
 import os
 import re
 
+import dbParse
+
 
 def is_valid_key(key):
     """
@@ -71,79 +73,31 @@ def clean_dict_file(yaml_file):
     print('正在整理词库文件...')
     print('=' * 60)
     
-    # 读取并处理文件
-    # key -> dict of word -> freq_str or None
-    key_to_words = {}
-    total_lines = 0
-    processed_lines = 0
-    skipped_lines = 0
+    # 读取并处理文件（多进程解析，相同编码合并、去重，重复的词保留较大的频率）
+    parsed, parse_stats = dbParse.dbParseMerged(yaml_file)
+    total_lines = parse_stats['lines']
+    processed_lines = parse_stats['parsedLines']
+    duplicate_words = parse_stats['duplicateWords']
     invalid_keys = 0
     invalid_words = 0
-    duplicate_words = 0
     
-    with open(yaml_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            total_lines += 1
-            original_line = line.rstrip('\n').strip()
-            
-            # 跳过空行和注释
-            if not original_line or original_line.startswith('#'):
-                continue
-            
-            # 处理转义空格
-            line_tmp = original_line.replace('\\ ', '_ZFVimIM_space_')
-            parts = line_tmp.split()
-            words = parts[1:]
-            
-            if len(parts) < 2:
-                skipped_lines += 1
-                continue
-            
-            key = parts[0].strip()
-            processed_lines += 1
-            
-            # 检查编码是否规范
-            if not is_valid_key(key):
-                invalid_keys += 1
-                skipped_lines += 1
+    # key -> dict of word -> freq_str or None
+    key_to_words = {}
+    for key, words in parsed:
+        # 检查编码是否规范
+        if not is_valid_key(key):
+            invalid_keys += 1
+            continue
+        
+        words_map = {}
+        for word, freq_str in words:
+            # 检查词是否规范
+            if not is_valid_word(word):
+                invalid_words += 1
                 continue
-            
-            # 初始化编码对应的词集合
-            if key not in key_to_words:
-                key_to_words[key] = {}
-            
-            # 处理词
-            for word_part in words:
-                word_part = word_part.strip()
-                if not word_part:
-                    continue
-                if ':' in word_part:
-                    word_raw, freq_str = word_part.rsplit(':', 1)
-                else:
-                    word_raw, freq_str = word_part, None
-                word = word_raw.replace('_ZFVimIM_space_', ' ')
-                
-                # 检查词是否规范
-                if not is_valid_word(word):
-                    invalid_words += 1
-                    continue
-                
-                # 去重：如果词已存在，跳过
-                if word in key_to_words[key]:
-                    duplicate_words += 1
-                    existing_freq = key_to_words[key][word]
-                    if freq_str is not None:
-                        if existing_freq is None:
-                            key_to_words[key][word] = freq_str
-                        else:
-                            try:
-                                if int(freq_str) > int(existing_freq):
-                                    key_to_words[key][word] = freq_str
-                            except ValueError:
-                                pass
-                    continue
-                
-                key_to_words[key][word] = freq_str
+            words_map[word] = freq_str
+        key_to_words[key] = words_map
+    skipped_lines = invalid_keys
     
     print(f'读取完成: 总行数 {total_lines}, 处理行数 {processed_lines}')
     print(f'跳过行数: {skipped_lines}')
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+词库工具的整体性能测试：用 dbGen.py 生成不同规模的词库，依次运行各个工具，
+记录每个工具的耗时（包括启动 python）和内存峰值（RSS），结果写入 JSON 文件，
+并与之前保存的基准结果比较，变慢或内存增加超过阈值时退出码为 1
+
+工具（按顺序运行，后面的工具使用 import 生成的数据库）:
+    import   import_txt_to_db.py  从词库文件导入数据库
+    sync     sync_txt_to_db.py    同步另一个词库文件（规模为 1/10，大部分是新词）
+    load     dbLoad.py            导出 Vim 使用的缓存文件
+    save     dbSave.py            应用 100 条修改后保存词库文件
+    export   db_export_to_txt.py  从数据库导出词库文件
+    cleanup  dbCleanup.py         整理词库文件
+
+用法:
+    python3 dbBench.py [选项]
+
+选项:
+    --rows 10000,100000     词库的行数（编码-词对数），默认 10000,100000,1000000
+    --tools import,load     只测试这些工具，默认全部
+    --repeat N              每个规模运行 N 次，取最短耗时和最大内存，默认 1
+    --out FILE              结果文件，默认 dbBench_result.json
+    --baseline FILE         基准结果文件，存在时与之比较
+    --update-baseline       把这次的结果保存为基准（需要 --baseline）
+    --threshold 1.2         耗时或内存超过基准的多少倍算作变慢，默认 1.2
+    --data-dir DIR          生成的词库文件保存在这里，下次直接使用，默认每次重新生成
+
+示例:
+    python3 dbBench.py --rows 100000 --baseline bench_baseline.json --update-baseline
+    python3 dbBench.py --rows 100000 --repeat 3 --baseline bench_baseline.json
+"""
+
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import dbFunc
+import dbGen
+
+
+DEFAULT_ROWS = [10000, 100000, 1000000]
+DB_BENCH_TOOL_LIST = ['import', 'sync', 'load', 'save', 'export', 'cleanup']
+# tools that need the db created by import
+DB_BENCH_NEED_DB = {'sync', 'load', 'save', 'export'}
+DB_BENCH_EDIT_COUNT = 100
+DB_BENCH_THRESHOLD = 1.2
+# differences smaller than these are taken as noise
+DB_BENCH_NOISE_SECONDS = 0.1
+DB_BENCH_NOISE_RSS_KB = 8 * 1024
+DB_BENCH_RESULT_VERSION = 1
+
+
+def scriptPath(name):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+
+
+# return {'seconds', 'maxRssKB', 'exitCode'},
+# maxRssKB is None if not supported (wait4 is not available on Windows)
+def runTool(args, logFile):
+    with io.open(logFile, 'ab') as log:
+        startTime = time.perf_counter()
+        process = subprocess.Popen([sys.executable] + args, stdout=log, stderr=log)
+        if hasattr(os, 'wait4'):
+            _, status, rusage = os.wait4(process.pid, 0)
+            seconds = time.perf_counter() - startTime
+            # Popen must not wait for it again
+            process.returncode = os.waitstatus_to_exitcode(status)
+            # kilobytes on linux, bytes on macOS
+            maxRssKB = rusage.ru_maxrss // 1024 if sys.platform == 'darwin' else rusage.ru_maxrss
+        else:
+            process.wait()
+            seconds = time.perf_counter() - startTime
+            maxRssKB = None
+    return {
+        'seconds' : round(seconds, 4),
+        'maxRssKB' : maxRssKB,
+        'exitCode' : process.returncode,
+    }
+
+
+# generated files are kept in dataDir if any
+def prepareInput(rows, dataDir, workDir):
+    srcDir = dataDir if dataDir else workDir
+    txtFile = os.path.join(srcDir, f'dbBench_{rows}.yaml')
+    syncFile = os.path.join(srcDir, f'dbBench_{rows}_sync.yaml')
+    if not os.path.isfile(txtFile):
+        dbGen.dbGenTxt(rows, txtFile)
+    if not os.path.isfile(syncFile):
+        dbGen.dbGenTxt(max(1, rows // 10), syncFile, seed=rows + 1)
+    # import and cleanup rewrite the file, always work on copies
+    shutil.copyfile(txtFile, os.path.join(workDir, 'sbzr.yaml'))
+    shutil.copyfile(txtFile, os.path.join(workDir, 'cleanup.yaml'))
+    shutil.copyfile(syncFile, os.path.join(workDir, 'sync.yaml'))
+
+    # add words to existing keys, and words of new keys
+    editLines = []
+    for key, wordList in dbGen.dbGenRows(DB_BENCH_EDIT_COUNT, seed=rows + 2):
+        editLines.append(f'add {key} {wordList[0][0]}')
+    with io.open(os.path.join(workDir, 'edit.txt'), 'w', encoding='utf-8') as file:
+        file.write('\n'.join(editLines) + '\n')
+
+
+def toolArgs(tool, workDir):
+    f = lambda name: os.path.join(workDir, name)
+    if tool == 'import':
+        return [scriptPath('import_txt_to_db.py'), f('sbzr.yaml'), f('sbzr.db')]
+    elif tool == 'sync':
+        return [scriptPath('sync_txt_to_db.py'), f('sync.yaml'), f('sbzr.db')]
+    elif tool == 'load':
+        return [scriptPath('dbLoad.py'), f('sbzr.db'), '', f('cache/dbLoadCache')]
+    elif tool == 'save':
+        # dbSave.py loads sbzr.db next to sbzr.yaml
+        return [scriptPath('dbSave.py'), f('sbzr.yaml'), '', f('edit.txt'), f('cache')]
+    elif tool == 'export':
+        return [scriptPath('db_export_to_txt.py'), f('sbzr.db'), f('export.yaml')]
+    elif tool == 'cleanup':
+        return [scriptPath('dbCleanup.py'), f('cleanup.yaml'), f('cache')]
+    raise ValueError('unknown tool: ' + tool)
+
+
+# return {tool : {'seconds', 'maxRssKB', 'exitCode'}}
+def benchRows(rows, tools, dataDir):
+    workDir = tempfile.mkdtemp(prefix='dbBench')
+    try:
+        os.makedirs(os.path.join(workDir, 'cache'))
+        prepareInput(rows, dataDir, workDir)
+        logFile = os.path.join(workDir, 'log.txt')
+        result = {}
+        needDb = any(tool in DB_BENCH_NEED_DB for tool in tools)
+        for tool in DB_BENCH_TOOL_LIST:
+            if tool not in tools and not (tool == 'import' and needDb):
+                continue
+            toolResult = runTool(toolArgs(tool, workDir), logFile)
+            if toolResult['exitCode'] != 0:
+                with io.open(logFile, 'r', encoding='utf-8', errors='replace') as file:
+                    print(f'{tool} failed ({rows} rows):\n' + file.read()[-2000:], file=sys.stderr)
+            if tool in tools:
+                result[tool] = toolResult
+        return result
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+
+
+def mergeRepeat(result, toolResult):
+    if result is None:
+        return dict(toolResult)
+    result['seconds'] = min(result['seconds'], toolResult['seconds'])
+    if toolResult['maxRssKB'] is not None:
+        result['maxRssKB'] = max(result['maxRssKB'] or 0, toolResult['maxRssKB'])
+    if toolResult['exitCode'] != 0:
+        result['exitCode'] = toolResult['exitCode']
+    return result
+
+
+# return (ratio, regressed), ratio is None if not comparable
+def compareValue(value, baseValue, threshold, noise):
+    if value is None or baseValue is None or baseValue <= 0:
+        return (None, False)
+    ratio = value / baseValue
+    return (ratio, ratio > threshold and value - baseValue > noise)
+
+
+def formatValue(value, width, precision):
+    if value is None:
+        return '-'.rjust(width)
+    return f'{value:{width}.{precision}f}'
+
+
+# print table, return number of regressions
+def compareBaseline(results, baseline, threshold):
+    regressionCount = 0
+    print(f'{"rows":>10} {"tool":<8} {"seconds":>9} {"base":>9} {"ratio":>6} {"rss MB":>8} {"base":>8} {"ratio":>6}')
+    for rows, toolMap in results['results'].items():
+        baseToolMap = baseline.get('results', {}).get(rows, {})
+        for tool, toolResult in toolMap.items():
+            base = baseToolMap.get(tool, {})
+            seconds = toolResult['seconds']
+            rssMB = toolResult['maxRssKB'] / 1024.0 if toolResult['maxRssKB'] is not None else None
+            baseSeconds = base.get('seconds', None)
+            baseRssMB = base['maxRssKB'] / 1024.0 if base.get('maxRssKB', None) is not None else None
+            timeRatio, timeRegressed = compareValue(seconds, baseSeconds, threshold, DB_BENCH_NOISE_SECONDS)
+            rssRatio, rssRegressed = compareValue(rssMB, baseRssMB, threshold, DB_BENCH_NOISE_RSS_KB / 1024.0)
+            mark = ''
+            if toolResult['exitCode'] != 0:
+                mark = '  FAILED'
+            elif timeRegressed or rssRegressed:
+                mark = '  SLOWER' if timeRegressed else '  MORE MEMORY'
+            if mark:
+                regressionCount += 1
+            print(f'{rows:>10} {tool:<8} {formatValue(seconds, 9, 3)} {formatValue(baseSeconds, 9, 3)} {formatValue(timeRatio, 6, 2)}'
+                    f' {formatValue(rssMB, 8, 1)} {formatValue(baseRssMB, 8, 1)} {formatValue(rssRatio, 6, 2)}{mark}')
+    return regressionCount
+
+
+def parseArgs(argv):
+    options = {
+        'rows' : DEFAULT_ROWS,
+        'tools' : list(DB_BENCH_TOOL_LIST),
+        'repeat' : 1,
+        'out' : 'dbBench_result.json',
+        'baseline' : None,
+        'updateBaseline' : False,
+        'threshold' : DB_BENCH_THRESHOLD,
+        'dataDir' : None,
+    }
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        value = argv[i + 1] if i + 1 < len(argv) else None
+        if arg == '--update-baseline':
+            options['updateBaseline'] = True
+            i += 1
+            continue
+        if value is None:
+            raise ValueError('missing value of ' + arg)
+        if arg == '--rows':
+            options['rows'] = [int(x) for x in value.split(',') if x]
+        elif arg == '--tools':
+            options['tools'] = [x for x in value.split(',') if x]
+            for tool in options['tools']:
+                if tool not in DB_BENCH_TOOL_LIST:
+                    raise ValueError('unknown tool: ' + tool)
+        elif arg == '--repeat':
+            options['repeat'] = max(1, int(value))
+        elif arg == '--out':
+            options['out'] = value
+        elif arg == '--baseline':
+            options['baseline'] = value
+        elif arg == '--threshold':
+            options['threshold'] = float(value)
+        elif arg == '--data-dir':
+            options['dataDir'] = value
+        else:
+            raise ValueError('unknown option: ' + arg)
+        i += 2
+    if options['updateBaseline'] and not options['baseline']:
+        raise ValueError('--update-baseline needs --baseline')
+    return options
+
+
+def main():
+    try:
+        options = parseArgs(sys.argv[1:])
+    except ValueError as e:
+        print(f'错误: {e}')
+        print(__doc__)
+        sys.exit(1)
+    if options['dataDir'] and not os.path.isdir(options['dataDir']):
+        os.makedirs(options['dataDir'])
+
+    results = {
+        'version' : DB_BENCH_RESULT_VERSION,
+        'meta' : {
+            'time' : datetime.datetime.now().isoformat(timespec='seconds'),
+            'python' : platform.python_version(),
+            'sqlite' : sqlite3.sqlite_version,
+            'platform' : platform.platform(),
+            'cpuCount' : os.cpu_count(),
+        },
+        'results' : {},
+    }
+    failed = False
+    for rows in options['rows']:
+        toolMap = {}
+        for _ in range(options['repeat']):
+            for tool, toolResult in dbFunc.dbMapIter(benchRows(rows, options['tools'], options['dataDir'])):
+                toolMap[tool] = mergeRepeat(toolMap.get(tool, None), toolResult)
+        for tool in options['tools']:
+            toolResult = toolMap.get(tool, None)
+            if toolResult is None:
+                continue
+            failed = failed or toolResult['exitCode'] != 0
+            rssMB = toolResult['maxRssKB'] / 1024.0 if toolResult['maxRssKB'] is not None else None
+            print(f'{rows:>10} rows {tool:<8} {toolResult["seconds"]:8.3f} s {formatValue(rssMB, 8, 1)} MB'
+                    + ('' if toolResult['exitCode'] == 0 else f'  exit {toolResult["exitCode"]}'))
+        # json keys are strings
+        results['results'][str(rows)] = toolMap
+
+    with io.open(options['out'], 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+        file.write('\n')
+
+    regressionCount = 0
+    baselineFile = options['baseline']
+    if baselineFile and os.path.isfile(baselineFile):
+        with io.open(baselineFile, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        print(f'\ncompared with {baselineFile} ({baseline.get("meta", {}).get("time", "")}), threshold {options["threshold"]}:')
+        regressionCount = compareBaseline(results, baseline, options['threshold'])
+    if options['updateBaseline']:
+        shutil.copyfile(options['out'], baselineFile)
+        print(f'baseline saved to {baselineFile}')
+    elif regressionCount > 0:
+        print(f'{regressionCount} regression(s)')
+        sys.exit(1)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
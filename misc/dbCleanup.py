@@ -16,6 +16,8 @@ import re
 import shutil
 import sys
 
+import dbParse
+
 def isValidKey(key):
     """检查编码是否有效"""
     if not key or not key.strip():
@@ -49,7 +51,6 @@ def normalizeWord(word):
 
 def loadDictionary(dbFile):
     """加载词库文件（TXT 格式：key word1 word2 ...）"""
-    entries_dict = {}  # 使用字典来合并相同编码的条目
     invalid_count = 0
     
     # 检查文件扩展名
@@ -58,74 +59,44 @@ def loadDictionary(dbFile):
         return None
     
     try:
-        with io.open(dbFile, 'r', encoding='utf-8', errors='replace') as f:
-            for line_num, line in enumerate(f, 1):
-                line = line.rstrip('\n').strip()
-                # 跳过空行和注释
-                if not line or line.startswith('#'):
-                    continue
-                
-                # 处理转义空格
-                if '\\ ' in line:
-                    parts = line.replace('\\ ', '_ZFVimIM_space_').split()
-                    if len(parts) > 0:
-                        key = parts[0]
-                        words = [w.replace('_ZFVimIM_space_', ' ') for w in parts[1:]]
-                    else:
-                        invalid_count += 1
-                        continue
-                else:
-                    parts = line.split()
-                    if len(parts) > 0:
-                        key = parts[0]
-                        words = parts[1:]
-                    else:
-                        invalid_count += 1
-                        continue
-                
-                # 验证编码
-                if not isValidKey(key):
-                    invalid_count += 1
-                    continue
-                
-                # 规范化编码（去除首尾空格，转小写）
-                key = key.strip().lower()
-                
-                # 过滤和规范化词
-                valid_words = []
-                for word in words:
-                    word = normalizeWord(word)
-                    if isValidWord(word):
-                        # 去重（在同一行内）
-                        if word not in valid_words:
-                            valid_words.append(word)
-                
-                # 如果有效词列表为空，跳过这个条目
-                if len(valid_words) == 0:
-                    invalid_count += 1
-                    continue
-                
-                # 合并相同编码的条目，去重
-                if key in entries_dict:
-                    # 合并词列表并去重
-                    existing_words = entries_dict[key]['words']
-                    for word in valid_words:
-                        if word not in existing_words:
-                            existing_words.append(word)
-                else:
-                    entries_dict[key] = {
-                        'key': key,
-                        'words': valid_words
-                    }
+        # 多进程解析，相同编码的条目合并、去重（词中的 :freq 不拆分）
+        parsed, stats = dbParse.dbParseMerged(dbFile, splitFrequency=False, errors='replace')
     except Exception as e:
         print("Error loading dictionary: " + str(e), file=sys.stderr)
         return None
     
+    entries = []
+    for key, words in parsed:
+        # 验证编码
+        if not isValidKey(key):
+            invalid_count += 1
+            continue
+        
+        # 规范化编码（去除首尾空格，转小写）
+        key = key.strip().lower()
+        
+        # 过滤和规范化词
+        valid_words = []
+        seen_words = set()
+        for word, freqStr in words:
+            word = normalizeWord(word)
+            if isValidWord(word) and word not in seen_words:
+                valid_words.append(word)
+                seen_words.add(word)
+        
+        # 如果有效词列表为空，跳过这个条目
+        if len(valid_words) == 0:
+            invalid_count += 1
+            continue
+        
+        entries.append({
+            'key': key,
+            'words': valid_words
+        })
+    
     if invalid_count > 0:
         print(f"Removed {invalid_count} invalid entries", file=sys.stderr)
     
-    # 转换为列表
-    entries = list(entries_dict.values())
     return entries
 
 def saveDictionary(entries, dbFile, cachePath):
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检查批量编辑（db_batch_edit.py，见 dbFunc.dbSqliteEditApply）：
+一批 add / remove / reorder 之后，再对刚新增的词 reorder，
+每条编辑的结果、words 表和加载后的顺序是否与逐条按规则计算的结果一致
+
+在临时目录中的数据库副本上检查，不修改 db_file，
+普通的 words 表和规范化的结构（见 db_migrate.py）各检查一次，
+每批编辑从数据库中随机生成，同样的 seed 总是生成同样的编辑，
+其中包括出错的编辑，出错的编辑应单独回滚，不影响其它编辑
+
+用法:
+    python3 dbEditCheck.py <db_file> [seed]
+
+示例:
+    python3 dbEditCheck.py ~/.config/nvim/sbzr.nvim.im.db/sbzr.db
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+import dbFunc
+import db_batch_edit
+
+
+# edits of the first batch
+CHECK_EDIT_COUNT = 200
+
+
+# {key : {word : frequency}}
+def readWords(dbFile):
+    conn = dbFunc.dbSqliteOpen(dbFile)
+    try:
+        wordMap = {}
+        for key, word, frequency in conn.execute('SELECT key, word, frequency FROM words'):
+            wordMap.setdefault(key, {})[word] = frequency or 0
+        return wordMap
+    finally:
+        conn.close()
+
+
+# random edits of existing and new words, and a few invalid ones
+def makeEdits(wordMap, rand):
+    keyList = sorted(wordMap.keys())
+    edits = []
+    for i in range(CHECK_EDIT_COUNT):
+        key = rand.choice(keyList)
+        word = rand.choice(sorted(wordMap[key].keys()))
+        action = rand.choice(['add', 'add new', 'remove', 'remove all', 'reorder', 'invalid'])
+        if action == 'add':
+            edits.append({'action' : 'add', 'key' : key, 'word' : word})
+        elif action == 'add new':
+            edits.append({'action' : 'add', 'key' : key + rand.choice('aeiou'), 'word' : word + word[0], 'frequency' : rand.randint(0, 9)})
+        elif action == 'remove':
+            edits.append({'action' : 'remove', 'key' : key, 'word' : word})
+        elif action == 'remove all':
+            edits.append({'action' : 'remove', 'word' : word})
+        elif action == 'reorder':
+            edits.append({'action' : 'reorder', 'key' : key, 'word' : word})
+        else:
+            edits.append(rand.choice([
+                {'action' : 'add', 'key' : key, 'word' : ''},
+                {'action' : 'rename', 'key' : key, 'word' : word},
+                {'action' : 'add', 'key' : key, 'word' : word, 'frequency' : 'x'},
+            ]))
+    return edits
+
+
+# apply edits to wordMap one by one, return results in the form of db_batch_edit.batch_edit
+def applyEdits(wordMap, edits):
+    results = []
+    for e in edits:
+        action = e.get('action', None)
+        key = e.get('key', None)
+        word = e.get('word', None)
+        if not word or (not key and action != 'remove'):
+            results.append({'error' : ''})
+        elif action == 'add':
+            try:
+                frequency = int(e.get('frequency', 0))
+            except ValueError:
+                results.append({'error' : ''})
+                continue
+            if word in wordMap.get(key, {}):
+                results.append({'result' : 0})
+            else:
+                wordMap.setdefault(key, {})[word] = frequency
+                results.append({'result' : 1})
+        elif action == 'remove':
+            count = 0
+            for k in ([key] if key else sorted(wordMap.keys())):
+                if word in wordMap.get(k, {}):
+                    del wordMap[k][word]
+                    count += 1
+                    if not wordMap[k]:
+                        del wordMap[k]
+            results.append({'result' : {word : count} if count > 0 else {}})
+        elif action == 'reorder':
+            if word not in wordMap.get(key, {}):
+                results.append({'result' : False})
+            else:
+                wordMap[key][word] = int(sum(f for w, f in wordMap[key].items() if w != word) / 2)
+                results.append({'result' : True})
+        else:
+            results.append({'error' : ''})
+    return results
+
+
+# return list of mismatch descriptions
+def compareResults(name, expected, actual):
+    mismatch = []
+    for i in range(max(len(expected), len(actual))):
+        e = expected[i] if i < len(expected) else None
+        a = actual[i] if i < len(actual) else None
+        # error messages are not compared
+        if e is None or a is None or ('error' in e) != ('error' in a) or ('error' not in e and e != a):
+            mismatch.append(f'{name} edit {i}: expected {e}, got {a}')
+    return mismatch
+
+
+def compareWords(name, dbFile, wordMap, keyList):
+    mismatch = []
+    actualMap = readWords(dbFile)
+    for key in sorted(set(actualMap.keys()) ^ set(wordMap.keys()))[:5]:
+        mismatch.append(f'{name}: key {key} expected {wordMap.get(key, None)}, got {actualMap.get(key, None)}')
+    for key in sorted(set(actualMap.keys()) & set(wordMap.keys())):
+        if actualMap[key] != wordMap[key]:
+            mismatch.append(f'{name}: key {key} expected {wordMap[key]}, got {actualMap[key]}')
+    # loaded in order of frequency, then word
+    loadMap = dict((dbItem.key, dbItem) for dbItem in dbFunc.dbLoadSqliteIter(dbFile, '', sorted(set(key[0] for key in keyList))))
+    for key in keyList:
+        if key not in wordMap or not key.isalpha() or not key.islower():
+            continue
+        expectedOrder = [w for w, f in sorted(wordMap[key].items(), key=lambda x: (-x[1], x[0]))]
+        actualOrder = loadMap[key].wordList if key in loadMap else None
+        if actualOrder != expectedOrder:
+            mismatch.append(f'{name}: load order of {key} expected {expectedOrder}, got {actualOrder}')
+    return mismatch
+
+
+def checkLayout(dbFile, rand):
+    wordMap = readWords(dbFile)
+    edits = makeEdits(wordMap, rand)
+    mismatch = compareResults('batch', applyEdits(wordMap, edits), db_batch_edit.batch_edit(dbFile, edits))
+    # then reorder the words just added
+    addedList = [(e['key'], e['word']) for e in edits
+            if e.get('action', None) == 'add' and e.get('word', None) and e.get('key', None) and 'frequency' in e]
+    reorderEdits = [{'action' : 'reorder', 'key' : key, 'word' : word} for key, word in addedList]
+    mismatch += compareResults('reorder', applyEdits(wordMap, reorderEdits), db_batch_edit.batch_edit(dbFile, reorderEdits))
+    keyList = sorted(set(e['key'] for e in edits + reorderEdits if e.get('key', None)))
+    mismatch += compareWords('words', dbFile, wordMap, keyList)
+    return mismatch
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    dbFile = sys.argv[1]
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    if not os.path.isfile(dbFile):
+        print(f'错误: 数据库文件不存在: {dbFile}', file=sys.stderr)
+        sys.exit(1)
+
+    failed = 0
+    tmpDir = tempfile.mkdtemp(prefix='dbEditCheck')
+    try:
+        for normalized in [False, True]:
+            name = 'normalized' if normalized else 'words table'
+            checkDbFile = os.path.join(tmpDir, 'check%d.db' % normalized)
+            shutil.copyfile(dbFile, checkDbFile)
+            conn = dbFunc.dbSqliteOpen(checkDbFile)
+            try:
+                if normalized:
+                    dbFunc.dbSqliteNormalize(conn)
+                else:
+                    dbFunc.dbSqliteDenormalize(conn)
+                    dbFunc.dbSqliteMigrate(conn)
+            finally:
+                conn.close()
+            mismatch = checkLayout(checkDbFile, random.Random(seed))
+            print(f'{name:<11}: {"ok" if not mismatch else str(len(mismatch)) + " mismatch"}')
+            for line in mismatch[:5]:
+                print(f'  {line}')
+            if mismatch:
+                failed += 1
+    finally:
+        shutil.rmtree(tmpDir)
+    sys.exit(0 if failed == 0 else 1)
+
+
+if __name__ == '__main__':
+    main()
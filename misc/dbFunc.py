@@ -1,9 +1,21 @@
+import heapq
 import io
+import itertools
+import json
+import math
 import os
+import random
 import re
 import shutil
 import sys
 import sqlite3
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # no file lock (windows), only one process should use a journal then
+    fcntl = None
 
 
 ZFVimIM_KEY_S_MAIN = '#'
@@ -30,7 +42,37 @@ def dbWordIndex(wordList, word):
         return -1
 
 
+# in-memory form of one db item,
+# the 'key#w1,w2#c1,c2' string form (see dbItemEncode)
+# is only used when talking with vim side
+class DbItem(object):
+    __slots__ = ('key', 'wordList', 'countList')
+
+    def __init__(self, key, wordList=None, countList=None):
+        self.key = key
+        self.wordList = wordList if wordList is not None else []
+        self.countList = countList if countList is not None else []
+
+    def __eq__(self, other):
+        return (isinstance(other, DbItem)
+                and self.key == other.key
+                and self.wordList == other.wordList
+                and self.countList == other.countList)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return 'DbItem(%r, %r, %r)' % (self.key, self.wordList, self.countList)
+
+
+# a word is moved before another one only if its count is greater
+# by more than the threshold, otherwise the original order is kept
 ZFVimIM_dbItemReorderThreshold = 1
+
+# the comparator used by the old cmp_to_key sort (and vim side),
+# not a valid total order because of the threshold,
+# only kept as reference for dbReorderCheck.py
 def dbItemReorderFunc(item1, item2):
     if (item2['count'] - item1['count']) - ZFVimIM_dbItemReorderThreshold > 0:
         return 1
@@ -38,187 +80,365 @@ def dbItemReorderFunc(item1, item2):
         return -1
     else:
         return 0
+
+# same result as sorting with dbItemReorderFunc by python's list.sort
+# for word lists shorter than 64 (the length python sorts by binary insertion only),
+# but without calling a comparator:
+# * the leading run already in order is found by one linear scan,
+#   which covers the whole list in the common case (e.g. items loaded from db),
+#   so that nothing is moved
+# * each remaining word is moved up by binary insertion into the sorted part,
+#   so a single count bump costs O(log n) comparisons
 def dbItemReorder(dbItem):
-    tmp = []
-    i = 0
-    iEnd = len(dbItem['wordList'])
-    while i < iEnd:
-        tmp.append({
-            'word' : dbItem['wordList'][i],
-            'count' : dbItem['countList'][i],
-        })
-        i += 1
-    if sys.version_info >= (3, 0):
-        import functools
-        tmp.sort(key = functools.cmp_to_key(dbItemReorderFunc))
+    countList = dbItem.countList
+    iEnd = len(countList)
+    if iEnd < 2:
+        return
+    threshold = ZFVimIM_dbItemReorderThreshold
+
+    runEnd = 1
+    if countList[1] - countList[0] > threshold:
+        # strictly descending run, reverse it
+        while runEnd + 1 < iEnd and countList[runEnd + 1] - countList[runEnd] > threshold:
+            runEnd += 1
+        runEnd += 1
+        wordList = dbItem.wordList
+        wordList[0:runEnd] = wordList[runEnd - 1::-1]
+        countList[0:runEnd] = countList[runEnd - 1::-1]
     else:
-        tmp.sort(cmp = dbItemReorderFunc)
-    dbItem['wordList'] = []
-    dbItem['countList'] = []
-    for item in tmp:
-        dbItem['wordList'].append(item['word'])
-        dbItem['countList'].append(item['count'])
+        while runEnd + 1 < iEnd and countList[runEnd + 1] - countList[runEnd] <= threshold:
+            runEnd += 1
+        runEnd += 1
+    if runEnd >= iEnd:
+        return
+
+    wordList = dbItem.wordList
+    for i in range(runEnd, iEnd):
+        count = countList[i]
+        lo = 0
+        hi = i
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if count - countList[mid] > threshold:
+                hi = mid
+            else:
+                lo = mid + 1
+        if lo < i:
+            countList.insert(lo, countList.pop(i))
+            wordList.insert(lo, wordList.pop(i))
 
 
 def dbItemDecode(dbItemEncoded):
     split = dbItemEncoded.split(ZFVimIM_KEY_S_MAIN)
     wordList = split[1].split(ZFVimIM_KEY_S_SUB)
     for i in range(len(wordList)):
-        wordList[i] = re.sub(ZFVimIM_KEY_SR_SUB, ZFVimIM_KEY_S_SUB,
-                re.sub(ZFVimIM_KEY_SR_MAIN, ZFVimIM_KEY_S_MAIN, wordList[i])
-            )
+        word = wordList[i]
+        if '_ZFVimIM_' in word:
+            wordList[i] = word.replace(ZFVimIM_KEY_SR_MAIN, ZFVimIM_KEY_S_MAIN).replace(ZFVimIM_KEY_SR_SUB, ZFVimIM_KEY_S_SUB)
     countList = []
     if len(split) >= 3:
         for cnt in split[2].split(ZFVimIM_KEY_S_SUB):
             countList.append(int(cnt))
     while len(countList) < len(wordList):
         countList.append(0)
-    return {
-        'key' : split[0],
-        'wordList' : wordList,
-        'countList' : countList,
-    }
+    return DbItem(split[0], wordList, countList)
 
 
 def dbItemEncode(dbItem):
-    dbItemEncoded = dbItem['key']
-    dbItemEncoded += ZFVimIM_KEY_S_MAIN
-    for i in range(len(dbItem['wordList'])):
-        if i != 0:
-            dbItemEncoded += ZFVimIM_KEY_S_SUB
-        dbItemEncoded += re.sub(ZFVimIM_KEY_S_SUB, ZFVimIM_KEY_SR_SUB,
-                re.sub(ZFVimIM_KEY_S_MAIN, ZFVimIM_KEY_SR_MAIN, dbItem['wordList'][i])
-            )
-    iEnd = len(dbItem['countList']) - 1
+    wordList = []
+    for word in dbItem.wordList:
+        if ZFVimIM_KEY_S_SUB in word or ZFVimIM_KEY_S_MAIN in word:
+            word = word.replace(ZFVimIM_KEY_S_SUB, ZFVimIM_KEY_SR_SUB).replace(ZFVimIM_KEY_S_MAIN, ZFVimIM_KEY_SR_MAIN)
+        wordList.append(word)
+    dbItemEncoded = dbItem.key + ZFVimIM_KEY_S_MAIN + ZFVimIM_KEY_S_SUB.join(wordList)
+    iEnd = len(dbItem.countList) - 1
     while iEnd >= 0:
-        if dbItem['countList'][iEnd] > 0:
+        if dbItem.countList[iEnd] > 0:
             break
         iEnd -= 1
-    i = 0
-    while i <= iEnd:
-        if i == 0:
-            dbItemEncoded += ZFVimIM_KEY_S_MAIN
-        else:
-            dbItemEncoded += ZFVimIM_KEY_S_SUB
-        dbItemEncoded += str(dbItem['countList'][i])
-        i += 1
+    if iEnd >= 0:
+        dbItemEncoded += ZFVimIM_KEY_S_MAIN + ZFVimIM_KEY_S_SUB.join([str(cnt) for cnt in dbItem.countList[0:iEnd + 1]])
     return dbItemEncoded
 
 
-# Load from SQLite database
-def dbLoadSqlitePy(dbFile, dbCountFile):
+# prefix trie of one bucket, flattened so that vim can load it by json_decode()
+# and look up any node by a single dict access
+#
+# keyList: sorted keys of the bucket, same order as lines exported to vim
+# return: {
+#   'a' : [0, 3, 1],   # [start, end) range of keys under this node, and whether 'a' itself is a key
+#   'ai' : [1, 3, 1],
+#   'aig' : [2, 3, 0],
+#   'aigo' : [2, 3, 1],
+# }
+# keys under one node are always contiguous since keyList is sorted:
+# * prefix search: keyList[start] is the first key starting with prefix
+# * exact search: keyList[start] == prefix if isKey
+# * has longer key: end - start > isKey
+def dbBucketTrieBuild(keyList):
+    trie = {}
+    for i, key in enumerate(keyList):
+        for n in range(1, len(key) + 1):
+            node = trie.get(key[0:n], None)
+            if node is None:
+                trie[key[0:n]] = [i, i + 1, 0]
+            else:
+                node[1] = i + 1
+        trie[key][2] = 1
+    return trie
+
+
+# abbreviation (alias) key of a word, or None, by index of letters in key:
+# * 3 characters word: key[0] + key[2] + last 2 letters,
+#   e.g. 'surufa' (输入法) -> 'srfa'
+# * 4 or more characters word: key[0] + key[2] + key[4] + key[(wordLen - 1) * 2],
+#   e.g. 'surufashi' (输入法式) -> 'srfs'
+def dbAliasKey(key, word):
+    wordLen = len(word)
+    keyLen = len(key)
+    if wordLen == 3 and keyLen >= 6:
+        return key[0] + key[2] + key[keyLen - 2:]
+    if wordLen >= 4 and keyLen >= wordLen * 2:
+        return key[0] + key[2] + key[4] + key[(wordLen - 1) * 2]
+    return None
+
+
+# alias index of one bucket (aliases of the bucket's words have the same first letter)
+#
+# return: {
+#   'srfa' : [['surufa', '输入法'], ...],
+# }
+# in the same order as keys and words in the bucket
+def dbBucketAliasBuild(cMap):
+    aliasMap = {}
+    for key, dbItem in sorted(dbMapIter(cMap), key=lambda x: x[0]):
+        dbBucketAliasAdd(aliasMap, dbItem)
+    return aliasMap
+
+
+# add words of dbItem to aliasMap of dbBucketAliasBuild,
+# items must be added in order of key
+def dbBucketAliasAdd(aliasMap, dbItem):
+    key = dbItem.key
+    for word in dbItem.wordList:
+        aliasKey = dbAliasKey(key, word)
+        if aliasKey is not None:
+            if aliasKey not in aliasMap:
+                aliasMap[aliasKey] = []
+            aliasMap[aliasKey].append([key, word])
+
+
+# number of completions kept for each prefix by dbBucketTopBuild
+DB_BUCKET_TOP_K = 10
+# completions are only kept for prefixes not longer than this
+DB_BUCKET_TOP_PREFIX_MAX = 4
+
+
+# rank of one completion, smaller is better:
+# shorter word first, then higher count, then by key and word
+def dbBucketTopRank(key, word, count):
+    return (len(word), -count, key, word)
+
+
+# best DB_BUCKET_TOP_K completions of each prefix (up to DB_BUCKET_TOP_PREFIX_MAX letters) of one bucket,
+# completions of a prefix are words of keys longer than the prefix, ordered by dbBucketTopRank
+#
+# return: {
+#   'a' : [['ai', '爱', 12], ...],   # [key, word, count]
+#   'ai' : [['aiguo', '爱国', 3], ...],
+# }
+def dbBucketTopBuild(cMap):
+    topMap = {}
+    for key, dbItem in dbMapIter(cMap):
+        dbBucketTopAdd(topMap, dbItem)
+    return dbBucketTopFinish(topMap)
+
+
+# add words of dbItem to topMap, in any order,
+# topMap holds candidate ranks of each prefix until dbBucketTopFinish
+def dbBucketTopAdd(topMap, dbItem):
+    key = dbItem.key
+    n = min(len(key) - 1, DB_BUCKET_TOP_PREFIX_MAX)
+    if n <= 0:
+        return
+    for word, count in zip(dbItem.wordList, dbItem.countList):
+        rank = dbBucketTopRank(key, word, count)
+        for i in range(1, n + 1):
+            prefix = key[0:i]
+            rankList = topMap.get(prefix, None)
+            if rankList is None:
+                topMap[prefix] = [rank]
+            else:
+                rankList.append(rank)
+                # short prefixes collect most of the bucket, keep them bounded
+                if len(rankList) >= DB_BUCKET_TOP_K * 4:
+                    rankList[:] = heapq.nsmallest(DB_BUCKET_TOP_K, rankList)
+
+
+# turn topMap of dbBucketTopAdd into the result of dbBucketTopBuild
+def dbBucketTopFinish(topMap):
+    for prefix, rankList in topMap.items():
+        topMap[prefix] = [[key, word, -count] for _, count, key, word in heapq.nsmallest(DB_BUCKET_TOP_K, rankList)]
+    return topMap
+
+
+# count file: `key count1 count2 ...` per line,
+# counts of the words of key, in the order of frequency DESC, word
+# (that is, the order of the words before the count file is applied)
+#
+# imported to temp table counts(key, word, count), so that it can be joined when loading,
+# temp table lives only in this connection, the db file is not changed
+# buckets: list of first letter to import, None to import all
+def dbSqliteCountImport(conn, dbCountFile, buckets=None):
+    conn.execute('DROP TABLE IF EXISTS temp.counts')
+    conn.execute('''
+        CREATE TEMP TABLE counts (
+            key TEXT NOT NULL,
+            word TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (key, word)
+        ) WITHOUT ROWID
+    ''')
+    if len(dbCountFile) <= 0 or not os.path.isfile(dbCountFile) or not os.access(dbCountFile, os.R_OK):
+        return False
+
+    countMap = {}
+    with io.open(dbCountFile, 'r', encoding='utf-8') as dbCountFilePtr:
+        for line in dbCountFilePtr:
+            countTextList = line.split()
+            if len(countTextList) <= 1:
+                continue
+            key = countTextList[0]
+            if buckets is not None and key[0] not in buckets:
+                continue
+            countList = []
+            for countText in countTextList[1:]:
+                try:
+                    countList.append(int(countText))
+                except ValueError:
+                    countList.append(None)
+            countMap[key] = countList
+
+    column = 'frequency' if dbSqliteHasFrequency(conn) else '0'
+    keyList = list(countMap.keys())
+    rows = []
+    for i in range(0, len(keyList), DB_SQLITE_PARAM_BATCH):
+        batch = keyList[i:i + DB_SQLITE_PARAM_BATCH]
+        lastKey = None
+        for key, word in conn.execute('SELECT key, word FROM words WHERE key IN (' + ','.join('?' * len(batch)) + ')'
+                + ' ORDER BY key, ' + column + ' DESC, word', batch):
+            if key != lastKey:
+                lastKey = key
+                countList = countMap[key]
+                pos = 0
+            if pos < len(countList) and countList[pos] is not None:
+                rows.append((key, word, countList[pos]))
+            pos += 1
+    conn.executemany('INSERT INTO temp.counts (key, word, count) VALUES (?, ?, ?)', rows)
+    return True
+
+
+# {0} : frequency column of words, {1} : WHERE clause, {2} : words, or _DB_LOAD_NORMALIZED_WORDS
+# words without count in count file are already in the order of the count file,
+# so ties of count are kept in that order
+_DB_LOAD_SQL = '''
+    SELECT words.key, words.word, COALESCE(counts.count, {0}) AS count
+    FROM {2} LEFT JOIN temp.counts AS counts ON counts.key = words.key AND counts.word = words.word
+    {1}
+    ORDER BY words.key, count DESC, {0} DESC, words.word
+'''
+
+
+# same as the words view of the normalized layout (see dbSqliteNormalizedInit),
+# but CROSS JOIN makes sqlite read keys in order, instead of sorting all rows
+_DB_LOAD_NORMALIZED_WORDS = '''(
+        SELECT keys.key AS key, strings.word AS word, entries.frequency AS frequency
+        FROM keys CROSS JOIN entries ON entries.key_id = keys.id JOIN strings ON strings.id = entries.word_id
+    ) AS words'''
+
+
+# Load from SQLite database, with count file applied
+# buckets: list of first letter to load, None to load all
+#
+# words of each key come in order of count (then the order of the count file),
+# note: unlike dbItemReorder, no ZFVimIM_dbItemReorderThreshold when loading
+def dbLoadSqlitePy(dbFile, dbCountFile, buckets=None):
     pyMap = {}
-    if not os.path.isfile(dbFile):
-        return pyMap
-    
     try:
-        # Optimize SQLite connection for read performance
-        conn = sqlite3.connect(dbFile)
-        # Optimize for read-only access (faster reads)
-        conn.execute('PRAGMA synchronous=NORMAL')
-        conn.execute('PRAGMA cache_size=-64000')  # 64MB cache
-        cursor = conn.cursor()
-        
-        # Load all words from database in one query
-        # Try to load frequency if column exists, otherwise default to 0
-        try:
-            cursor.execute('SELECT key, word, frequency FROM words ORDER BY key, word')
-            has_frequency = True
-        except sqlite3.OperationalError:
-            # Column doesn't exist, try without frequency (for backward compatibility)
-            cursor.execute('SELECT key, word FROM words ORDER BY key, word')
-            has_frequency = False
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        # First pass: collect all words and frequencies for each key (avoid repeated encode/decode)
-        # Use dict with list - duplicates are already handled by PRIMARY KEY in DB
-        keyWordsMap = {}  # key -> list of (word, frequency) tuples
-        
-        for row in rows:
-            if has_frequency:
-                key, word, frequency = row
-            else:
-                key, word = row
-                frequency = 0
-            
-            # Filter: only lowercase alphabetic keys
-            if not key or not key[0].islower() or not key.isalpha():
-                    continue
-                
-            if key not in keyWordsMap:
-                keyWordsMap[key] = []
-            # No need to check duplicates - PRIMARY KEY ensures uniqueness
-            keyWordsMap[key].append((word, frequency))
-        
-        # Second pass: encode all items at once (much faster than per-row encoding)
-        for key, wordFreqList in keyWordsMap.items():
-            if key[0] not in pyMap:
-                pyMap[key[0]] = {}
-            # Sort by frequency (descending) to maintain order
-            # This ensures words with higher frequency appear first
-            wordFreqList.sort(key=lambda x: x[1], reverse=True)
-            wordList = [wf[0] for wf in wordFreqList]
-            countList = [wf[1] for wf in wordFreqList]
-            # Encode and then reorder (dbItemReorder will handle final sorting)
-            dbItem = {
-                'key' : key,
-                'wordList' : wordList,
-                'countList' : countList,
-            }
-            dbItemReorder(dbItem)  # Sort by frequency with threshold
-            pyMap[key[0]][key] = dbItemEncode(dbItem)
-        
+        for dbItem in dbLoadSqliteIter(dbFile, dbCountFile, buckets):
+            c = dbItem.key[0]
+            if c not in pyMap:
+                pyMap[c] = {}
+            pyMap[c][dbItem.key] = dbItem
     except Exception as e:
         # If SQLite loading fails, return empty map
-        # Print error for debugging
-        import sys
         print(f'Error loading SQLite database {dbFile}: {e}', file=sys.stderr)
-        pass
-    
-    # Load word count from count file (still as text format for compatibility)
-    if len(dbCountFile) > 0 and os.path.isfile(dbCountFile) and os.access(dbCountFile, os.R_OK):
-        with io.open(dbCountFile, 'r', encoding='utf-8') as dbCountFilePtr:
-            for line in dbCountFilePtr:
-                line = line.rstrip('\n')
-                countTextList = line.split(' ')
-                if len(countTextList) <= 1:
-                    continue
-                key = countTextList[0]
-                dbItemEncoded = pyMap.get(key[0], {}).get(key, '')
-                if dbItemEncoded == '':
-                    continue
-                dbItem = dbItemDecode(dbItemEncoded)
-                wordListLen = len(dbItem['wordList'])
-                for i in range(len(countTextList) - 1):
-                    if i >= wordListLen:
-                        break
-                    dbItem['countList'][i] = int(countTextList[i + 1])
-                dbItemReorder(dbItem)
-                pyMap[key[0]][key] = dbItemEncode(dbItem)
-    
+        pyMap = {}
+
     return pyMap
     # end of dbLoadSqlitePy
 
 
+# same as dbLoadSqlitePy, but yield DbItem one by one in order of key,
+# rows are grouped by key as they come from the cursor,
+# so only one key is held in memory at a time
+#
+# raise on error, the db is closed when the generator is exhausted or closed
+def dbLoadSqliteIter(dbFile, dbCountFile, buckets=None):
+    if not os.path.isfile(dbFile):
+        return
+
+    conn = dbSqliteOpen(dbFile)
+    try:
+        dbSqliteCountImport(conn, dbCountFile, buckets)
+        column = 'words.frequency' if dbSqliteHasFrequency(conn) else '0'
+        source = _DB_LOAD_NORMALIZED_WORDS if dbSqliteIsNormalized(conn) else 'words'
+        if buckets is None:
+            queryList = [(_DB_LOAD_SQL.format(column, '', source), ())]
+        else:
+            # Range query on primary key, one bucket each
+            queryList = [(_DB_LOAD_SQL.format(column, 'WHERE words.key >= ? AND words.key < ?', source), (c, chr(ord(c) + 1)))
+                    for c in sorted(buckets)]
+
+        dbItem = None
+        for sql, params in queryList:
+            for key, word, count in conn.execute(sql, params):
+                if dbItem is not None:
+                    if dbItem.key == key:
+                        dbItem.wordList.append(word)
+                        dbItem.countList.append(count)
+                        continue
+                    yield dbItem
+                    dbItem = None
+                # Filter: only lowercase alphabetic keys
+                if not key or not key[0].islower() or not key.isalpha():
+                    continue
+                dbItem = DbItem(key, [word], [count])
+        if dbItem is not None:
+            yield dbItem
+    finally:
+        conn.close()
+    # end of dbLoadSqliteIter
+
+
 # since python has low performance on List search,
 # we use different db struct with vim side
 #
 # return pyMap: {
 #   'a' : {
-#     'a' : 'a#AAA,BBB#3,2',
-#     'ai' : 'ai#CCC,DDD#3',
+#     'a' : DbItem('a', ['AAA', 'BBB'], [3, 2]),
+#     'ai' : DbItem('ai', ['CCC', 'DDD'], [3, 0]),
 #   },
 #   'c' : {
-#     'ceshi' : 'ceshi#EEE',
+#     'ceshi' : DbItem('ceshi', ['EEE'], [0]),
 #   },
 # }
+# use dbItemEncode to get the 'a#AAA,BBB#3,2' form used by vim side
 # Now only supports SQLite database files (.db)
 def dbLoadPy(dbFile, dbCountFile):
     # Convert .yaml to .db if needed
     if dbFile.endswith('.yaml'):
-        dbFile = dbFile[:-4] + '.db'
+        dbFile = dbFile[:-5] + '.db'
     
     # Only load from SQLite database
     return dbLoadSqlitePy(dbFile, dbCountFile)
@@ -238,7 +458,7 @@ def dbLoadPy(dbFile, dbCountFile):
 def dbLoadNormalizePy(dbFile):
     # Convert .yaml to .db if needed
     if dbFile.endswith('.yaml'):
-        dbFile = dbFile[:-4] + '.db'
+        dbFile = dbFile[:-5] + '.db'
     
     # Load from SQLite and normalize
     pyMap = dbLoadSqlitePy(dbFile, '')
@@ -246,8 +466,7 @@ def dbLoadNormalizePy(dbFile):
     # Normalize keys (remove non-alphabetic characters)
     normalizedMap = {}
     for c in pyMap.keys():
-        for key, dbItemEncoded in pyMap[c].items():
-            dbItem = dbItemDecode(dbItemEncoded)
+        for key, dbItem in pyMap[c].items():
             # Normalize key (remove non-alphabetic characters)
             normalizedKey = re.sub('[^a-z]', '', key)
             if normalizedKey == '':
@@ -258,18 +477,13 @@ def dbLoadNormalizePy(dbFile):
                 normalizedMap[normalizedKey[0]] = {}
             
             if normalizedKey in normalizedMap[normalizedKey[0]]:
-                existingItem = dbItemDecode(normalizedMap[normalizedKey[0]][normalizedKey])
-                for word in dbItem['wordList']:
-                    if word not in existingItem['wordList']:
-                        existingItem['wordList'].append(word)
-                        existingItem['countList'].append(0)
-                normalizedMap[normalizedKey[0]][normalizedKey] = dbItemEncode(existingItem)
+                existingItem = normalizedMap[normalizedKey[0]][normalizedKey]
+                for word in dbItem.wordList:
+                    if word not in existingItem.wordList:
+                        existingItem.wordList.append(word)
+                        existingItem.countList.append(0)
             else:
-                normalizedMap[normalizedKey[0]][normalizedKey] = dbItemEncode({
-                    'key' : normalizedKey,
-                    'wordList' : dbItem['wordList'],
-                    'countList' : dbItem['countList'],
-                })
+                normalizedMap[normalizedKey[0]][normalizedKey] = DbItem(normalizedKey, dbItem.wordList, dbItem.countList)
     
     return normalizedMap
     # end of dbLoadNormalizePy
@@ -278,172 +492,1339 @@ def dbLoadNormalizePy(dbFile):
 def dbSavePy(pyMap, dbFile, dbCountFile, cachePath):
     # Save as TXT format (key word1 word2 ...)
     # Write to temporary file first
+    # keys of each bucket share the same first char,
+    # so walking sorted buckets and then sorted keys gives sorted output,
+    # for both db file and count file
     tmpFile = cachePath + '/dbFileTmp'
     dbFilePtr = io.open(tmpFile, 'wb')
     txtLines = []
-    # Sort keys for consistent output
-    sortedKeys = []
-    for c in pyMap.keys():
-        for key, dbItemEncoded in sorted(dbMapIter(pyMap[c])):
-            dbItem = dbItemDecode(dbItemEncoded)
-            sortedKeys.append(dbItem['key'])
-    sortedKeys.sort()
-    
-    for key in sortedKeys:
-        # Find the item
-        found = False
-        for c in pyMap.keys():
-            for k, dbItemEncoded in sorted(dbMapIter(pyMap[c])):
-                dbItem = dbItemDecode(dbItemEncoded)
-                if dbItem['key'] == key:
-                    found = True
-                    # Format: key word1 word2 ...
-                    # Escape spaces in words
-                    wordParts = []
-                    for word in dbItem['wordList']:
-                        # Escape spaces in words
-                        escapedWord = word.replace(' ', '\\ ')
-                        wordParts.append(escapedWord)
-                    line = key + ' ' + ' '.join(wordParts)
-                    txtLines.append(line)
-                    break
-            if found:
-                break
-        if len(txtLines) >= DB_FILE_LINE_BUFFER:
-            dbFilePtr.write(('\n'.join(txtLines) + '\n').encode('utf-8'))
-            txtLines = []
+    dbCountFilePtr = None
+    countLines = []
+    if len(dbCountFile) > 0:
+        dbCountFilePtr = io.open(cachePath + '/dbCountFileTmp', 'wb')
+
+    for c in sorted(pyMap.keys()):
+        for key, dbItem in sorted(dbMapIter(pyMap[c]), key=lambda x: x[0]):
+            # Format: key word1 word2 ...
+            # Escape spaces in words
+            wordParts = []
+            for word in dbItem.wordList:
+                wordParts.append(word.replace(' ', '\\ '))
+            txtLines.append(dbItem.key + ' ' + ' '.join(wordParts))
+            if len(txtLines) >= DB_FILE_LINE_BUFFER:
+                dbFilePtr.write(('\n'.join(txtLines) + '\n').encode('utf-8'))
+                txtLines = []
+
+            # Save count file if needed (still as text format for compatibility)
+            if dbCountFilePtr is not None:
+                countLine = dbItem.key
+                for cnt in dbItem.countList:
+                    if cnt <= 0:
+                        break
+                    countLine += ' '
+                    countLine += str(cnt)
+                if countLine != key:
+                    countLines.append(countLine)
+                if len(countLines) >= DB_FILE_LINE_BUFFER:
+                    dbCountFilePtr.write(('\n'.join(countLines) + '\n').encode('utf-8'))
+                    countLines = []
+
     if len(txtLines) > 0:
         dbFilePtr.write(('\n'.join(txtLines) + '\n').encode('utf-8'))
     dbFilePtr.close()
     shutil.move(tmpFile, dbFile)
-    
-    # Save count file if needed (still as text format for compatibility)
-    if len(dbCountFile) > 0:
-            dbCountFilePtr = io.open(cachePath + '/dbCountFileTmp', 'wb')
-            countLines = []
-            for c in pyMap.keys():
-                for key, dbItemEncoded in sorted(dbMapIter(pyMap[c])):
-                    dbItem = dbItemDecode(dbItemEncoded)
-                    countLine = dbItem['key']
-                    for cnt in dbItem['countList']:
-                        if cnt <= 0:
-                            break
-                        countLine += ' '
-                        countLine += str(cnt)
-                    if countLine != key:
-                        countLines.append(countLine)
-                    if len(countLines) >= DB_FILE_LINE_BUFFER:
-                        dbCountFilePtr.write(('\n'.join(countLines) + '\n').encode('utf-8'))
-                        countLines = []
-            if len(countLines) > 0:
-                dbCountFilePtr.write(('\n'.join(countLines) + '\n').encode('utf-8'))
-            dbCountFilePtr.close()
-            shutil.move(cachePath + '/dbCountFileTmp', dbCountFile)
+
+    if dbCountFilePtr is not None:
+        if len(countLines) > 0:
+            dbCountFilePtr.write(('\n'.join(countLines) + '\n').encode('utf-8'))
+        dbCountFilePtr.close()
+        shutil.move(cachePath + '/dbCountFileTmp', dbCountFile)
     # end of dbSavePy
 
 
-def dbEditApplyPy(pyMap, dbEdit):
+# dirtySet: optional set, (key, word) whose count is changed are added to it,
+# so that dbSyncFrequencyToSqlite writes only them
+def dbEditApplyPy(pyMap, dbEdit, dirtySet=None):
     for e in dbEdit:
         key = e['key']
         word = e['word']
         if e['action'] == 'add':
             if key[0] not in pyMap:
-                pyMap[key[0]] = []
-            dbItemEncoded = pyMap[key[0]].get(key, '')
-            if dbItemEncoded != '':
-                dbItem = dbItemDecode(dbItemEncoded)
-                wordIndex = dbWordIndex(dbItem['wordList'], word)
+                pyMap[key[0]] = {}
+            dbItem = pyMap[key[0]].get(key, None)
+            if dbItem is not None:
+                wordIndex = dbWordIndex(dbItem.wordList, word)
                 if wordIndex >= 0:
-                    dbItem['countList'][wordIndex] += 1
+                    dbItem.countList[wordIndex] += 1
                 else:
-                    dbItem['wordList'].append(word)
-                    dbItem['countList'].append(1)
+                    dbItem.wordList.append(word)
+                    dbItem.countList.append(1)
                 dbItemReorder(dbItem)
-                pyMap[key[0]][key] = dbItemEncode(dbItem)
             else:
-                pyMap[key[0]][key] = dbItemEncode({
-                    'key' : key,
-                    'wordList' : [word],
-                    'countList' : [1],
-                })
+                pyMap[key[0]][key] = DbItem(key, [word], [1])
+            if dirtySet is not None:
+                dirtySet.add((key, word))
         elif e['action'] == 'remove':
-            dbItemEncoded = pyMap.get(key[0], {}).get(key, '')
-            if dbItemEncoded == '':
+            dbItem = pyMap.get(key[0], {}).get(key, None)
+            if dbItem is None:
                 continue
-            dbItem = dbItemDecode(dbItemEncoded)
-            wordIndex = dbWordIndex(dbItem['wordList'], word)
+            wordIndex = dbWordIndex(dbItem.wordList, word)
             if wordIndex < 0:
                 continue
-            del dbItem['wordList'][wordIndex]
-            del dbItem['countList'][wordIndex]
-            if len(dbItem['wordList']) == 0:
+            del dbItem.wordList[wordIndex]
+            del dbItem.countList[wordIndex]
+            if len(dbItem.wordList) == 0:
                 del pyMap[key[0]][key]
                 if len(pyMap[key[0]]) == 0:
                     del pyMap[key[0]]
-            else:
-                pyMap[key[0]][key] = dbItemEncode(dbItem)
         elif e['action'] == 'reorder':
-            dbItemEncoded = pyMap.get(key[0], {}).get(key, '')
-            if dbItemEncoded == '':
+            dbItem = pyMap.get(key[0], {}).get(key, None)
+            if dbItem is None:
                 continue
-            dbItem = dbItemDecode(dbItemEncoded)
-            wordIndex = dbWordIndex(dbItem['wordList'], word)
+            wordIndex = dbWordIndex(dbItem.wordList, word)
             if wordIndex < 0:
                 continue
-            dbItem['countList'][wordIndex] = 0
+            dbItem.countList[wordIndex] = 0
             sum = 0
-            for cnt in dbItem['countList']:
+            for cnt in dbItem.countList:
                 sum += cnt
-            dbItem['countList'][wordIndex] = int(sum / 2)
+            dbItem.countList[wordIndex] = int(sum / 2)
             dbItemReorder(dbItem)
-            pyMap[key[0]][key] = dbItemEncode(dbItem)
+            if dirtySet is not None:
+                dirtySet.add((key, word))
     # end of dbEditApplyPy
 
 
-def dbSyncFrequencyToSqlite(pyMap, dbFile):
+def dbSyncFrequencyToSqlite(pyMap, dbFile, dirtySet=None):
     """
     将内存中的频率信息同步到 SQLite 数据库
     
     Args:
         pyMap: 内存中的词库映射
         dbFile: SQLite 数据库文件路径
+        dirtySet: dbEditApplyPy 记录的改动过的 (key, word)，只写入这些词，成功后清空；
+            None 时写入 pyMap 中所有的词
     """
     if not os.path.isfile(dbFile):
         return False
     
     try:
-        conn = sqlite3.connect(dbFile)
-        cursor = conn.cursor()
-        
-        # 检查是否有 frequency 字段
-        cursor.execute("PRAGMA table_info(words)")
-        columns = [col[1] for col in cursor.fetchall()]
-        if 'frequency' not in columns:
-            # 表结构需要迁移，先不更新
+        conn = dbSqliteOpen(dbFile)
+        try:
+            if not dbSqliteHasFrequency(conn):
+                # 表结构需要迁移，先不更新
+                return False
+            if dirtySet is None:
+                rows = ((key, word, dbItem.countList[i] if i < len(dbItem.countList) else 0)
+                        for c in pyMap.keys()
+                        for key, dbItem in dbMapIter(pyMap[c])
+                        for i, word in enumerate(dbItem.wordList))
+            else:
+                rows = []
+                for key, word in sorted(dirtySet):
+                    dbItem = pyMap.get(key[0], {}).get(key, None)
+                    wordIndex = dbWordIndex(dbItem.wordList, word) if dbItem is not None else -1
+                    # removed from pyMap, nothing to write
+                    if wordIndex >= 0:
+                        rows.append((key, word, dbItem.countList[wordIndex]))
+            dbSqliteFrequencySet(conn, rows)
+            conn.commit()
+        finally:
             conn.close()
-            return False
-        
-        updated_count = 0
-        for c in pyMap.keys():
-            for key, dbItemEncoded in dbMapIter(pyMap[c]):
-                dbItem = dbItemDecode(dbItemEncoded)
-                # 更新每个词的频率
-                for i, word in enumerate(dbItem['wordList']):
-                    frequency = dbItem['countList'][i] if i < len(dbItem['countList']) else 0
-                    cursor.execute(
-                        'UPDATE words SET frequency = ? WHERE key = ? AND word = ?',
-                        (frequency, key, word)
-                    )
-                    if cursor.rowcount > 0:
-                        updated_count += 1
-        
-        conn.commit()
-        conn.close()
-        
+        if dirtySet is not None:
+            dirtySet.clear()
         return True
     except Exception as e:
-        import sys
         print(f'Error syncing frequency to database {dbFile}: {e}', file=sys.stderr)
         return False
     # end of dbSyncFrequencyToSqlite
 
+
+
+# ============================================================
+# SQLite helpers working on an already opened connection,
+# shared by the one-shot scripts and dbServer.py
+# (so a long-lived process can keep a single connection)
+
+DB_FREQUENCY_MAX = 1000000
+
+
+# max host parameters in one statement, sqlite's default limit is 999
+DB_SQLITE_PARAM_BATCH = 500
+
+
+def dbSqliteOpen(dbFile):
+    conn = sqlite3.connect(dbFile)
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA cache_size=-64000')  # 64MB cache
+    return conn
+
+
+# schema of words, saved as `PRAGMA user_version`:
+# * 0 : v1, rowid table, with idx_key (a prefix of the primary key) and idx_word
+# * 2 : v2, words and aliases are WITHOUT ROWID, rows are stored in primary key order,
+#       so that words of one key are read from neighbouring pages, idx_key is dropped
+# * 3 : normalized layout of v2, optional, see dbSqliteNormalize (db_migrate.py --normalize)
+# older db is migrated by dbSqliteMigrate (db_migrate.py)
+DB_SCHEMA_VERSION = 2
+DB_SCHEMA_NORMALIZED = 3
+
+
+# {0} : table name
+_DB_WORDS_SQL = '''
+    CREATE TABLE {0} (
+        key TEXT NOT NULL,
+        word TEXT NOT NULL,
+        frequency INTEGER DEFAULT 0,
+        PRIMARY KEY (key, word)
+    ) WITHOUT ROWID
+'''
+
+
+# create table of DB_SCHEMA_VERSION, without indexes and triggers (see dbSqliteInit)
+def dbSqliteWordsCreate(conn, table='words'):
+    conn.execute(_DB_WORDS_SQL.format(table))
+    conn.execute(f'PRAGMA user_version = {DB_SCHEMA_VERSION}')
+
+
+def dbSqliteSchemaVersion(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def dbSqliteIsNormalized(conn):
+    return dbSqliteSchemaVersion(conn) == DB_SCHEMA_NORMALIZED
+
+
+def dbSqliteInit(conn):
+    if dbSqliteIsNormalized(conn):
+        dbSqliteNormalizedInit(conn)
+    else:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'words'").fetchone() is None:
+            dbSqliteWordsCreate(conn)
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_word ON words(word)')
+    dbSqliteBucketVersionInit(conn)
+    dbSqliteAliasInit(conn)
+    dbSqliteWordIndexInit(conn)
+    dbSqliteUsageInit(conn)
+
+
+# migrate words to DB_SCHEMA_VERSION in one transaction,
+# other connections (e.g. dbServer.py) only wait for the write lock,
+# and see the new table once committed
+#
+# the content is not changed, so bucket_version, word_list and usage are kept
+# return schema version before migration
+def dbSqliteMigrate(conn):
+    version = dbSqliteSchemaVersion(conn)
+    if version >= DB_SCHEMA_VERSION:
+        return version
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('DROP TABLE IF EXISTS words_migrate')
+        dbSqliteWordsCreate(conn, 'words_migrate')
+        # legacy words table may have no frequency column
+        frequency = 'frequency' if dbSqliteHasFrequency(conn) else '0 AS frequency'
+        conn.execute(f'''
+            INSERT OR IGNORE INTO words_migrate (key, word, frequency)
+            SELECT key, word, {frequency} FROM words ORDER BY key, word
+        ''')
+        # indexes and triggers of words are dropped with it, created again by dbSqliteInit,
+        # aliases is filled again from words by dbSqliteAliasInit
+        conn.execute('DROP TABLE words')
+        conn.execute('ALTER TABLE words_migrate RENAME TO words')
+        conn.execute('DROP TABLE IF EXISTS aliases')
+        dbSqliteInit(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return version
+
+
+# ============================================================
+# normalized layout (DB_SCHEMA_NORMALIZED), optional:
+#   keys(id, key)     : each key once, ids are given in order of key when normalized,
+#                       so entries of one bucket are still stored together
+#   strings(id, word) : each word once (a word may be under several keys),
+#                       word_list is a view of it, so word_fts is kept as is
+#   entries(key_id, word_id, frequency) : primary key (key_id, word_id), WITHOUT ROWID
+# words is a view joining them, with INSTEAD OF triggers,
+# so that scripts reading and writing words keep working,
+# while dbSqliteFrequencyAddBatch, dbSqliteWordAdd and dbSqliteWordsInsertFrom write entries by id
+#
+# limits of the words view:
+# * cursor.rowcount of INSERT / UPDATE / DELETE on words is always 0
+# * only frequency can be updated, not key or word
+# * keys and strings no longer used are removed by DELETE on words,
+#   so never delete from entries directly
+
+_DB_NORMALIZED_TABLES_SQL = [
+    '''
+        CREATE TABLE keys (
+            id INTEGER PRIMARY KEY,
+            key TEXT NOT NULL UNIQUE
+        )
+    ''',
+    '''
+        CREATE TABLE strings (
+            id INTEGER PRIMARY KEY,
+            word TEXT NOT NULL UNIQUE
+        )
+    ''',
+    '''
+        CREATE TABLE entries (
+            key_id INTEGER NOT NULL,
+            word_id INTEGER NOT NULL,
+            frequency INTEGER DEFAULT 0,
+            PRIMARY KEY (key_id, word_id)
+        ) WITHOUT ROWID
+    ''',
+]
+
+
+# views and INSTEAD OF triggers of the normalized layout, tables must exist
+def dbSqliteNormalizedInit(conn):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_word ON entries(word_id)')
+    conn.execute('''
+        CREATE VIEW IF NOT EXISTS words AS
+        SELECT keys.key AS key, strings.word AS word, entries.frequency AS frequency
+        FROM entries JOIN keys ON keys.id = entries.key_id JOIN strings ON strings.id = entries.word_id
+    ''')
+    conn.execute('CREATE VIEW IF NOT EXISTS word_list AS SELECT id, word FROM strings')
+    # no conflict clause for entries, so that it is decided by the statement on words:
+    # `INSERT OR IGNORE INTO words` ignores existing (key, word), `INSERT INTO words` fails
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS words_view_insert INSTEAD OF INSERT ON words BEGIN
+            INSERT INTO keys (key) SELECT NEW.key WHERE NOT EXISTS (SELECT 1 FROM keys WHERE key = NEW.key);
+            INSERT INTO strings (word) SELECT NEW.word WHERE NOT EXISTS (SELECT 1 FROM strings WHERE word = NEW.word);
+            INSERT INTO entries (key_id, word_id, frequency)
+            VALUES ((SELECT id FROM keys WHERE key = NEW.key), (SELECT id FROM strings WHERE word = NEW.word), NEW.frequency);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS words_view_update INSTEAD OF UPDATE ON words BEGIN
+            SELECT RAISE(ABORT, 'key and word of words can not be updated') WHERE NEW.key != OLD.key OR NEW.word != OLD.word;
+            UPDATE entries SET frequency = NEW.frequency
+            WHERE key_id = (SELECT id FROM keys WHERE key = OLD.key) AND word_id = (SELECT id FROM strings WHERE word = OLD.word);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS words_view_delete INSTEAD OF DELETE ON words BEGIN
+            DELETE FROM entries
+            WHERE key_id = (SELECT id FROM keys WHERE key = OLD.key) AND word_id = (SELECT id FROM strings WHERE word = OLD.word);
+            DELETE FROM keys WHERE key = OLD.key AND NOT EXISTS (SELECT 1 FROM entries WHERE key_id = keys.id);
+            DELETE FROM strings WHERE word = OLD.word AND NOT EXISTS (SELECT 1 FROM entries WHERE word_id = strings.id);
+        END
+    ''')
+
+
+# convert words of DB_SCHEMA_VERSION to the normalized layout in one transaction,
+# older db is migrated first, see dbSqliteMigrate
+#
+# the content is not changed, so bucket_version, aliases and usage are kept,
+# strings takes the ids of word_list, so word_fts is kept too
+# return schema version before
+def dbSqliteNormalize(conn):
+    version = dbSqliteMigrate(conn)
+    if dbSqliteIsNormalized(conn):
+        return version
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for sql in _DB_NORMALIZED_TABLES_SQL:
+            conn.execute(sql)
+        conn.execute('INSERT INTO keys (key) SELECT DISTINCT key FROM words ORDER BY key')
+        hasWordIndex = dbSqliteHasWordIndex(conn)
+        if hasWordIndex:
+            conn.execute('INSERT INTO strings (id, word) SELECT id, word FROM word_list')
+        # words missing in word_list, if any
+        missing = conn.execute('INSERT OR IGNORE INTO strings (word) SELECT DISTINCT word FROM words ORDER BY word').rowcount
+        conn.execute('''
+            INSERT INTO entries (key_id, word_id, frequency)
+            SELECT keys.id, strings.id, words.frequency
+            FROM words JOIN keys ON keys.key = words.key JOIN strings ON strings.word = words.word
+            ORDER BY keys.id, strings.id
+        ''')
+        # indexes and triggers of words and word_list are dropped with them,
+        # created again on entries and strings by dbSqliteInit
+        conn.execute('DROP TABLE words')
+        conn.execute('DROP TABLE IF EXISTS word_list')
+        conn.execute(f'PRAGMA user_version = {DB_SCHEMA_NORMALIZED}')
+        dbSqliteInit(conn)
+        if hasWordIndex and missing > 0:
+            conn.execute("INSERT INTO word_fts (word_fts) VALUES ('rebuild')")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return version
+
+
+# convert the normalized layout back to words table of DB_SCHEMA_VERSION, in one transaction
+# return schema version before
+def dbSqliteDenormalize(conn):
+    version = dbSqliteSchemaVersion(conn)
+    if version != DB_SCHEMA_NORMALIZED:
+        return version
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('DROP TABLE IF EXISTS words_migrate')
+        dbSqliteWordsCreate(conn, 'words_migrate')
+        conn.execute('''
+            INSERT INTO words_migrate (key, word, frequency)
+            SELECT key, word, frequency FROM words ORDER BY key, word
+        ''')
+        conn.execute('DROP VIEW words')
+        conn.execute('DROP VIEW IF EXISTS word_list')
+        if dbSqliteHasWordIndex(conn):
+            conn.execute(_DB_WORD_LIST_SQL)
+            conn.execute('INSERT INTO word_list (id, word) SELECT id, word FROM strings')
+        conn.execute('DROP TABLE entries')
+        conn.execute('DROP TABLE keys')
+        conn.execute('DROP TABLE strings')
+        conn.execute('ALTER TABLE words_migrate RENAME TO words')
+        dbSqliteInit(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return version
+
+
+# normalized layout only: return {text : id} of keys (column 'key') or strings (column 'word'),
+# texts not exist are inserted, or left out of the result if not insertMissing
+def _dbSqliteInternIds(conn, table, column, textList, insertMissing=True):
+    textList = sorted(set(textList))
+    idMap = {}
+    for i in range(0, len(textList), DB_SQLITE_PARAM_BATCH):
+        batch = textList[i:i + DB_SQLITE_PARAM_BATCH]
+        idMap.update(conn.execute(f'SELECT {column}, id FROM {table} WHERE {column} IN (' + ','.join('?' * len(batch)) + ')', batch))
+    if not insertMissing:
+        return idMap
+    for text in textList:
+        if text not in idMap:
+            idMap[text] = conn.execute(f'INSERT INTO {table} ({column}) VALUES (?)', (text,)).lastrowid
+    return idMap
+
+
+# per first-letter change counter, maintained by triggers on words (entries if normalized),
+# so that loaders can tell which buckets need to be exported again
+#
+# the row of bucket '' holds a random id of the db file,
+# which changes when the db is created again from scratch
+DB_BUCKET_LIST = [chr(c_) for c_ in range(ord('a'), ord('z') + 1)]
+
+
+def dbSqliteBucketVersionInit(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS bucket_version (
+            bucket TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO bucket_version (bucket, version) VALUES (?, ?)',
+            ('', random.getrandbits(62)))
+    conn.executemany('INSERT OR IGNORE INTO bucket_version (bucket, version) VALUES (?, 0)',
+            [(c,) for c in DB_BUCKET_LIST])
+    if dbSqliteIsNormalized(conn):
+        # {0} : key id
+        bucket = '(SELECT substr(key, 1, 1) FROM keys WHERE id = {0})'
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS entries_bucket_insert AFTER INSERT ON entries BEGIN
+                UPDATE bucket_version SET version = version + 1 WHERE bucket = ''' + bucket.format('NEW.key_id') + ''';
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS entries_bucket_delete AFTER DELETE ON entries BEGIN
+                UPDATE bucket_version SET version = version + 1 WHERE bucket = ''' + bucket.format('OLD.key_id') + ''';
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS entries_bucket_update AFTER UPDATE ON entries BEGIN
+                UPDATE bucket_version SET version = version + 1 WHERE bucket = ''' + bucket.format('OLD.key_id') + ''';
+                UPDATE bucket_version SET version = version + 1 WHERE bucket = ''' + bucket.format('NEW.key_id') + ''' AND NEW.key_id != OLD.key_id;
+            END
+        ''')
+        return
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS words_bucket_insert AFTER INSERT ON words BEGIN
+            UPDATE bucket_version SET version = version + 1 WHERE bucket = substr(NEW.key, 1, 1);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS words_bucket_delete AFTER DELETE ON words BEGIN
+            UPDATE bucket_version SET version = version + 1 WHERE bucket = substr(OLD.key, 1, 1);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS words_bucket_update AFTER UPDATE ON words BEGIN
+            UPDATE bucket_version SET version = version + 1 WHERE bucket = substr(OLD.key, 1, 1);
+            UPDATE bucket_version SET version = version + 1 WHERE bucket = substr(NEW.key, 1, 1) AND NEW.key != OLD.key;
+        END
+    ''')
+
+
+# same as dbAliasKey, {0} is the row prefix ('NEW.' in triggers), NULL if no alias
+_DB_ALIAS_KEY_SQL = '''
+    CASE
+        WHEN length({0}word) = 3 AND length({0}key) >= 6
+            THEN substr({0}key, 1, 1) || substr({0}key, 3, 1) || substr({0}key, -2, 2)
+        WHEN length({0}word) >= 4 AND length({0}key) >= length({0}word) * 2
+            THEN substr({0}key, 1, 1) || substr({0}key, 3, 1) || substr({0}key, 5, 1) || substr({0}key, (length({0}word) - 1) * 2 + 1, 1)
+    END
+'''
+
+
+# aliases(alias_key, key, word), see dbAliasKey
+# filled from words when first created, then maintained by triggers on words (entries if normalized)
+def dbSqliteAliasInit(conn):
+    exist = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'aliases'").fetchone()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS aliases (
+            alias_key TEXT NOT NULL,
+            key TEXT NOT NULL,
+            word TEXT NOT NULL,
+            PRIMARY KEY (alias_key, key, word)
+        ) WITHOUT ROWID
+    ''')
+    if not exist:
+        conn.execute('''
+            INSERT OR IGNORE INTO aliases (alias_key, key, word)
+            SELECT alias_key, key, word FROM (SELECT ''' + _DB_ALIAS_KEY_SQL.format('') + ''' AS alias_key, key, word FROM words)
+            WHERE alias_key IS NOT NULL
+        ''')
+    if dbSqliteIsNormalized(conn):
+        # {0} : entries row prefix
+        entry = 'SELECT key, word FROM keys, strings WHERE keys.id = {0}key_id AND strings.id = {0}word_id'
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS entries_alias_insert AFTER INSERT ON entries BEGIN
+                INSERT OR IGNORE INTO aliases (alias_key, key, word)
+                SELECT alias_key, key, word FROM (SELECT ''' + _DB_ALIAS_KEY_SQL.format('') + ''' AS alias_key, key, word
+                    FROM (''' + entry.format('NEW.') + '''))
+                WHERE alias_key IS NOT NULL;
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS entries_alias_delete AFTER DELETE ON entries BEGIN
+                DELETE FROM aliases WHERE (key, word) = (''' + entry.format('OLD.') + ''');
+            END
+        ''')
+        return
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS words_alias_insert AFTER INSERT ON words
+        WHEN ''' + _DB_ALIAS_KEY_SQL.format('NEW.') + ''' IS NOT NULL BEGIN
+            INSERT OR IGNORE INTO aliases (alias_key, key, word)
+            VALUES (''' + _DB_ALIAS_KEY_SQL.format('NEW.') + ''', NEW.key, NEW.word);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS words_alias_delete AFTER DELETE ON words BEGIN
+            DELETE FROM aliases WHERE key = OLD.key AND word = OLD.word;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS words_alias_update AFTER UPDATE OF key, word ON words BEGIN
+            DELETE FROM aliases WHERE key = OLD.key AND word = OLD.word;
+            INSERT OR IGNORE INTO aliases (alias_key, key, word)
+            SELECT ''' + _DB_ALIAS_KEY_SQL.format('NEW.') + ''', NEW.key, NEW.word
+            WHERE ''' + _DB_ALIAS_KEY_SQL.format('NEW.') + ''' IS NOT NULL;
+        END
+    ''')
+
+
+# return list of (key, word) whose alias is aliasKey
+def dbSqliteAliasSearch(conn, aliasKey):
+    return conn.execute('SELECT key, word FROM aliases WHERE alias_key = ? ORDER BY key', (aliasKey,)).fetchall()
+
+
+_DB_WORD_LIST_SQL = '''
+    CREATE TABLE IF NOT EXISTS word_list (
+        id INTEGER PRIMARY KEY,
+        word TEXT NOT NULL UNIQUE
+    )
+'''
+
+
+# word_list(id, word): distinct words of words table,
+# with word_fts, a fts5 trigram index of word_list for substring search,
+# filled when first created, then maintained by triggers on words (strings if normalized)
+#
+# the sqlite library must be built with fts5 (3.34 or later for trigram),
+# otherwise nothing is created and dbSqliteWordMatch falls back to scanning words
+def dbSqliteWordIndexInit(conn):
+    exist = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'word_fts'").fetchone()
+    if not exist:
+        try:
+            conn.execute('''
+                CREATE VIRTUAL TABLE word_fts USING fts5(
+                    word,
+                    content = 'word_list',
+                    content_rowid = 'id',
+                    tokenize = 'trigram case_sensitive 1'
+                )
+            ''')
+        except sqlite3.OperationalError:
+            return False
+    if dbSqliteIsNormalized(conn):
+        # word_list is a view of strings, see dbSqliteNormalizedInit
+        if not exist:
+            conn.execute("INSERT INTO word_fts (word_fts) VALUES ('rebuild')")
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS strings_fts_insert AFTER INSERT ON strings BEGIN
+                INSERT INTO word_fts (rowid, word) VALUES (NEW.id, NEW.word);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS strings_fts_delete AFTER DELETE ON strings BEGIN
+                INSERT INTO word_fts (word_fts, rowid, word) VALUES ('delete', OLD.id, OLD.word);
+            END
+        ''')
+        return True
+    conn.execute(_DB_WORD_LIST_SQL)
+    if not exist:
+        conn.execute('INSERT OR IGNORE INTO word_list (word) SELECT DISTINCT word FROM words')
+        conn.execute("INSERT INTO word_fts (word_fts) VALUES ('rebuild')")
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS word_list_fts_insert AFTER INSERT ON word_list BEGIN
+            INSERT INTO word_fts (rowid, word) VALUES (NEW.id, NEW.word);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS word_list_fts_delete AFTER DELETE ON word_list BEGIN
+            INSERT INTO word_fts (word_fts, rowid, word) VALUES ('delete', OLD.id, OLD.word);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS words_word_insert AFTER INSERT ON words BEGIN
+            INSERT OR IGNORE INTO word_list (word) VALUES (NEW.word);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS words_word_delete AFTER DELETE ON words
+        WHEN NOT EXISTS (SELECT 1 FROM words WHERE word = OLD.word) BEGIN
+            DELETE FROM word_list WHERE word = OLD.word;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS words_word_update AFTER UPDATE OF word ON words BEGIN
+            INSERT OR IGNORE INTO word_list (word) VALUES (NEW.word);
+            DELETE FROM word_list WHERE word = OLD.word AND NOT EXISTS (SELECT 1 FROM words WHERE word = OLD.word);
+        END
+    ''')
+    return True
+
+
+def dbSqliteHasWordIndex(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'word_fts'").fetchone() is not None
+
+
+# search modes of dbSqliteWordMatch / dbSqliteWordSearch
+DB_WORD_SEARCH_EXACT = 'exact'
+DB_WORD_SEARCH_PREFIX = 'prefix'
+DB_WORD_SEARCH_SUBSTRING = 'substring'
+
+
+# return (sql, params) selecting column `word` of distinct words matching text
+def _dbSqliteWordMatchQuery(conn, text, mode):
+    if mode == DB_WORD_SEARCH_EXACT:
+        return ('SELECT ? AS word', (text,))
+    if mode == DB_WORD_SEARCH_PREFIX:
+        # range scan on idx_word
+        return ('SELECT DISTINCT word FROM words WHERE word >= ? AND word < ?', (text, text + '\U0010FFFF'))
+    if mode != DB_WORD_SEARCH_SUBSTRING:
+        raise ValueError('unknown search mode: ' + str(mode))
+    if not dbSqliteHasWordIndex(conn):
+        return ('SELECT DISTINCT word FROM words WHERE instr(word, ?) > 0', (text,))
+    # trigram index only works for 3 or more characters
+    if len(text) >= 3:
+        return ('SELECT word FROM word_fts WHERE word_fts MATCH ?', ('"' + text.replace('"', '""') + '"',))
+    return ('SELECT word FROM word_list WHERE instr(word, ?) > 0', (text,))
+
+
+# return list of distinct words matching text
+def dbSqliteWordMatch(conn, text, mode=DB_WORD_SEARCH_SUBSTRING):
+    sql, params = _dbSqliteWordMatchQuery(conn, text, mode)
+    return [row[0] for row in conn.execute(sql, params)]
+
+
+# return: {
+#   '' : db id,
+#   'a' : version of bucket 'a',
+#   ...
+# }
+def dbSqliteBucketVersions(conn):
+    return dict(conn.execute('SELECT bucket, version FROM bucket_version').fetchall())
+
+
+def dbSqliteHasFrequency(conn):
+    columns = [col[1] for col in conn.execute('PRAGMA table_info(words)').fetchall()]
+    return 'frequency' in columns
+
+
+# return the new frequency, the word is inserted if not exist
+def dbSqliteFrequencyAdd(conn, key, word, increment=1):
+    if dbSqliteIsNormalized(conn):
+        if dbSqliteFrequencyAddBatch(conn, {(key, word) : increment}) == 0:
+            dbSqliteWordAdd(conn, key, word, increment)
+        return conn.execute('SELECT frequency FROM words WHERE key = ? AND word = ?', (key, word)).fetchone()[0]
+    row = conn.execute('SELECT frequency FROM words WHERE key = ? AND word = ?', (key, word)).fetchone()
+    if row is None:
+        conn.execute('INSERT INTO words (key, word, frequency) VALUES (?, ?, ?)', (key, word, increment))
+        return increment
+    frequency = min((row[0] or 0) + increment, DB_FREQUENCY_MAX)
+    conn.execute('UPDATE words SET frequency = ? WHERE key = ? AND word = ?', (frequency, key, word))
+    return frequency
+
+
+# deltaMap: {(key, word) : increment}, words not exist are ignored,
+# so that a word removed while its bumps wait in the journal is not brought back
+# return number of words updated
+def dbSqliteFrequencyAddBatch(conn, deltaMap):
+    if not dbSqliteIsNormalized(conn):
+        return max(conn.executemany('UPDATE words SET frequency = MIN(IFNULL(frequency, 0) + ?, ?) WHERE key = ? AND word = ?',
+                [(delta, DB_FREQUENCY_MAX, key, word) for (key, word), delta in dbMapIter(deltaMap)]).rowcount, 0)
+    keyIds = _dbSqliteInternIds(conn, 'keys', 'key', [key for (key, word) in deltaMap.keys()], insertMissing=False)
+    wordIds = _dbSqliteInternIds(conn, 'strings', 'word', [word for (key, word) in deltaMap.keys()], insertMissing=False)
+    return max(conn.executemany('UPDATE entries SET frequency = MIN(IFNULL(frequency, 0) + ?, ?) WHERE key_id = ? AND word_id = ?',
+            [(delta, DB_FREQUENCY_MAX, keyIds[key], wordIds[word]) for (key, word), delta in dbMapIter(deltaMap)
+                if key in keyIds and word in wordIds]).rowcount, 0)
+
+
+# rows: iterable of (key, word, frequency), words not exist are ignored,
+# words whose frequency is not changed are not written, so their buckets keep the version
+# return number of words updated
+def dbSqliteFrequencySet(conn, rows):
+    if not dbSqliteIsNormalized(conn):
+        cursor = conn.executemany('UPDATE words SET frequency = ? WHERE key = ? AND word = ? AND frequency IS NOT ?',
+                ((frequency, key, word, frequency) for key, word, frequency in rows))
+        return max(cursor.rowcount, 0)
+    updated = 0
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, DB_SQLITE_PARAM_BATCH))
+        if len(batch) == 0:
+            break
+        keyIds = _dbSqliteInternIds(conn, 'keys', 'key', [key for key, word, frequency in batch], insertMissing=False)
+        wordIds = _dbSqliteInternIds(conn, 'strings', 'word', [word for key, word, frequency in batch], insertMissing=False)
+        cursor = conn.executemany('UPDATE entries SET frequency = ? WHERE key_id = ? AND word_id = ? AND frequency IS NOT ?',
+                [(frequency, keyIds[key], wordIds[word], frequency) for key, word, frequency in batch
+                    if key in keyIds and word in wordIds])
+        updated += max(cursor.rowcount, 0)
+    return updated
+
+
+# return 1 if added, 0 if already exist
+def dbSqliteWordAdd(conn, key, word, frequency=0):
+    if dbSqliteIsNormalized(conn):
+        keyId = _dbSqliteInternIds(conn, 'keys', 'key', [key])[key]
+        wordId = _dbSqliteInternIds(conn, 'strings', 'word', [word])[word]
+        cursor = conn.execute('INSERT OR IGNORE INTO entries (key_id, word_id, frequency) VALUES (?, ?, ?)', (keyId, wordId, frequency))
+        return cursor.rowcount
+    cursor = conn.execute('INSERT OR IGNORE INTO words (key, word, frequency) VALUES (?, ?, ?)', (key, word, frequency))
+    return cursor.rowcount
+
+
+# insert rows (key, word, frequency) of table into words, existing (key, word) are kept,
+# return number of rows inserted
+def dbSqliteWordsInsertFrom(conn, table):
+    if not dbSqliteIsNormalized(conn):
+        return conn.execute(f'''
+            INSERT OR IGNORE INTO words (key, word, frequency)
+            SELECT key, word, frequency FROM {table} ORDER BY key, word
+        ''').rowcount
+    conn.execute(f'INSERT OR IGNORE INTO keys (key) SELECT DISTINCT key FROM {table} ORDER BY key')
+    conn.execute(f'INSERT OR IGNORE INTO strings (word) SELECT DISTINCT word FROM {table} ORDER BY word')
+    return conn.execute(f'''
+        INSERT OR IGNORE INTO entries (key_id, word_id, frequency)
+        SELECT keys.id, strings.id, t.frequency
+        FROM {table} AS t JOIN keys ON keys.key = t.key JOIN strings ON strings.word = t.word
+        ORDER BY keys.id, strings.id
+    ''').rowcount
+
+
+# key: remove only the words of this key, None for all keys
+# return: {
+#   'word' : removedRecordCount,
+# }
+def dbSqliteWordRemove(conn, word, fuzzy=False, key=None):
+    removed = {}
+    if fuzzy:
+        matchingWords = dbSqliteWordMatch(conn, word, DB_WORD_SEARCH_SUBSTRING)
+    else:
+        matchingWords = [word]
+    keyClause = '' if key is None else ' AND key = ?'
+    keyParams = [] if key is None else [key]
+    for i in range(0, len(matchingWords), DB_SQLITE_PARAM_BATCH):
+        batch = matchingWords[i:i + DB_SQLITE_PARAM_BATCH]
+        placeholder = ','.join('?' * len(batch))
+        for matchingWord, count in conn.execute('SELECT word, COUNT(*) FROM words WHERE word IN (' + placeholder + ')' + keyClause + ' GROUP BY word', batch + keyParams):
+            removed[matchingWord] = count
+        conn.execute('DELETE FROM words WHERE word IN (' + placeholder + ')' + keyClause, batch + keyParams)
+        conn.execute('DELETE FROM usage WHERE word IN (' + placeholder + ')' + keyClause, batch + keyParams)
+    return removed
+
+
+# same as the 'reorder' action of dbEditApplyPy:
+# move the word to half of the key's total frequency
+def dbSqliteWordReorder(conn, key, word):
+    rows = conn.execute('SELECT word, frequency FROM words WHERE key = ?', (key,)).fetchall()
+    if word not in [row[0] for row in rows]:
+        return False
+    sum = 0
+    for w, frequency in rows:
+        if w != word:
+            sum += (frequency or 0)
+    conn.execute('UPDATE words SET frequency = ? WHERE key = ? AND word = ?', (int(sum / 2), key, word))
+    return True
+
+
+# return list of (key, word, frequency)
+# mode: DB_WORD_SEARCH_xxx, default to DB_WORD_SEARCH_SUBSTRING if fuzzy, DB_WORD_SEARCH_EXACT otherwise
+def dbSqliteWordSearch(conn, word, fuzzy=False, mode=None):
+    if mode is None:
+        mode = DB_WORD_SEARCH_SUBSTRING if fuzzy else DB_WORD_SEARCH_EXACT
+    sql, params = _dbSqliteWordMatchQuery(conn, word, mode)
+    cursor = conn.execute('SELECT key, word, frequency FROM words WHERE word IN (' + sql + ') ORDER BY key, frequency DESC', params)
+    return [(row[0], row[1], row[2] or 0) for row in cursor]
+
+
+# apply edits of the same form as dbEditApplyPy to SQLite: [
+#   {'action' : 'add', 'key' : 'ceshi', 'word' : '测试'},       -> 1 if added, 0 if already exist
+#   {'action' : 'remove', 'key' : 'ceshi', 'word' : '测试'},    -> {word : removedRecordCount}, see dbSqliteWordRemove
+#                                                               (key and 'fuzzy' are optional)
+#   {'action' : 'reorder', 'key' : 'ceshi', 'word' : '测试'},   -> True / False
+# ]
+# all edits are in one transaction, each in its own savepoint,
+# so a failed edit is rolled back alone, the caller commits once for all
+#
+# return list of {'result' : ...} or {'error' : '...'}, in order of dbEdit
+def dbSqliteEditApply(conn, dbEdit):
+    if not conn.in_transaction:
+        conn.execute('BEGIN IMMEDIATE')
+    resultList = []
+    for e in dbEdit:
+        conn.execute('SAVEPOINT db_edit')
+        try:
+            action = e.get('action', None)
+            key = e.get('key', None)
+            word = e.get('word', None)
+            if not word or (not key and action != 'remove'):
+                raise ValueError('key or word is empty')
+            if action == 'add':
+                result = dbSqliteWordAdd(conn, key, word, int(e.get('frequency', 0)))
+            elif action == 'remove':
+                result = dbSqliteWordRemove(conn, word, e.get('fuzzy', False), key or None)
+            elif action == 'reorder':
+                result = dbSqliteWordReorder(conn, key, word)
+            else:
+                raise ValueError('unknown action: ' + str(action))
+            conn.execute('RELEASE db_edit')
+            resultList.append({'result' : result})
+        except Exception as err:
+            conn.execute('ROLLBACK TO db_edit')
+            conn.execute('RELEASE db_edit')
+            resultList.append({'error' : str(err)})
+    return resultList
+
+
+# ============================================================
+# usage(key, word, count, last_used): how often and how recently a word is committed
+#
+# count is the count as of last_used (unix time in seconds),
+# which decays by half every DB_USAGE_HALF_LIFE seconds,
+# the decay is applied lazily, when reading (dbUsageScore) and when the word is used again (dbUsageAdd),
+# only the top DB_USAGE_KEEP_MAX rows by score are kept (dbSqliteUsagePrune)
+
+DB_USAGE_HALF_LIFE = 14 * 24 * 3600
+DB_USAGE_COUNT_MAX = 1000
+DB_USAGE_KEEP_MAX = 10000
+# pruned only when this many rows more than DB_USAGE_KEEP_MAX
+DB_USAGE_KEEP_SLACK = 1000
+
+
+def dbSqliteUsageInit(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS usage (
+            key TEXT NOT NULL,
+            word TEXT NOT NULL,
+            count REAL NOT NULL DEFAULT 0,
+            last_used INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (key, word)
+        ) WITHOUT ROWID
+    ''')
+
+
+def dbUsageScore(count, lastUsed, now):
+    if now <= lastUsed:
+        return count
+    return count * math.pow(0.5, float(now - lastUsed) / DB_USAGE_HALF_LIFE)
+
+
+# return (count, lastUsed) after the word is used at time now
+def dbUsageAdd(count, lastUsed, increment, now):
+    if now < lastUsed:
+        # out of order, count it at lastUsed
+        now = lastUsed
+    return (min(dbUsageScore(count, lastUsed, now) + increment, DB_USAGE_COUNT_MAX), now)
+
+
+# usageList: [(key, word, increment, usedTime), ...], in order of usedTime
+def dbSqliteUsageApply(conn, usageList):
+    usageMap = {}
+    for key, word, increment, usedTime in usageList:
+        state = usageMap.get((key, word), None)
+        if state is None:
+            row = conn.execute('SELECT count, last_used FROM usage WHERE key = ? AND word = ?', (key, word)).fetchone()
+            state = (row[0], row[1]) if row is not None else (0, 0)
+        usageMap[(key, word)] = dbUsageAdd(state[0], state[1], increment, usedTime)
+    conn.executemany('INSERT OR REPLACE INTO usage (key, word, count, last_used) VALUES (?, ?, ?, ?)',
+            [(key, word, count, lastUsed) for (key, word), (count, lastUsed) in dbMapIter(usageMap)])
+    return len(usageMap)
+
+
+# return [(key, word, count, last_used), ...], highest score first
+def dbSqliteUsageList(conn, now=None):
+    if now is None:
+        now = int(time.time())
+    rows = conn.execute('SELECT key, word, count, last_used FROM usage').fetchall()
+    rows.sort(key=lambda row: -dbUsageScore(row[2], row[3], now))
+    return rows
+
+
+# remove rows out of top keepMax, only when more than keepMax + DB_USAGE_KEEP_SLACK rows,
+# return number of rows removed
+def dbSqliteUsagePrune(conn, keepMax=DB_USAGE_KEEP_MAX, now=None):
+    rowCount = conn.execute('SELECT COUNT(*) FROM usage').fetchone()[0]
+    if rowCount <= keepMax + DB_USAGE_KEEP_SLACK:
+        return 0
+    removeList = [(row[0], row[1]) for row in dbSqliteUsageList(conn, now)[keepMax:]]
+    conn.executemany('DELETE FROM usage WHERE key = ? AND word = ?', removeList)
+    return len(removeList)
+
+
+# import `key<tab>word<tab>count` lines saved by older versions,
+# only when usage is empty, the counts are taken as used at time now
+def dbSqliteUsageImport(conn, freqFile, now=None):
+    if not freqFile or not os.path.isfile(freqFile):
+        return 0
+    if conn.execute('SELECT 1 FROM usage LIMIT 1').fetchone() is not None:
+        return 0
+    if now is None:
+        now = int(time.time())
+    rows = []
+    with io.open(freqFile, 'r', encoding='utf-8', errors='replace') as file:
+        for line in file:
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) < 2 or not parts[0] or not parts[1]:
+                continue
+            try:
+                count = int(parts[2]) if len(parts) >= 3 else 1
+            except ValueError:
+                continue
+            if count > 0:
+                rows.append((parts[0], parts[1], min(count, DB_USAGE_COUNT_MAX), now))
+    conn.executemany('INSERT OR REPLACE INTO usage (key, word, count, last_used) VALUES (?, ?, ?, ?)', rows)
+    dbSqliteUsagePrune(conn, now=now)
+    return len(rows)
+
+
+# ============================================================
+# bigram(prev, word, count): how many times word is committed right after prev
+#
+# counted through the journal along with the frequency of word (see dbJournalAppend),
+# count is capped at DB_BIGRAM_COUNT_MAX,
+# only the top DB_BIGRAM_KEEP_MAX rows by count are kept (dbSqliteBigramPrune)
+
+DB_BIGRAM_COUNT_MAX = 1000
+DB_BIGRAM_KEEP_MAX = 20000
+# pruned only when this many rows more than DB_BIGRAM_KEEP_MAX
+DB_BIGRAM_KEEP_SLACK = 2000
+
+
+def dbSqliteBigramInit(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS bigram (
+            prev TEXT NOT NULL,
+            word TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (prev, word)
+        ) WITHOUT ROWID
+    ''')
+
+
+def dbSqliteHasBigram(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bigram'").fetchone() is not None
+
+
+# deltaMap: {(prev, word) : delta}
+def dbSqliteBigramAddBatch(conn, deltaMap):
+    rows = []
+    for (prev, word), delta in dbMapIter(deltaMap):
+        row = conn.execute('SELECT count FROM bigram WHERE prev = ? AND word = ?', (prev, word)).fetchone()
+        rows.append((prev, word, min((row[0] if row is not None else 0) + delta, DB_BIGRAM_COUNT_MAX)))
+    conn.executemany('INSERT OR REPLACE INTO bigram (prev, word, count) VALUES (?, ?, ?)', rows)
+    return len(rows)
+
+
+# return [(prev, word, count), ...], highest count first
+def dbSqliteBigramList(conn):
+    return conn.execute('SELECT prev, word, count FROM bigram ORDER BY count DESC').fetchall()
+
+
+# remove rows out of top keepMax, only when more than keepMax + DB_BIGRAM_KEEP_SLACK rows,
+# return number of rows removed
+def dbSqliteBigramPrune(conn, keepMax=DB_BIGRAM_KEEP_MAX):
+    rowCount = conn.execute('SELECT COUNT(*) FROM bigram').fetchone()[0]
+    if rowCount <= keepMax + DB_BIGRAM_KEEP_SLACK:
+        return 0
+    removeList = [(row[0], row[1]) for row in dbSqliteBigramList(conn)[keepMax:]]
+    conn.executemany('DELETE FROM bigram WHERE prev = ? AND word = ?', removeList)
+    return len(removeList)
+
+
+# import `prev<tab>word<tab>count` lines saved by older versions, only when bigram is empty
+def dbSqliteBigramImport(conn, bigramFile):
+    if not bigramFile or not os.path.isfile(bigramFile):
+        return 0
+    if conn.execute('SELECT 1 FROM bigram LIMIT 1').fetchone() is not None:
+        return 0
+    rows = []
+    with io.open(bigramFile, 'r', encoding='utf-8', errors='replace') as file:
+        for line in file:
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) < 3 or not parts[0] or not parts[1]:
+                continue
+            try:
+                count = int(parts[2])
+            except ValueError:
+                continue
+            if count > 0:
+                rows.append((parts[0], parts[1], min(count, DB_BIGRAM_COUNT_MAX)))
+    conn.executemany('INSERT OR REPLACE INTO bigram (prev, word, count) VALUES (?, ?, ?)', rows)
+    dbSqliteBigramPrune(conn)
+    return len(rows)
+
+
+# ============================================================
+# write-behind frequency journal
+#
+# frequency bumps are appended to '<dbFile>.journal' (one json list
+# [key, word, delta] per line, or [key, word, delta, usedTime] if the word is used,
+# or [key, word, delta, usedTime, prevWord] if it's committed right after prevWord),
+# then flushed into the words, usage and bigram table by dbJournalFlush() in one transaction
+#
+# the first line of the journal is '#journal <generation>',
+# the flushed offset of current generation is stored in journal_state
+# table within the same transaction that applies the records,
+# so replay after crash never applies one record twice,
+# the generation is random, so that two journal files never share one
+#
+# read-only requests don't flush, dbJournalPending() gives the deltas not flushed yet
+#
+# several processes (one server per vim) may share one journal,
+# append and flush hold a lock on '<dbFile>.journal.lock', which is never replaced,
+# and a file opened for append is opened again when the journal has been replaced by a flush
+#
+# the db file may be replaced by a rebuilt one (dbSqliteRebuildReplace) while a server keeps it open,
+# flush is skipped then, so that records are not applied to the old file,
+# the server should open the db and the journal again, see dbJournalDbReplaced
+
+DB_JOURNAL_FLUSH_SIZE = 200
+
+
+def dbJournalPath(dbFile):
+    return dbFile + '.journal'
+
+
+def _dbJournalCreate(journalFile):
+    generation = os.urandom(8).hex()
+    tmpFile = journalFile + '.tmp'
+    with io.open(tmpFile, 'wb') as file:
+        file.write(('#journal ' + generation + '\n').encode('utf-8'))
+    os.replace(tmpFile, journalFile)
+    return generation
+
+
+# identity of the file at path, None if not exist
+def _dbFileId(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_dev, stat.st_ino)
+
+
+def _dbJournalStateInit(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS journal_state (
+            generation TEXT PRIMARY KEY,
+            offset INTEGER NOT NULL
+        )
+    ''')
+
+
+# return: {
+#   'path' : journal file path,
+#   'dbFileId' : identity of the db file when opened, see dbJournalDbReplaced,
+#   'generation' : generation of current journal file,
+#   'file' : file opened for append,
+#   'lock' : lock file, None if not locked yet or no fcntl,
+#   'count' : records appended since last flush,
+#   'pending' : {(key, word) : delta} appended since last flush,
+# }
+def dbJournalOpen(conn, dbFile):
+    journal = {
+        'path' : dbJournalPath(dbFile),
+        'dbFileId' : _dbFileId(dbFile),
+        'generation' : '',
+        'file' : None,
+        'lock' : None,
+        'count' : 0,
+        'pending' : {},
+    }
+    _dbJournalStateInit(conn)
+    conn.commit()
+    # replay records left by previous process
+    dbJournalFlush(conn, journal)
+    return journal
+
+
+# whether the db file has been replaced since the journal is opened,
+# conn should be closed, then open the db and the journal again
+def dbJournalDbReplaced(journal):
+    return _dbFileId(journal['path'][:-len('.journal')]) != journal['dbFileId']
+
+
+def dbJournalClose(conn, journal):
+    dbJournalFlush(conn, journal)
+    _dbJournalCloseFiles(journal)
+
+
+def _dbJournalCloseFiles(journal):
+    if journal['file'] is not None:
+        journal['file'].close()
+        journal['file'] = None
+    if journal['lock'] is not None:
+        journal['lock'].close()
+        journal['lock'] = None
+
+
+def _dbJournalLock(journal):
+    if fcntl is None:
+        return
+    if journal['lock'] is None:
+        journal['lock'] = io.open(journal['path'] + '.lock', 'ab')
+    fcntl.flock(journal['lock'].fileno(), fcntl.LOCK_EX)
+
+
+def _dbJournalUnlock(journal):
+    if journal['lock'] is not None:
+        fcntl.flock(journal['lock'].fileno(), fcntl.LOCK_UN)
+
+
+# close the file opened for append if another process has flushed and replaced the journal,
+# the records appended to it are applied then and no longer pending
+def _dbJournalCheckReplaced(journal):
+    if journal['file'] is None:
+        return
+    try:
+        stat = os.stat(journal['path'])
+    except OSError:
+        stat = None
+    fileStat = os.fstat(journal['file'].fileno())
+    if stat is not None and stat.st_ino == fileStat.st_ino and stat.st_dev == fileStat.st_dev:
+        return
+    journal['file'].close()
+    journal['file'] = None
+    journal['count'] = 0
+    journal['pending'] = {}
+
+
+# usedTime: unix time the word is used at, None if not a use of the word
+# prevWord: word committed right before word, for bigram table, None if not recorded
+def dbJournalAppend(journal, key, word, delta, usedTime=None, prevWord=None):
+    record = [key, word, delta]
+    if usedTime is not None or prevWord:
+        record.append(None if usedTime is None else int(usedTime))
+    if prevWord:
+        record.append(prevWord)
+    _dbJournalLock(journal)
+    try:
+        _dbJournalCheckReplaced(journal)
+        if journal['file'] is None:
+            if not os.path.isfile(journal['path']):
+                journal['generation'] = _dbJournalCreate(journal['path'])
+            journal['file'] = io.open(journal['path'], 'ab')
+        journal['file'].write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+        journal['file'].flush()
+    finally:
+        _dbJournalUnlock(journal)
+    journal['count'] += 1
+    journal['pending'][(key, word)] = journal['pending'].get((key, word), 0) + delta
+    return journal['count'] >= DB_JOURNAL_FLUSH_SIZE
+
+
+# frequency delta of (key, word) appended but not flushed yet
+def dbJournalPending(journal, key, word):
+    _dbJournalCheckReplaced(journal)
+    return journal['pending'].get((key, word), 0)
+
+
+# apply all complete records in journal to words and usage table,
+# nothing is written if there's no record past the flushed offset
+# return number of (key, word) pairs updated
+def dbJournalFlush(conn, journal):
+    _dbJournalLock(journal)
+    try:
+        if dbJournalDbReplaced(journal):
+            # kept in the journal for the new db
+            return 0
+        return _dbJournalFlushLocked(conn, journal)
+    finally:
+        _dbJournalUnlock(journal)
+
+
+def _dbJournalFlushLocked(conn, journal):
+    if journal['file'] is not None:
+        journal['file'].close()
+        journal['file'] = None
+    journal['count'] = 0
+    journal['pending'] = {}
+    if not os.path.isfile(journal['path']):
+        journal['generation'] = _dbJournalCreate(journal['path'])
+        return 0
+
+    with io.open(journal['path'], 'rb') as file:
+        header = file.readline()
+        data = file.read()
+    headerText = header.decode('utf-8', 'replace').strip()
+    if not header.endswith(b'\n') or not headerText.startswith('#journal '):
+        # broken header, nothing can be trusted
+        journal['generation'] = _dbJournalCreate(journal['path'])
+        return 0
+    generation = headerText[len('#journal '):]
+
+    _dbJournalStateInit(conn)
+    row = conn.execute('SELECT offset FROM journal_state WHERE generation = ?', (generation,)).fetchone()
+    offset = row[0] if row is not None else 0
+    # ignore trailing incomplete record
+    end = data.rfind(b'\n') + 1
+    if end <= offset and end == len(data):
+        # keep appending to the current file,
+        # unless it ends with an incomplete record left by a crash
+        journal['generation'] = generation
+        return 0
+
+    deltaMap = {}
+    usageList = []
+    bigramMap = {}
+    if end > offset:
+        for line in data[offset:end].decode('utf-8', 'replace').split('\n'):
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                key, word, delta = record[0:3]
+                delta = int(delta)
+                usedTime = int(record[3]) if len(record) >= 4 and record[3] is not None else None
+                prevWord = record[4] if len(record) >= 5 else None
+            except (ValueError, TypeError):
+                continue
+            deltaMap[(key, word)] = deltaMap.get((key, word), 0) + delta
+            if usedTime is not None:
+                usageList.append((key, word, 1, usedTime))
+            if prevWord:
+                bigramMap[(prevWord, word)] = bigramMap.get((prevWord, word), 0) + 1
+
+    updated = 0
+    if deltaMap:
+        updated = dbSqliteFrequencyAddBatch(conn, deltaMap)
+    if usageList:
+        # same as frequency, words removed meanwhile are not brought back
+        existMap = {}
+        for key, word, increment, usedTime in usageList:
+            if (key, word) not in existMap:
+                existMap[(key, word)] = conn.execute('SELECT 1 FROM words WHERE key = ? AND word = ?', (key, word)).fetchone() is not None
+        usageList = [usage for usage in usageList if existMap[(usage[0], usage[1])]]
+    if usageList:
+        dbSqliteUsageInit(conn)
+        usageList.sort(key=lambda x: x[3])
+        dbSqliteUsageApply(conn, usageList)
+        dbSqliteUsagePrune(conn)
+    if bigramMap:
+        dbSqliteBigramInit(conn)
+        dbSqliteBigramAddBatch(conn, bigramMap)
+        dbSqliteBigramPrune(conn)
+    conn.execute('DELETE FROM journal_state')
+    conn.execute('INSERT INTO journal_state (generation, offset) VALUES (?, ?)', (generation, end))
+    conn.commit()
+
+    # start a new generation, records of the old one are all applied
+    journal['generation'] = _dbJournalCreate(journal['path'])
+    return updated
+
+
+# copy usage, bigram and journal_state of oldDbFile to conn, for a db rebuilt to replace oldDbFile,
+# so that usage history is kept, and the journal is not replayed again,
+# the journal should be flushed to oldDbFile before, see dbSqliteRebuildReplace
+# return number of usage rows copied
+def dbSqliteStateCopy(conn, oldDbFile):
+    if not os.path.isfile(oldDbFile):
+        return 0
+    dbSqliteUsageInit(conn)
+    dbSqliteBigramInit(conn)
+    _dbJournalStateInit(conn)
+    conn.execute('ATTACH DATABASE ? AS old_db', (oldDbFile,))
+    try:
+        oldTables = set(row[0] for row in conn.execute("SELECT name FROM old_db.sqlite_master WHERE type = 'table'"))
+        copied = 0
+        if 'usage' in oldTables:
+            copied = conn.execute('''
+                INSERT OR REPLACE INTO main.usage (key, word, count, last_used)
+                SELECT key, word, count, last_used FROM old_db.usage
+            ''').rowcount
+        if 'bigram' in oldTables:
+            conn.execute('INSERT OR REPLACE INTO main.bigram (prev, word, count) SELECT prev, word, count FROM old_db.bigram')
+        if 'journal_state' in oldTables:
+            conn.execute('DELETE FROM main.journal_state')
+            conn.execute('INSERT INTO main.journal_state (generation, offset) SELECT generation, offset FROM old_db.journal_state')
+        conn.commit()
+    finally:
+        conn.execute('DETACH DATABASE old_db')
+    return copied
+
+
+# replace dbFile by newDbFile, which is rebuilt from scratch and opened by conn,
+# conn is closed when done
+#
+# records of the journal are flushed to dbFile first, then usage, bigram and journal_state are copied,
+# all within the journal lock, so no record is lost or applied twice,
+# records appended after are applied to the new db by the next flush,
+# running servers open the db again when they see it replaced, see dbJournalDbReplaced
+# return number of usage rows copied
+def dbSqliteRebuildReplace(conn, newDbFile, dbFile):
+    if not os.path.isfile(dbFile):
+        conn.close()
+        os.replace(newDbFile, dbFile)
+        return 0
+    oldConn = dbSqliteOpen(dbFile)
+    try:
+        journal = dbJournalOpen(oldConn, dbFile)
+        _dbJournalLock(journal)
+        try:
+            _dbJournalFlushLocked(oldConn, journal)
+            oldConn.close()
+            copied = dbSqliteStateCopy(conn, dbFile)
+            conn.close()
+            os.replace(newDbFile, dbFile)
+        finally:
+            _dbJournalUnlock(journal)
+            _dbJournalCloseFiles(journal)
+    finally:
+        oldConn.close()
+    return copied
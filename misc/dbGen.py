@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成测试用的词库文件（key word1:freq word2:freq ...），同样的参数总是生成同样的内容
+
+按声笔自然码词库的大致形状生成：
+* 编码 2~8 个字母，4 码最多，首字母按声母的常见程度分布
+* 编码越短，重码越多（每个编码的词数）
+* 词由 CJK 汉字组成，字数随编码长度增加，常用字出现得更多
+* 词频大多为 0，少数很高（长尾分布）
+
+用法:
+    python3 dbGen.py <rows> <txt_file> [seed]
+
+示例:
+    python3 dbGen.py 100000 /tmp/bench/sbzr.yaml
+"""
+
+import bisect
+import io
+import itertools
+import random
+import sys
+import time
+
+import dbFunc
+
+
+# (key length, weight)
+DB_GEN_KEY_LEN_WEIGHTS = [(2, 4), (3, 12), (4, 40), (5, 12), (6, 16), (7, 8), (8, 8)]
+# first letter of key, most keys start with an initial consonant
+DB_GEN_FIRST_LETTER_WEIGHTS = {
+    'a' : 1, 'b' : 6, 'c' : 4, 'd' : 6, 'e' : 1, 'f' : 3, 'g' : 4, 'h' : 5, 'i' : 1,
+    'j' : 6, 'k' : 3, 'l' : 6, 'm' : 4, 'n' : 3, 'o' : 1, 'p' : 3, 'q' : 4, 'r' : 2,
+    's' : 7, 't' : 5, 'u' : 1, 'v' : 1, 'w' : 4, 'x' : 5, 'y' : 6, 'z' : 7,
+}
+# mean words per key, by key length
+DB_GEN_FANOUT_MEAN = {2 : 8.0, 3 : 4.0, 4 : 2.0, 5 : 1.5, 6 : 1.3, 7 : 1.2, 8 : 1.1}
+DB_GEN_FANOUT_MAX = 64
+# (min, max) chars of word, by key length
+DB_GEN_WORD_LEN = {2 : (1, 1), 3 : (1, 1), 4 : (1, 2), 5 : (2, 2), 6 : (2, 3), 7 : (3, 3), 8 : (3, 4)}
+# CJK Unified Ideographs 0x4E00 ~ 0x9FA5, lower code points are taken as more common
+DB_GEN_CHAR_BASE = 0x4E00
+DB_GEN_CHAR_COUNT = 0x9FA6 - 0x4E00
+# frequency = paretovariate(alpha) - 1, smaller alpha for longer tail
+DB_GEN_FREQUENCY_ALPHA = 1.2
+# coprime with 26, so that (index + 1) * DB_GEN_KEY_STEP covers each key space once
+DB_GEN_KEY_STEP = 1000003
+
+
+# pick one of [(item, weight), ...] by weight
+class _DbGenWeighted(object):
+    def __init__(self, items):
+        self.itemList = [item for item, _ in items]
+        self.cumWeights = list(itertools.accumulate(weight for _, weight in items))
+
+    def pick(self, rand):
+        return self.itemList[bisect.bisect_right(self.cumWeights, rand.random() * self.cumWeights[-1])]
+
+
+class DbGen(object):
+    def __init__(self, seed):
+        self.rand = random.Random(seed)
+        self.keyLen = _DbGenWeighted(DB_GEN_KEY_LEN_WEIGHTS)
+        self.firstLetter = _DbGenWeighted(sorted(DB_GEN_FIRST_LETTER_WEIGHTS.items()))
+        # (key length, first letter) -> number of keys generated
+        self.keyCounter = {}
+
+    # return (keyLen, key), key is unique, or None if all keys of the chosen first letter are used
+    def genKey(self):
+        keyLen = self.keyLen.pick(self.rand)
+        c = self.firstLetter.pick(self.rand)
+        # short key spaces run out first, move on to longer keys
+        while keyLen <= 8:
+            space = 26 ** (keyLen - 1)
+            index = self.keyCounter.get((keyLen, c), 0)
+            if index < space:
+                self.keyCounter[(keyLen, c)] = index + 1
+                n = ((index + 1) * DB_GEN_KEY_STEP) % space
+                key = ''
+                for _ in range(keyLen - 1):
+                    key = chr(ord('a') + n % 26) + key
+                    n //= 26
+                return (keyLen, c + key)
+            keyLen += 1
+        return (8, None)
+
+    def genWord(self, keyLen):
+        wordLenMin, wordLenMax = DB_GEN_WORD_LEN[keyLen]
+        wordLen = self.rand.randint(wordLenMin, wordLenMax)
+        return ''.join(chr(DB_GEN_CHAR_BASE + int(DB_GEN_CHAR_COUNT * self.rand.random() ** 3))
+                for _ in range(wordLen))
+
+    # yield (key, [(word, frequency), ...]) until `rows` (key, word) pairs generated,
+    # words of each key in order of frequency
+    def genRows(self, rows):
+        remain = rows
+        while remain > 0:
+            keyLen, key = self.genKey()
+            if key is None:
+                continue
+            mean = DB_GEN_FANOUT_MEAN[keyLen]
+            fanout = 1 + int(self.rand.expovariate(1.0 / (mean - 1))) if mean > 1 else 1
+            fanout = min(fanout, DB_GEN_FANOUT_MAX, remain)
+            wordMap = {}
+            while len(wordMap) < fanout:
+                word = self.genWord(keyLen)
+                if word not in wordMap:
+                    frequency = int(self.rand.paretovariate(DB_GEN_FREQUENCY_ALPHA)) - 1
+                    wordMap[word] = min(frequency, dbFunc.DB_FREQUENCY_MAX)
+            remain -= fanout
+            yield (key, sorted(wordMap.items(), key=lambda x: -x[1]))
+
+
+def dbGenRows(rows, seed=None):
+    return DbGen(rows if seed is None else seed).genRows(rows)
+
+
+# return number of keys written
+def dbGenTxt(rows, txtFile, seed=None):
+    keyCount = 0
+    lines = []
+    with io.open(txtFile, 'wb') as file:
+        for key, wordList in dbGenRows(rows, seed):
+            keyCount += 1
+            lines.append(key + ' ' + ' '.join(f'{word}:{frequency}' for word, frequency in wordList))
+            if len(lines) >= dbFunc.DB_FILE_LINE_BUFFER:
+                file.write(('\n'.join(lines) + '\n').encode('utf-8'))
+                lines = []
+        if len(lines) > 0:
+            file.write(('\n'.join(lines) + '\n').encode('utf-8'))
+    return keyCount
+
+
+def main():
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    rows = int(sys.argv[1])
+    txtFile = sys.argv[2]
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    startTime = time.perf_counter()
+    keyCount = dbGenTxt(rows, txtFile, seed)
+    print(f'{rows} rows, {keyCount} keys, {time.perf_counter() - startTime:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
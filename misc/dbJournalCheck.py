@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检查词频日志（<db_file>.journal，见 dbFunc.dbJournalOpen）：
+写入数据库后的词频、usage 和 bigram 是否与日志中的记录一致，
+以及崩溃后重放时记录不丢失、不重复
+
+在临时目录中的数据库副本上检查，不修改 db_file，
+每项检查使用的词从数据库中随机选取，同样的 seed 总是选取同样的词：
+* append / flush : 记录写入日志后 flush
+* crash          : 不 flush 直接退出，日志末尾留下不完整的记录，下次打开时重放
+* crash rotate   : 已写入数据库但没来得及换新日志时退出，下次打开时不再重放
+* shared journal : 两个连接共用一个日志，交替写入和 flush（同时运行多个词库服务）
+
+用法:
+    python3 dbJournalCheck.py <db_file> [seed]
+
+示例:
+    python3 dbJournalCheck.py ~/.config/nvim/sbzr.nvim.im.db/sbzr.db
+"""
+
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import dbFunc
+
+
+# number of (key, word) used by each check
+CHECK_WORD_COUNT = 50
+# records appended by each check
+CHECK_RECORD_COUNT = 500
+
+
+def pickWords(conn, rand):
+    rows = conn.execute('SELECT key, word FROM words WHERE frequency < ? ORDER BY key, word',
+            (dbFunc.DB_FREQUENCY_MAX // 2,)).fetchall()
+    return rand.sample(rows, min(CHECK_WORD_COUNT, len(rows)))
+
+
+# return ({(key, word) : frequency}, {(key, word) : (count, lastUsed)}, {(prev, word) : count})
+def readState(conn, wordList):
+    dbFunc.dbSqliteUsageInit(conn)
+    dbFunc.dbSqliteBigramInit(conn)
+    frequencyMap = {}
+    usageMap = {}
+    bigramMap = {}
+    for key, word in wordList:
+        frequencyMap[(key, word)] = conn.execute('SELECT frequency FROM words WHERE key = ? AND word = ?', (key, word)).fetchone()[0] or 0
+        row = conn.execute('SELECT count, last_used FROM usage WHERE key = ? AND word = ?', (key, word)).fetchone()
+        usageMap[(key, word)] = (row[0], row[1]) if row is not None else (0, 0)
+        for _, prev in wordList:
+            row = conn.execute('SELECT count FROM bigram WHERE prev = ? AND word = ?', (prev, word)).fetchone()
+            if row is not None:
+                bigramMap[(prev, word)] = row[0]
+    return (frequencyMap, usageMap, bigramMap)
+
+
+# records: [(key, word, delta, usedTime, prevWord), ...], in order of usedTime
+def makeRecords(wordList, rand, now):
+    records = []
+    for i in range(CHECK_RECORD_COUNT):
+        key, word = rand.choice(wordList)
+        usedTime = now + i if rand.random() < 0.5 else None
+        prevWord = rand.choice(wordList)[1] if rand.random() < 0.5 else None
+        records.append((key, word, rand.randint(1, 3), usedTime, prevWord))
+    return records
+
+
+# state expected after records are applied to state
+def applyRecords(state, records):
+    frequencyMap = dict(state[0])
+    usageMap = dict(state[1])
+    bigramMap = dict(state[2])
+    for key, word, delta, usedTime, prevWord in records:
+        frequencyMap[(key, word)] = min(frequencyMap[(key, word)] + delta, dbFunc.DB_FREQUENCY_MAX)
+        if usedTime is not None:
+            count, lastUsed = usageMap[(key, word)]
+            usageMap[(key, word)] = dbFunc.dbUsageAdd(count, lastUsed, 1, usedTime)
+        if prevWord:
+            bigramMap[(prevWord, word)] = min(bigramMap.get((prevWord, word), 0) + 1, dbFunc.DB_BIGRAM_COUNT_MAX)
+    return (frequencyMap, usageMap, bigramMap)
+
+
+def appendRecords(journal, records):
+    for key, word, delta, usedTime, prevWord in records:
+        dbFunc.dbJournalAppend(journal, key, word, delta, usedTime, prevWord)
+
+
+# return list of mismatch descriptions
+def compareState(expected, actual):
+    mismatch = []
+    for name, expectedMap, actualMap in zip(['frequency', 'usage', 'bigram'], expected, actual):
+        for k in sorted(set(expectedMap.keys()) | set(actualMap.keys())):
+            e = expectedMap.get(k, None)
+            a = actualMap.get(k, None)
+            if name == 'usage' and e is not None and a is not None:
+                same = abs(e[0] - a[0]) < 1e-6 and e[1] == a[1]
+            else:
+                same = e == a
+            if not same:
+                mismatch.append(f'{name} {k}: expected {e}, got {a}')
+    return mismatch
+
+
+# leave the journal file as is, like a process killed before flush
+def crashJournal(journal):
+    if journal['file'] is not None:
+        journal['file'].close()
+        journal['file'] = None
+    if journal['lock'] is not None:
+        journal['lock'].close()
+        journal['lock'] = None
+
+
+def checkFlush(dbFile, rand, now):
+    conn = dbFunc.dbSqliteOpen(dbFile)
+    try:
+        journal = dbFunc.dbJournalOpen(conn, dbFile)
+        wordList = pickWords(conn, rand)
+        records = makeRecords(wordList, rand, now)
+        expected = applyRecords(readState(conn, wordList), records)
+        appendRecords(journal, records)
+        dbFunc.dbJournalClose(conn, journal)
+        return compareState(expected, readState(conn, wordList))
+    finally:
+        conn.close()
+
+
+def checkCrash(dbFile, rand, now):
+    conn = dbFunc.dbSqliteOpen(dbFile)
+    journal = dbFunc.dbJournalOpen(conn, dbFile)
+    wordList = pickWords(conn, rand)
+    records = makeRecords(wordList, rand, now)
+    expected = applyRecords(readState(conn, wordList), records)
+    # flushed halfway by the batch size, the rest is left in the journal
+    appendRecords(journal, records)
+    crashJournal(journal)
+    conn.close()
+    # incomplete record written when killed
+    with io.open(dbFunc.dbJournalPath(dbFile), 'ab') as file:
+        file.write(('["%s", "%s", 1' % wordList[0]).encode('utf-8'))
+
+    conn = dbFunc.dbSqliteOpen(dbFile)
+    try:
+        for i in range(2):
+            # opened again after replay, nothing is applied twice
+            journal = dbFunc.dbJournalOpen(conn, dbFile)
+            dbFunc.dbJournalClose(conn, journal)
+        return compareState(expected, readState(conn, wordList))
+    finally:
+        conn.close()
+
+
+def checkCrashRotate(dbFile, rand, now):
+    conn = dbFunc.dbSqliteOpen(dbFile)
+    try:
+        journal = dbFunc.dbJournalOpen(conn, dbFile)
+        wordList = pickWords(conn, rand)
+        records = makeRecords(wordList, rand, now)[:dbFunc.DB_JOURNAL_FLUSH_SIZE - 1]
+        expected = applyRecords(readState(conn, wordList), records)
+        appendRecords(journal, records)
+        journalFile = dbFunc.dbJournalPath(dbFile)
+        shutil.copyfile(journalFile, journalFile + '.check')
+        dbFunc.dbJournalFlush(conn, journal)
+        crashJournal(journal)
+        # committed to the db, but killed before the journal is replaced by a new one
+        os.replace(journalFile + '.check', journalFile)
+        journal = dbFunc.dbJournalOpen(conn, dbFile)
+        dbFunc.dbJournalClose(conn, journal)
+        return compareState(expected, readState(conn, wordList))
+    finally:
+        conn.close()
+
+
+def checkShared(dbFile, rand, now):
+    connList = [dbFunc.dbSqliteOpen(dbFile) for i in range(2)]
+    try:
+        journalList = [dbFunc.dbJournalOpen(conn, dbFile) for conn in connList]
+        wordList = pickWords(connList[0], rand)
+        records = makeRecords(wordList, rand, now)
+        expected = applyRecords(readState(connList[0], wordList), records)
+        for record in records:
+            i = rand.randrange(2)
+            appendRecords(journalList[i], [record])
+            if rand.random() < 0.05:
+                i = rand.randrange(2)
+                dbFunc.dbJournalFlush(connList[i], journalList[i])
+        for conn, journal in zip(connList, journalList):
+            dbFunc.dbJournalClose(conn, journal)
+        return compareState(expected, readState(connList[0], wordList))
+    finally:
+        for conn in connList:
+            conn.close()
+
+
+CHECK_LIST = [
+    ('append / flush', checkFlush),
+    ('crash', checkCrash),
+    ('crash rotate', checkCrashRotate),
+    ('shared journal', checkShared),
+]
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    dbFile = sys.argv[1]
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    if not os.path.isfile(dbFile):
+        print(f'错误: 数据库文件不存在: {dbFile}', file=sys.stderr)
+        sys.exit(1)
+
+    failed = 0
+    tmpDir = tempfile.mkdtemp(prefix='dbJournalCheck')
+    try:
+        for name, check in CHECK_LIST:
+            checkDbFile = os.path.join(tmpDir, 'check.db')
+            for f in [checkDbFile, dbFunc.dbJournalPath(checkDbFile)]:
+                if os.path.isfile(f):
+                    os.remove(f)
+            shutil.copyfile(dbFile, checkDbFile)
+            mismatch = check(checkDbFile, random.Random(seed), int(time.time()))
+            print(f'{name:<15}: {"ok" if not mismatch else str(len(mismatch)) + " mismatch"}')
+            for line in mismatch[:5]:
+                print(f'  {line}')
+            if mismatch:
+                failed += 1
+    finally:
+        shutil.rmtree(tmpDir)
+    sys.exit(0 if failed == 0 else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,7 @@
 import io
+import itertools
 import json
+import os
 import sys
 
 import dbFunc
@@ -10,21 +12,142 @@ DB_COUNT_FILE = sys.argv[2]
 DB_LOAD_CACHE_PATH = sys.argv[3]
 
 
-pyMap = dbFunc.dbLoadPy(DB_FILE, DB_COUNT_FILE)
+# versions of exported buckets are saved to DB_LOAD_CACHE_PATH + '_version',
+# only buckets whose version changed since last export are exported again
+def loadExportedVersions():
+    try:
+        with io.open(DB_LOAD_CACHE_PATH + '_version', 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (IOError, OSError, ValueError):
+        return {}
 
-for c_ in range(ord('a'), ord('z') + 1):
-    c = chr(c_)
-    cMap = pyMap.get(c, {})
-    if len(cMap) <= 0:
-        continue
-    with io.open(DB_LOAD_CACHE_PATH + '_' + c, 'wb') as file:
+
+def saveExportedVersions(exported):
+    tmpFile = DB_LOAD_CACHE_PATH + '_version.tmp'
+    with io.open(tmpFile, 'w', encoding='utf-8') as file:
+        json.dump(exported, file)
+    os.replace(tmpFile, DB_LOAD_CACHE_PATH + '_version')
+
+
+def countFileState():
+    if len(DB_COUNT_FILE) <= 0 or not os.path.isfile(DB_COUNT_FILE):
+        return ''
+    stat = os.stat(DB_COUNT_FILE)
+    return '%s:%s:%s' % (os.path.abspath(DB_COUNT_FILE), stat.st_mtime, stat.st_size)
+
+
+dbFile = DB_FILE
+if dbFile.endswith('.yaml'):
+    dbFile = dbFile[:-5] + '.db'
+
+versions = {}
+if os.path.isfile(dbFile):
+    try:
+        conn = dbFunc.dbSqliteOpen(dbFile)
+        dbFunc.dbSqliteBucketVersionInit(conn)
+        conn.commit()
+        versions = dbFunc.dbSqliteBucketVersions(conn)
+        conn.close()
+    except Exception as e:
+        print(f'Error reading bucket version of {dbFile}: {e}', file=sys.stderr)
+        versions = {}
+
+exported = loadExportedVersions()
+fullExport = (len(versions) == 0
+        or exported.get('db', '') != os.path.abspath(dbFile)
+        or exported.get('dbId', None) != versions.get('', None)
+        or exported.get('countFile', '') != countFileState())
+exportedBuckets = {} if fullExport else exported.get('buckets', {})
+
+# files exported for each bucket, besides the bucket file itself:
+# * '_trie' : prefix trie, see dbFunc.dbBucketTrieBuild
+# * '_alias' : alias index, see dbFunc.dbBucketAliasBuild
+# * '_top' : best completions of each prefix, see dbFunc.dbBucketTopBuild
+BUCKET_INDEX_SUFFIX_LIST = ['_trie', '_alias', '_top']
+
+
+def bucketFileList(c):
+    cacheFile = DB_LOAD_CACHE_PATH + '_' + c
+    return [cacheFile] + [cacheFile + suffix for suffix in BUCKET_INDEX_SUFFIX_LIST]
+
+
+buckets = []
+for c in dbFunc.DB_BUCKET_LIST:
+    if fullExport or exportedBuckets.get(c, None) != versions.get(c, None):
+        buckets.append(c)
+    elif not all(os.path.isfile(f) for f in bucketFileList(c)):
+        # deleted (e.g. by ZFVimIM_cacheClearAll), exported by older version without some index,
+        # or empty bucket, which is cheap to query again
+        buckets.append(c)
+
+def removeBucketFiles(c):
+    for f in bucketFileList(c):
+        if os.path.isfile(f):
+            os.remove(f)
+
+
+# write files of one bucket from dbItemIter (DbItem in order of key),
+# items are encoded as they come, only the index of the bucket is kept in memory,
+# files are written to '.tmp' and replace the old ones when all done
+def exportBucket(c, dbItemIter):
+    cacheFile, trieFile, aliasFile, topFile = bucketFileList(c)
+    keyList = []
+    aliasMap = {}
+    topMap = {}
+    with io.open(cacheFile + '.tmp', 'wb') as file:
         lines = []
-        for key,dbItemEncoded in sorted(dbFunc.dbMapIter(cMap)):
-            lines.append(dbItemEncoded)
+        for dbItem in dbItemIter:
+            keyList.append(dbItem.key)
+            lines.append(dbFunc.dbItemEncode(dbItem))
+            dbFunc.dbBucketAliasAdd(aliasMap, dbItem)
+            dbFunc.dbBucketTopAdd(topMap, dbItem)
             if len(lines) >= dbFunc.DB_FILE_LINE_BUFFER:
                 file.write(('\n'.join(lines) + '\n').encode('utf-8'))
                 lines = []
         if len(lines) > 0:
             file.write(('\n'.join(lines) + '\n').encode('utf-8'))
             lines = []
+    with io.open(trieFile + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(dbFunc.dbBucketTrieBuild(keyList), file, separators=(',', ':'))
+    with io.open(aliasFile + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(aliasMap, file, ensure_ascii=False, separators=(',', ':'))
+    with io.open(topFile + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(dbFunc.dbBucketTopFinish(topMap), file, ensure_ascii=False, separators=(',', ':'))
+    # index files after bucket file, vim only uses index not older than the bucket
+    for f in bucketFileList(c):
+        os.replace(f + '.tmp', f)
+
+
+try:
+    exportedList = []
+    for c, dbItemIter in itertools.groupby(dbFunc.dbLoadSqliteIter(dbFile, DB_COUNT_FILE, buckets),
+            key=lambda dbItem: dbItem.key[0]):
+        if c not in buckets:
+            # keys that not start with a-z
+            continue
+        exportBucket(c, dbItemIter)
+        exportedList.append(c)
+except Exception as e:
+    # files of exported buckets are up to date, but versions are not saved,
+    # so all buckets are exported again next time
+    print(f'Error loading SQLite database {dbFile}: {e}', file=sys.stderr)
+    sys.exit(1)
+
+for c in dbFunc.DB_BUCKET_LIST:
+    if c not in buckets:
+        # unchanged, keep content but mark as up to date
+        # (index files after bucket file, vim only uses index not older than the bucket)
+        for f in bucketFileList(c):
+            if os.path.isfile(f):
+                os.utime(f, None)
+    elif c not in exportedList:
+        # empty bucket
+        removeBucketFiles(c)
 
+if len(versions) > 0:
+    saveExportedVersions({
+        'db' : os.path.abspath(dbFile),
+        'dbId' : versions.get('', None),
+        'countFile' : countFileState(),
+        'buckets' : dict((c, versions.get(c, 0)) for c in dbFunc.DB_BUCKET_LIST),
+    })
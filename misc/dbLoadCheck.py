@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检查 dbLoad.py 的增量导出：修改数据库后，只重新导出变化的 bucket，
+结果是否与全部重新导出完全一致
+
+在临时目录中的数据库副本上检查，不修改 db_file，每一轮：
+1. 随机新增、删除、调整词频（同样的 seed 总是同样的修改）
+2. 对上一轮的导出目录增量导出，对新的目录全部导出
+3. 逐个比较两边的文件
+
+用法:
+    python3 dbLoadCheck.py <db_file> [rounds] [seed]
+
+示例:
+    python3 dbLoadCheck.py ~/.config/nvim/sbzr.nvim.im.db/sbzr.db
+"""
+
+import filecmp
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import dbFunc
+
+
+# edits of each round
+CHECK_EDIT_COUNT = 20
+# versions of the exported buckets, not compared since it includes the db path
+CHECK_VERSION_FILE = '_version'
+
+
+def runLoad(dbFile, cachePath):
+    scriptPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dbLoad.py')
+    startTime = time.perf_counter()
+    subprocess.run([sys.executable, scriptPath, dbFile, '', cachePath], check=True)
+    return time.perf_counter() - startTime
+
+
+# edit words of a few random buckets, return the buckets changed
+def editRandom(dbFile, rand):
+    conn = dbFunc.dbSqliteOpen(dbFile)
+    try:
+        dbFunc.dbSqliteInit(conn)
+        conn.commit()
+        buckets = set()
+        edits = []
+        deltaMap = {}
+        for i in range(CHECK_EDIT_COUNT):
+            c = rand.choice(dbFunc.DB_BUCKET_LIST)
+            rowCount = conn.execute('SELECT COUNT(*) FROM words WHERE key >= ? AND key < ?', (c, chr(ord(c) + 1))).fetchone()[0]
+            if rowCount == 0:
+                continue
+            row = conn.execute('SELECT key, word FROM words WHERE key >= ? AND key < ? ORDER BY key, word LIMIT 1 OFFSET ?',
+                    (c, chr(ord(c) + 1), rand.randrange(rowCount))).fetchone()
+            action = rand.choice(['add', 'remove', 'reorder', 'frequency'])
+            if action == 'add':
+                edits.append({'action' : 'add', 'key' : row[0] + rand.choice('aeiou'), 'word' : row[1] + row[1][0]})
+            elif action == 'frequency':
+                deltaMap[(row[0], row[1])] = deltaMap.get((row[0], row[1]), 0) + rand.randint(1, 100)
+            else:
+                edits.append({'action' : action, 'key' : row[0], 'word' : row[1]})
+            buckets.add(c)
+        dbFunc.dbSqliteEditApply(conn, edits)
+        dbFunc.dbSqliteFrequencyAddBatch(conn, deltaMap)
+        conn.commit()
+        return buckets
+    finally:
+        conn.close()
+
+
+# return list of mismatch descriptions
+def compareExport(incrementalDir, fullDir):
+    mismatch = []
+    incrementalFiles = set(os.listdir(incrementalDir))
+    fullFiles = set(os.listdir(fullDir))
+    for f in sorted(incrementalFiles ^ fullFiles):
+        mismatch.append(f'{f}: only in {"incremental" if f in incrementalFiles else "full"} export')
+    for f in sorted(incrementalFiles & fullFiles):
+        if f.endswith(CHECK_VERSION_FILE):
+            continue
+        if not filecmp.cmp(os.path.join(incrementalDir, f), os.path.join(fullDir, f), shallow=False):
+            mismatch.append(f'{f}: differ')
+    return mismatch
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    dbFile = sys.argv[1]
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    if not os.path.isfile(dbFile):
+        print(f'错误: 数据库文件不存在: {dbFile}', file=sys.stderr)
+        sys.exit(1)
+
+    rand = random.Random(seed)
+    failed = 0
+    tmpDir = tempfile.mkdtemp(prefix='dbLoadCheck')
+    try:
+        checkDbFile = os.path.join(tmpDir, 'check.db')
+        shutil.copyfile(dbFile, checkDbFile)
+        incrementalDir = os.path.join(tmpDir, 'incremental')
+        os.makedirs(incrementalDir)
+        runLoad(checkDbFile, os.path.join(incrementalDir, 'dbLoadCache'))
+        for i in range(rounds):
+            buckets = editRandom(checkDbFile, rand)
+            fullDir = os.path.join(tmpDir, 'full%d' % i)
+            os.makedirs(fullDir)
+            incrementalTime = runLoad(checkDbFile, os.path.join(incrementalDir, 'dbLoadCache'))
+            fullTime = runLoad(checkDbFile, os.path.join(fullDir, 'dbLoadCache'))
+            mismatch = compareExport(incrementalDir, fullDir)
+            print(f'round {i}: {len(buckets)} buckets changed,'
+                    f' incremental {incrementalTime:.2f} s, full {fullTime:.2f} s,'
+                    f' {"ok" if not mismatch else str(len(mismatch)) + " mismatch"}')
+            for line in mismatch[:5]:
+                print(f'  {line}')
+            if mismatch:
+                failed += 1
+            shutil.rmtree(fullDir)
+    finally:
+        shutil.rmtree(tmpDir)
+    sys.exit(0 if failed == 0 else 1)
+
+
+if __name__ == '__main__':
+    main()
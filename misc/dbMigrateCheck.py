@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检查表结构的转换（见 db_migrate.py）：转换前后 words 的内容、加载结果和 usage 表是否一致
+
+在临时目录中的数据库副本上检查，不修改 db_file：
+* round trip : 当前结构 -> 规范化 -> 普通 words 表 -> 规范化，每一步都与原数据库比较
+* keep       : 不带选项的 db_migrate.migrate_db 保持规范化的结构不变
+* legacy     : 旧版（有 rowid、有 idx_key 索引）的 words 表升级，
+               包括没有 frequency 列的（升级后词频为 0），以及升级后再规范化
+
+用法:
+    python3 dbMigrateCheck.py <db_file>
+
+示例:
+    python3 dbMigrateCheck.py ~/.config/nvim/sbzr.nvim.im.db/sbzr.db
+"""
+
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+import dbFunc
+import db_migrate
+
+
+# return (words, usage), each sorted
+def readContent(dbFile):
+    conn = dbFunc.dbSqliteOpen(dbFile)
+    try:
+        words = sorted(conn.execute('SELECT key, word, COALESCE(frequency, 0) FROM words').fetchall())
+        usage = []
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'usage'").fetchone() is not None:
+            usage = sorted(conn.execute('SELECT key, word, count, last_used FROM usage').fetchall())
+        return (words, usage)
+    finally:
+        conn.close()
+
+
+def readVersion(dbFile):
+    conn = dbFunc.dbSqliteOpen(dbFile)
+    try:
+        return dbFunc.dbSqliteSchemaVersion(conn)
+    finally:
+        conn.close()
+
+
+def readLoad(dbFile):
+    return [(dbItem.key, dbItem.wordList, dbItem.countList) for dbItem in dbFunc.dbLoadSqliteIter(dbFile, '')]
+
+
+# return list of mismatch descriptions
+def compareContent(name, expected, actual):
+    mismatch = []
+    for part, e, a in zip(['words', 'usage'], expected, actual):
+        if e != a:
+            diff = sorted(set(e) ^ set(a))
+            mismatch.append(f'{name}: {part} {len(e)} -> {len(a)} rows, differ: {diff[:3]}')
+    return mismatch
+
+
+def migrate(dbFile, targetVersion):
+    # db_migrate prints the result, not needed here
+    with contextlib.redirect_stdout(io.StringIO()):
+        return db_migrate.migrate_db(dbFile, targetVersion)
+
+
+def checkRoundTrip(dbFile):
+    mismatch = []
+    expected = readContent(dbFile)
+    expectedLoad = readLoad(dbFile)
+    for targetVersion in [dbFunc.DB_SCHEMA_NORMALIZED, dbFunc.DB_SCHEMA_VERSION, dbFunc.DB_SCHEMA_NORMALIZED]:
+        name = f'-> {targetVersion}'
+        if not migrate(dbFile, targetVersion):
+            mismatch.append(f'{name}: failed')
+            continue
+        if readVersion(dbFile) != targetVersion:
+            mismatch.append(f'{name}: version is {readVersion(dbFile)}')
+        mismatch += compareContent(name, expected, readContent(dbFile))
+        if readLoad(dbFile) != expectedLoad:
+            mismatch.append(f'{name}: loaded items differ')
+    return mismatch
+
+
+def checkKeep(dbFile):
+    mismatch = []
+    migrate(dbFile, dbFunc.DB_SCHEMA_NORMALIZED)
+    expected = readContent(dbFile)
+    migrate(dbFile, None)
+    if readVersion(dbFile) != dbFunc.DB_SCHEMA_NORMALIZED:
+        mismatch.append(f'no option: version is {readVersion(dbFile)}')
+    mismatch += compareContent('no option', expected, readContent(dbFile))
+    return mismatch
+
+
+# words table of older versions, with rowid and idx_key
+def makeLegacy(dbFile, legacyFile, hasFrequency):
+    words, _ = readContent(dbFile)
+    conn = dbFunc.dbSqliteOpen(legacyFile)
+    try:
+        if hasFrequency:
+            conn.execute('CREATE TABLE words (id INTEGER PRIMARY KEY, key TEXT NOT NULL, word TEXT NOT NULL, frequency INTEGER DEFAULT 0)')
+            conn.executemany('INSERT INTO words (key, word, frequency) VALUES (?, ?, ?)', words)
+        else:
+            conn.execute('CREATE TABLE words (id INTEGER PRIMARY KEY, key TEXT NOT NULL, word TEXT NOT NULL)')
+            conn.executemany('INSERT INTO words (key, word) VALUES (?, ?)', [(key, word) for key, word, _ in words])
+        conn.execute('CREATE INDEX idx_key ON words(key)')
+        conn.commit()
+    finally:
+        conn.close()
+    return (words if hasFrequency else [(key, word, 0) for key, word, _ in words], [])
+
+
+def checkLegacy(dbFile):
+    mismatch = []
+    for hasFrequency in [True, False]:
+        legacyFile = dbFile + ('.legacy' if hasFrequency else '.legacy_nofreq')
+        expected = makeLegacy(dbFile, legacyFile, hasFrequency)
+        name = 'frequency' if hasFrequency else 'no frequency'
+        for targetVersion in [None, dbFunc.DB_SCHEMA_NORMALIZED, dbFunc.DB_SCHEMA_VERSION]:
+            stepName = f'{name} -> {targetVersion or "migrate"}'
+            if not migrate(legacyFile, targetVersion):
+                mismatch.append(f'{stepName}: failed')
+                break
+            if readVersion(legacyFile) != (targetVersion or dbFunc.DB_SCHEMA_VERSION):
+                mismatch.append(f'{stepName}: version is {readVersion(legacyFile)}')
+            mismatch += compareContent(stepName, expected, readContent(legacyFile))
+    return mismatch
+
+
+CHECK_LIST = [
+    ('round trip', checkRoundTrip),
+    ('keep', checkKeep),
+    ('legacy', checkLegacy),
+]
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    dbFile = sys.argv[1]
+    if not os.path.isfile(dbFile):
+        print(f'错误: 数据库文件不存在: {dbFile}', file=sys.stderr)
+        sys.exit(1)
+
+    failed = 0
+    tmpDir = tempfile.mkdtemp(prefix='dbMigrateCheck')
+    try:
+        for name, check in CHECK_LIST:
+            checkDbFile = os.path.join(tmpDir, name.replace(' ', '_') + '.db')
+            shutil.copyfile(dbFile, checkDbFile)
+            mismatch = check(checkDbFile)
+            print(f'{name:<10}: {"ok" if not mismatch else str(len(mismatch)) + " mismatch"}')
+            for line in mismatch[:5]:
+                print(f'  {line}')
+            if mismatch:
+                failed += 1
+    finally:
+        shutil.rmtree(tmpDir)
+    sys.exit(0 if failed == 0 else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+词库文件（key word1[:freq] word2[:freq] ...，词中的空格转义为 \\ ）的共用解析
+
+大文件按换行对齐切分为多个字节区间，由 ProcessPoolExecutor 并行解析，
+结果按文件顺序返回：
+    dbParseLines(path)   逐行返回 (key, [(word, freqStr), ...])
+    dbParseMerged(path)  相同编码的行合并、去重后返回 ([(key, [(word, freqStr), ...]), ...], stats)
+"""
+
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+# size of each chunk, files smaller than this are parsed in current process
+DB_PARSE_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+# return (key, [(word, freqStr or None), ...]) or None
+# when splitFrequency is False, `word:freq` is kept as word and freqStr is always None
+def dbParseLine(line, splitFrequency=True):
+    line = line.rstrip('\n').strip()
+    if not line or line.startswith('#'):
+        return None
+    hasSpace = ('\\ ' in line)
+    if hasSpace:
+        line = line.replace('\\ ', '_ZFVimIM_space_')
+    parts = line.split()
+    if len(parts) < 2:
+        return None
+    words = []
+    for wordPart in parts[1:]:
+        if splitFrequency and ':' in wordPart:
+            word, freqStr = wordPart.rsplit(':', 1)
+        else:
+            word, freqStr = wordPart, None
+        if hasSpace:
+            word = word.replace('_ZFVimIM_space_', ' ')
+        words.append((word, freqStr))
+    return (parts[0], words)
+
+
+# merge one word into wordList, return False if word already exists
+# for duplicated words, the first position is kept, with the higher freq if provided
+def dbParseMergeWord(wordList, wordIndex, word, freqStr):
+    existIndex = wordIndex.get(word, None)
+    if existIndex is None:
+        wordIndex[word] = len(wordList)
+        wordList.append((word, freqStr))
+        return True
+    if freqStr is not None:
+        existFreqStr = wordList[existIndex][1]
+        if existFreqStr is None:
+            wordList[existIndex] = (word, freqStr)
+        else:
+            try:
+                if int(freqStr) > int(existFreqStr):
+                    wordList[existIndex] = (word, freqStr)
+            except ValueError:
+                pass
+    return False
+
+
+# split file into [(start, end), ...], each range ends after a newline
+def dbParseRanges(path, chunkSize=None):
+    if chunkSize is None:
+        chunkSize = DB_PARSE_CHUNK_SIZE
+    fileSize = os.path.getsize(path)
+    ranges = []
+    with io.open(path, 'rb') as file:
+        start = 0
+        while start < fileSize:
+            end = start + chunkSize
+            if end >= fileSize:
+                end = fileSize
+            else:
+                file.seek(end)
+                file.readline()
+                end = min(file.tell(), fileSize)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _dbParseChunkLines(path, start, end, errors):
+    with io.open(path, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    return io.TextIOWrapper(io.BytesIO(data), encoding='utf-8', errors=errors)
+
+
+def _dbParseChunk(path, start, end, splitFrequency, errors):
+    lineCount = 0
+    items = []
+    for line in _dbParseChunkLines(path, start, end, errors):
+        lineCount += 1
+        item = dbParseLine(line, splitFrequency)
+        if item is not None:
+            items.append(item)
+    return (lineCount, items)
+
+
+def _dbParseChunkMerged(path, start, end, splitFrequency, errors):
+    lineCount = 0
+    parsedLines = 0
+    duplicateCount = 0
+    # key -> [(word, freqStr), ...]
+    keyMap = {}
+    # key -> {word : index in keyMap[key]}
+    wordIndexMap = {}
+    for line in _dbParseChunkLines(path, start, end, errors):
+        lineCount += 1
+        item = dbParseLine(line, splitFrequency)
+        if item is None:
+            continue
+        parsedLines += 1
+        wordList = keyMap.get(item[0], None)
+        if wordList is None:
+            wordList = []
+            keyMap[item[0]] = wordList
+            wordIndex = {}
+            wordIndexMap[item[0]] = wordIndex
+        else:
+            wordIndex = wordIndexMap[item[0]]
+        for wordItem in item[1]:
+            if wordItem[0] not in wordIndex:
+                wordIndex[wordItem[0]] = len(wordList)
+                wordList.append(wordItem)
+            else:
+                dbParseMergeWord(wordList, wordIndex, wordItem[0], wordItem[1])
+                duplicateCount += 1
+    return (lineCount, parsedLines, duplicateCount, list(keyMap.items()))
+
+
+# yield result of each chunk in file order
+def _dbParseMap(func, path, splitFrequency, errors, workers):
+    ranges = dbParseRanges(path)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if len(ranges) <= 1 or workers <= 1:
+        for start, end in ranges:
+            yield func(path, start, end, splitFrequency, errors)
+        return
+    count = len(ranges)
+    with ProcessPoolExecutor(max_workers=min(workers, count)) as executor:
+        for result in executor.map(func,
+                [path] * count,
+                [start for start, end in ranges],
+                [end for start, end in ranges],
+                [splitFrequency] * count,
+                [errors] * count):
+            yield result
+
+
+# yield (key, [(word, freqStr or None), ...]) for each valid line, in file order
+# stats (optional dict) is filled with 'lines' : total line count, including empty lines and comments
+def dbParseLines(path, splitFrequency=True, errors='strict', workers=None, stats=None):
+    for lineCount, items in _dbParseMap(_dbParseChunk, path, splitFrequency, errors, workers):
+        if stats is not None:
+            stats['lines'] = stats.get('lines', 0) + lineCount
+        for item in items:
+            yield item
+
+
+# parse and merge lines with same key, return ([(key, [(word, freqStr or None), ...]), ...], stats)
+# keys and words are in first-seen order, see dbParseMergeWord for duplicated words
+# stats: {'lines', 'parsedLines', 'duplicateWords'}
+def dbParseMerged(path, splitFrequency=True, errors='strict', workers=None):
+    stats = {
+        'lines' : 0,
+        'parsedLines' : 0,
+        'duplicateWords' : 0,
+    }
+    keyMap = {}
+    # key -> {word : index}, built lazily when the key appears in more than one chunk
+    wordIndexMap = {}
+    for lineCount, parsedLines, duplicateCount, entries in _dbParseMap(_dbParseChunkMerged, path, splitFrequency, errors, workers):
+        stats['lines'] += lineCount
+        stats['parsedLines'] += parsedLines
+        stats['duplicateWords'] += duplicateCount
+        if len(keyMap) == 0:
+            keyMap = dict(entries)
+            continue
+        for key, words in entries:
+            wordList = keyMap.get(key, None)
+            if wordList is None:
+                keyMap[key] = words
+                continue
+            wordIndex = wordIndexMap.get(key, None)
+            if wordIndex is None:
+                wordIndex = dict((word, i) for i, (word, freqStr) in enumerate(wordList))
+                wordIndexMap[key] = wordIndex
+            for word, freqStr in words:
+                if not dbParseMergeWord(wordList, wordIndex, word, freqStr):
+                    stats['duplicateWords'] += 1
+    return (list(keyMap.items()), stats)
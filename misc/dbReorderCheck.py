@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检查 dbItemReorder 的排序结果是否与旧的 cmp_to_key(dbItemReorderFunc) 排序一致
+
+对词库中每个编码检查：加载后的顺序、每个词频率 +1 / +3 之后的顺序、
+以及 reorder 操作（频率设为其它词频率和的一半）之后的顺序
+
+用法:
+    python3 dbReorderCheck.py <db_file> [count_file]
+
+示例:
+    python3 dbReorderCheck.py ~/.config/nvim/sbzr.nvim.im.db/sbzr.db
+"""
+
+import functools
+import sys
+import time
+
+import dbFunc
+
+
+# max number of words to bump for each key
+CHECK_WORD_LIMIT = 8
+
+
+def legacyReorder(dbItem):
+    tmp = []
+    for i in range(len(dbItem.wordList)):
+        tmp.append({
+            'word' : dbItem.wordList[i],
+            'count' : dbItem.countList[i],
+        })
+    tmp.sort(key = functools.cmp_to_key(dbFunc.dbItemReorderFunc))
+    dbItem.wordList = [item['word'] for item in tmp]
+    dbItem.countList = [item['count'] for item in tmp]
+
+
+def checkCase(dbItem, stats):
+    legacyItem = dbFunc.DbItem(dbItem.key, list(dbItem.wordList), list(dbItem.countList))
+    newItem = dbFunc.DbItem(dbItem.key, list(dbItem.wordList), list(dbItem.countList))
+
+    startTime = time.perf_counter()
+    legacyReorder(legacyItem)
+    stats['legacyTime'] += time.perf_counter() - startTime
+    startTime = time.perf_counter()
+    dbFunc.dbItemReorder(newItem)
+    stats['newTime'] += time.perf_counter() - startTime
+
+    group = 'short' if len(dbItem.wordList) < 64 else 'long'
+    stats[group + 'Cases'] += 1
+    if legacyItem != newItem:
+        stats[group + 'Mismatch'] += 1
+        if len(stats['samples']) < 5:
+            stats['samples'].append((dbItem, legacyItem, newItem))
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    dbFile = sys.argv[1]
+    dbCountFile = sys.argv[2] if len(sys.argv) > 2 else ''
+
+    stats = {
+        'shortCases' : 0,
+        'shortMismatch' : 0,
+        'longCases' : 0,
+        'longMismatch' : 0,
+        'legacyTime' : 0.0,
+        'newTime' : 0.0,
+        'samples' : [],
+    }
+    pyMap = dbFunc.dbLoadPy(dbFile, dbCountFile)
+    for c in sorted(pyMap.keys()):
+        for key, dbItem in sorted(dbFunc.dbMapIter(pyMap[c]), key=lambda x: x[0]):
+            checkCase(dbItem, stats)
+            for i in range(min(len(dbItem.wordList), CHECK_WORD_LIMIT)):
+                for increment in [1, 3]:
+                    countList = list(dbItem.countList)
+                    countList[i] += increment
+                    checkCase(dbFunc.DbItem(key, dbItem.wordList, countList), stats)
+                countList = list(dbItem.countList)
+                countList[i] = 0
+                countList[i] = int(sum(countList) / 2)
+                checkCase(dbFunc.DbItem(key, dbItem.wordList, countList), stats)
+
+    print(f'word list < 64 : {stats["shortCases"]} cases, {stats["shortMismatch"]} mismatch')
+    print(f'word list >= 64: {stats["longCases"]} cases, {stats["longMismatch"]} mismatch')
+    print(f'cmp_to_key sort: {stats["legacyTime"]:.3f} s')
+    print(f'dbItemReorder  : {stats["newTime"]:.3f} s')
+    for dbItem, legacyItem, newItem in stats['samples']:
+        print(f'  {dbItem.key}: {dbItem.countList}')
+        print(f'    cmp_to_key   : {legacyItem.countList}')
+        print(f'    dbItemReorder: {newItem.countList}')
+    sys.exit(0 if stats['shortMismatch'] == 0 else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+dbSavePy 性能测试：生成不同规模的词库，检查耗时是否随编码数线性增长
+
+用法:
+    python3 dbSaveBench.py [size1] [size2] ...
+
+示例:
+    python3 dbSaveBench.py
+    python3 dbSaveBench.py 10000 100000 1000000
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import dbFunc
+
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+
+
+# deterministic pyMap with `size` keys, 1~4 words each
+def genPyMap(size):
+    rand = random.Random(size)
+    pyMap = {}
+    for i in range(size):
+        key = ''
+        n = i
+        while True:
+            key = chr(ord('a') + n % 26) + key
+            n //= 26
+            if n == 0:
+                break
+        key += chr(ord('a') + rand.randint(0, 25))
+        wordList = []
+        countList = []
+        for j in range(rand.randint(1, 4)):
+            wordList.append(''.join(chr(0x4E00 + rand.randint(0, 6000)) for _ in range(rand.randint(1, 3))))
+            countList.append(rand.randint(0, 5))
+        if key[0] not in pyMap:
+            pyMap[key[0]] = {}
+        pyMap[key[0]][key] = dbFunc.DbItem(key, wordList, countList)
+    return pyMap
+
+
+def benchSize(size, cachePath):
+    pyMap = genPyMap(size)
+    startTime = time.perf_counter()
+    dbFunc.dbSavePy(pyMap, cachePath + '/db.yaml', cachePath + '/db_count.txt', cachePath)
+    return time.perf_counter() - startTime
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    cachePath = tempfile.mkdtemp(prefix='dbSaveBench')
+    try:
+        results = []
+        for size in sizes:
+            cost = benchSize(size, cachePath)
+            results.append((size, cost))
+            print(f'{size:>10} keys: {cost:8.3f} s, {cost * 1000000 / size:8.2f} us/key')
+    finally:
+        shutil.rmtree(cachePath, ignore_errors=True)
+
+    # linear scaling: cost per key should stay roughly the same
+    if len(results) >= 2:
+        first = results[0][1] / results[0][0]
+        last = results[-1][1] / results[-1][0]
+        print(f'cost per key ratio ({results[-1][0]} / {results[0][0]}): {last / first:.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+整句输入：把一串编码切分成多个词，返回得分最高的几种切分
+
+对编码的每个位置，一次查询出所有从该位置开始、在词库中存在的编码（词图），
+再按位置从左到右做动态规划（每个位置保留得分最高的若干条路径）：
+    词的得分 = log((词频 + 1) / (总词频 + 词数))
+             + DB_SENTENCE_BIGRAM_WEIGHT * log(1 + 上一个词之后出现这个词的次数)
+词频相同时，词数越少得分越高（倾向于较长的编码，与原来逐段取最长匹配的做法相近）
+超过时间限制时，返回已经算到的最远位置上的结果
+
+上一个词之后出现这个词的次数来自数据库的 bigram 表（见 dbFunc.dbSqliteBigramInit）
+
+用法:
+    python3 dbSentence.py <db_file> <key> [count] [prev_word]
+
+示例:
+    python3 dbSentence.py ~/.config/nvim/sbzr.nvim.im.db/sbzr.db woxiangquxuexiao 3
+"""
+
+import math
+import sys
+import time
+
+import dbFunc
+
+
+# keys longer than this are not looked up
+DB_SENTENCE_KEY_LEN_MAX = 16
+# only the most frequent words of each key are used
+DB_SENTENCE_WORDS_PER_KEY = 5
+# paths kept for each position, at least the number of results requested
+DB_SENTENCE_BEAM = 8
+DB_SENTENCE_BIGRAM_WEIGHT = 2.0
+# default time limit, in milliseconds
+DB_SENTENCE_TIMEOUT = 50
+# sqlite's default limit of host parameters is 999
+DB_SENTENCE_QUERY_BATCH = 500
+
+
+class DbSentenceDecoder(object):
+    # total frequency is read once, it only needs to be roughly right,
+    # bigram table is loaded again after anything is written by conn (such as a journal flush)
+    def __init__(self, conn):
+        self.conn = conn
+        self.hasFrequency = dbFunc.dbSqliteHasFrequency(conn)
+        self.logTotal = None
+        self.useBigram = True
+        self.bigramState = None
+        self.bigram = {}
+
+    # return {(prev, word) : count}, empty if not useBigram
+    def loadBigram(self):
+        if not self.useBigram:
+            return {}
+        if self.conn.total_changes != self.bigramState:
+            self.bigramState = self.conn.total_changes
+            self.bigram = {}
+            if dbFunc.dbSqliteHasBigram(self.conn):
+                self.bigram = dict(((prev, word), count) for prev, word, count in dbFunc.dbSqliteBigramList(self.conn))
+        return self.bigram
+
+    def wordLogTotal(self):
+        if self.logTotal is None:
+            if self.hasFrequency:
+                row = self.conn.execute('SELECT COUNT(*), SUM(frequency) FROM words').fetchone()
+            else:
+                row = self.conn.execute('SELECT COUNT(*), 0 FROM words').fetchone()
+            self.logTotal = math.log((row[0] or 0) + (row[1] or 0) + 1)
+        return self.logTotal
+
+    # return {start : [(end, key, word, logP), ...]}
+    def lattice(self, key):
+        keyLen = len(key)
+        subKeyMap = {}
+        for start in range(keyLen):
+            for end in range(start + 1, min(keyLen, start + DB_SENTENCE_KEY_LEN_MAX) + 1):
+                subKey = key[start:end]
+                if subKey not in subKeyMap:
+                    subKeyMap[subKey] = []
+                subKeyMap[subKey].append(start)
+        columns = 'key, word, frequency' if self.hasFrequency else 'key, word, 0'
+        wordMap = {}
+        subKeyList = list(subKeyMap.keys())
+        for i in range(0, len(subKeyList), DB_SENTENCE_QUERY_BATCH):
+            batch = subKeyList[i:i + DB_SENTENCE_QUERY_BATCH]
+            cursor = self.conn.execute('SELECT ' + columns + ' FROM words WHERE key IN (' + ','.join('?' * len(batch)) + ')', batch)
+            for row in cursor:
+                if row[0] not in wordMap:
+                    wordMap[row[0]] = []
+                wordMap[row[0]].append((row[2] or 0, row[1]))
+        logTotal = self.wordLogTotal()
+        edges = {}
+        for subKey, words in wordMap.items():
+            words.sort(key=lambda x: -x[0])
+            for start in subKeyMap[subKey]:
+                if start not in edges:
+                    edges[start] = []
+                for frequency, word in words[0:DB_SENTENCE_WORDS_PER_KEY]:
+                    edges[start].append((start + len(subKey), subKey, word, math.log(frequency + 1) - logTotal))
+        return edges
+
+    # return up to count best segmentations, best first: [[(key, word), ...], ...]
+    # all of them cover key[0:end], where end is the furthest position reached
+    # prevWord: word committed before key, for bigram score
+    # timeout: in milliseconds, None for DB_SENTENCE_TIMEOUT, 0 for no limit
+    def decode(self, key, count=1, prevWord='', timeout=None):
+        if timeout is None:
+            timeout = DB_SENTENCE_TIMEOUT
+        deadline = (time.perf_counter() + timeout / 1000.0) if timeout > 0 else None
+        keyLen = len(key)
+        if keyLen <= 0 or count <= 0:
+            return []
+        edges = self.lattice(key)
+        beam = max(count, DB_SENTENCE_BEAM)
+        bigram = self.loadBigram()
+        # position -> [(score, lastWord, [(key, word), ...]), ...]
+        paths = {0 : [(0.0, prevWord, [])]}
+        furthest = 0
+        for start in range(keyLen):
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            pathList = paths.pop(start, None)
+            if pathList is None:
+                continue
+            pathList.sort(key=lambda x: -x[0])
+            del pathList[beam:]
+            paths[start] = pathList
+            furthest = start
+            for end, subKey, word, logP in edges.get(start, []):
+                target = paths.get(end, None)
+                if target is None:
+                    target = []
+                    paths[end] = target
+                for score, lastWord, segments in pathList:
+                    score += logP
+                    bigramCount = bigram.get((lastWord, word), 0)
+                    if bigramCount > 0:
+                        score += DB_SENTENCE_BIGRAM_WEIGHT * math.log(1 + bigramCount)
+                    target.append((score, word, segments + [(subKey, word)]))
+        else:
+            if keyLen in paths:
+                furthest = keyLen
+        pathList = paths.get(furthest, [])
+        pathList.sort(key=lambda x: -x[0])
+        return [segments for score, lastWord, segments in pathList[0:count] if len(segments) > 0]
+
+
+def main():
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    dbFile = sys.argv[1]
+    key = sys.argv[2]
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    prevWord = sys.argv[4] if len(sys.argv) > 4 else ''
+
+    conn = dbFunc.dbSqliteOpen(dbFile)
+    decoder = DbSentenceDecoder(conn)
+    startTime = time.perf_counter()
+    result = decoder.decode(key, count, prevWord, timeout=0)
+    cost = time.perf_counter() - startTime
+    for segments in result:
+        print(' '.join(f'{word}({subKey})' for subKey, word in segments))
+    print(f'{cost * 1000:.1f} ms')
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻词库服务：保持一个 SQLite 连接，通过 stdin/stdout 处理请求
+（由 Neovim 的 jobstart() 启动，避免每次选词都启动一次 python）
+
+用法:
+    python3 dbServer.py <db_file>
+
+协议（每行一个 JSON）:
+    请求: {"id": 1, "method": "frequency", "params": {"key": "zheng", "word": "正", "increment": 1}}
+    响应: {"id": 1, "result": true}
+    出错: {"id": 1, "error": "..."}
+
+方法:
+    ping                                   -> "pong"
+    frequency  {key, word, increment, time, prev}
+                                           -> true（先写入 <db_file>.journal，之后批量写入数据库）
+                                           （time: 该词被使用的时刻，有 time 时同时计入 usage 表）
+                                           （prev: 上一个上屏的词，有 prev 时同时计入 bigram 表）
+    flush                                  -> 写入数据库的 (key, word) 数
+    add        {key, word}                 -> 1 新增 / 0 已存在
+    remove     {words, fuzzy}              -> {词: 删除的记录数}
+    edit       {edits}                     -> [{"result": ...} 或 {"error": "..."}, ...]
+                                           （批量 add / remove / reorder，格式见 db_batch_edit.py，一次提交）
+    search     {word, fuzzy, mode}         -> [[key, word, frequency], ...]
+                                           （mode: exact / prefix / substring，默认按 fuzzy 选择）
+    sentence   {key, count, prev, timeout, bigram}
+                                           -> [[[key, word], ...], ...]（整句切分，见 dbSentence.py）
+                                           （bigram: 是否使用 bigram 表，默认 true）
+    usage      {importFile}                -> [[key, word, count, last_used], ...]，按衰减后的得分排序
+                                           （usage 表为空时先导入旧版的词频文件 importFile）
+    bigram     {importFile}                -> [[prev, word, count], ...]，按次数排序
+                                           （bigram 表为空时先导入旧版的二元词频文件 importFile）
+    quit                                   -> 退出服务
+
+词频日志在以下情况写入数据库：累计 dbFunc.DB_JOURNAL_FLUSH_SIZE 条、
+收到 flush 请求（由 Vim 定时发送）、退出服务时，以及下次启动时重放未写入的部分
+
+数据库被 import_txt_to_db.py 重建替换后，在下一个请求前重新打开，
+未写入的词频日志写入新的数据库
+"""
+
+import io
+import json
+import os
+import signal
+import sys
+
+import dbFunc
+import dbSentence
+
+
+def requestFrequency(conn, journal, params):
+    if dbFunc.dbJournalAppend(journal, params['key'], params['word'], int(params.get('increment', 1)), params.get('time', None), params.get('prev', None)):
+        dbFunc.dbJournalFlush(conn, journal)
+    return True
+
+
+def requestFlush(conn, journal, params):
+    return dbFunc.dbJournalFlush(conn, journal)
+
+
+def requestAdd(conn, journal, params):
+    return dbFunc.dbSqliteWordAdd(conn, params['key'], params['word'])
+
+
+def requestRemove(conn, journal, params):
+    removed = {}
+    for word in params['words']:
+        for removedWord, count in dbFunc.dbSqliteWordRemove(conn, word, params.get('fuzzy', False)).items():
+            removed[removedWord] = removed.get(removedWord, 0) + count
+    return removed
+
+
+def requestEdit(conn, journal, params):
+    return dbFunc.dbSqliteEditApply(conn, params['edits'])
+
+
+# frequency includes the bumps not flushed yet
+def requestSearch(conn, journal, params):
+    return [(key, word, frequency + dbFunc.dbJournalPending(journal, key, word))
+            for key, word, frequency in dbFunc.dbSqliteWordSearch(conn, params['word'], params.get('fuzzy', False), params.get('mode', None))]
+
+
+# created by first sentence request, keeps total frequency and bigram table
+_sentenceDecoder = [None]
+
+
+def requestSentence(conn, journal, params):
+    decoder = _sentenceDecoder[0]
+    if decoder is None or decoder.conn is not conn:
+        decoder = dbSentence.DbSentenceDecoder(conn)
+        _sentenceDecoder[0] = decoder
+    decoder.useBigram = params.get('bigram', True)
+    return decoder.decode(params['key'],
+            int(params.get('count', 1)),
+            params.get('prev', ''),
+            params.get('timeout', None))
+
+
+def requestUsage(conn, journal, params):
+    dbFunc.dbSqliteUsageImport(conn, params.get('importFile', ''))
+    return dbFunc.dbSqliteUsageList(conn)
+
+
+def requestBigram(conn, journal, params):
+    dbFunc.dbSqliteBigramInit(conn)
+    dbFunc.dbSqliteBigramImport(conn, params.get('importFile', ''))
+    return dbFunc.dbSqliteBigramList(conn)
+
+
+# method -> (handler, flush journal before, commit after)
+# pending journal records are flushed before requests editing words,
+# so that a removed word won't be brought back by a later flush,
+# read-only requests never flush, so they don't wait for a commit
+REQUEST_HANDLERS = {
+    'ping' : (lambda conn, journal, params: 'pong', False, False),
+    'frequency' : (requestFrequency, False, False),
+    'flush' : (requestFlush, False, False),
+    'add' : (requestAdd, True, True),
+    'remove' : (requestRemove, True, True),
+    'edit' : (requestEdit, True, True),
+    'search' : (requestSearch, False, False),
+    'sentence' : (requestSentence, False, False),
+    # may import the old usage or bigram file
+    'usage' : (requestUsage, False, True),
+    'bigram' : (requestBigram, False, True),
+}
+
+
+def serve(dbFile, inputFile, outputFile):
+    conn = dbFunc.dbSqliteOpen(dbFile)
+    dbFunc.dbSqliteInit(conn)
+    conn.commit()
+    journal = dbFunc.dbJournalOpen(conn, dbFile)
+    try:
+        for line in inputFile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                response = {'id' : None, 'error' : 'invalid request: ' + str(e)}
+                outputFile.write(json.dumps(response, ensure_ascii=False) + '\n')
+                outputFile.flush()
+                continue
+            method = request.get('method', '')
+            if method == 'quit':
+                break
+            if dbFunc.dbJournalDbReplaced(journal):
+                # rebuilt by import_txt_to_db.py, records not flushed yet are applied to the new db
+                dbFunc.dbJournalClose(conn, journal)
+                conn.close()
+                conn = dbFunc.dbSqliteOpen(dbFile)
+                dbFunc.dbSqliteInit(conn)
+                conn.commit()
+                journal = dbFunc.dbJournalOpen(conn, dbFile)
+            response = {'id' : request.get('id', None)}
+            handler = REQUEST_HANDLERS.get(method, None)
+            if handler is None:
+                response['error'] = 'unknown method: ' + str(method)
+            else:
+                try:
+                    if handler[1]:
+                        dbFunc.dbJournalFlush(conn, journal)
+                    response['result'] = handler[0](conn, journal, request.get('params', {}))
+                    if handler[2]:
+                        conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    response['error'] = str(e)
+            outputFile.write(json.dumps(response, ensure_ascii=False) + '\n')
+            outputFile.flush()
+    finally:
+        conn.commit()
+        dbFunc.dbJournalClose(conn, journal)
+        conn.close()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    dbFile = sys.argv[1]
+    dbDir = os.path.dirname(dbFile)
+    if dbDir and not os.path.exists(dbDir):
+        os.makedirs(dbDir, exist_ok=True)
+
+    # killed by Vim on exit, still flush the journal
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    inputFile = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+    outputFile = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    serve(dbFile, inputFile, outputFile)
+
+
+if __name__ == '__main__':
+    main()
@@ -14,6 +14,8 @@ import sys
 import os
 import sqlite3
 
+import dbFunc
+
 
 def add_word_to_db(db_file, key, word):
     """
@@ -35,19 +37,10 @@ def add_word_to_db(db_file, key, word):
         cursor = conn.cursor()
         
         # 检查表是否存在
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='words'")
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name='words'")
         if not cursor.fetchone():
-            # 创建表
-            cursor.execute('''
-                CREATE TABLE words (
-                    key TEXT NOT NULL,
-                    word TEXT NOT NULL,
-                    frequency INTEGER DEFAULT 0,
-                    PRIMARY KEY (key, word)
-                )
-            ''')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_key ON words(key)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_word ON words(word)')
+            # 创建表和索引
+            dbFunc.dbSqliteInit(conn)
         
         # 插入词（如果已存在则忽略）
         try:
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量编辑数据库：读取每行一个 JSON 的编辑（格式同 dbFunc.dbEditApplyPy），
+在一个进程、一个事务中完成，每条编辑一个 SAVEPOINT，出错的编辑单独回滚，最后只提交一次
+
+用法:
+    python3 db_batch_edit.py <db_file> [edit_file]
+    （不指定 edit_file 时从标准输入读取，空行忽略）
+
+编辑:
+    {"action": "add", "key": "ceshi", "word": "测试"}        -> 1 新增 / 0 已存在
+    {"action": "remove", "key": "ceshi", "word": "测试"}     -> {词: 删除的记录数}
+                                                            （不带 key 时删除所有编码下的词，"fuzzy": true 为包含匹配）
+    {"action": "reorder", "key": "ceshi", "word": "测试"}    -> true / false
+
+输出（每条编辑一行，与输入的顺序相同）:
+    {"result": 1}
+    {"error": "..."}
+
+示例:
+    printf '%s\\n' '{"action": "add", "key": "ceshi", "word": "测试"}' | python3 db_batch_edit.py ~/.config/nvim/sbzr.nvim.im.db/sbzr.db
+"""
+
+import io
+import json
+import os
+import sys
+
+import dbFunc
+
+
+def read_edits(edit_file):
+    """
+    读取编辑，无法解析的行保留为 None，以便输出与输入一一对应
+
+    Returns:
+        list: [edit 或 None, ...]
+    """
+    if edit_file:
+        with io.open(edit_file, 'r', encoding='utf-8') as f:
+            lines = f.read().split('\n')
+    else:
+        lines = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8').read().split('\n')
+    edits = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            edit = json.loads(line)
+        except ValueError:
+            edit = None
+        edits.append(edit if isinstance(edit, dict) else None)
+    return edits
+
+
+def batch_edit(db_file, edits):
+    """
+    在一个事务中应用所有编辑
+
+    Args:
+        db_file: SQLite 数据库文件路径
+        edits: 编辑列表，None 为无法解析的行
+
+    Returns:
+        list: 每条编辑的结果 {'result' : ...} 或 {'error' : '...'}
+    """
+    db_dir = os.path.dirname(db_file)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir, exist_ok=True)
+
+    conn = dbFunc.dbSqliteOpen(db_file)
+    try:
+        dbFunc.dbSqliteInit(conn)
+        conn.commit()
+        resultList = dbFunc.dbSqliteEditApply(conn, [e for e in edits if e is not None])
+        conn.commit()
+    finally:
+        conn.close()
+
+    results = []
+    resultIter = iter(resultList)
+    for e in edits:
+        results.append(next(resultIter) if e is not None else {'error' : 'invalid json'})
+    return results
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    db_file = sys.argv[1]
+    edit_file = sys.argv[2] if len(sys.argv) > 2 else ''
+
+    try:
+        results = batch_edit(db_file, read_edits(edit_file))
+    except Exception as e:
+        print(f'错误: {e}', file=sys.stderr)
+        sys.exit(1)
+
+    output = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    for result in results:
+        output.write(json.dumps(result, ensure_ascii=False) + '\n')
+    output.flush()
+
+
+if __name__ == '__main__':
+    main()
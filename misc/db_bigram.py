@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+输出 bigram 表中的二元词频（每行 上一个词 词 次数，以 tab 分隔），按次数排序
+bigram 表为空时，先导入旧版的二元词频文件（每行 上一个词 词 次数）
+
+用法:
+    python3 db_bigram.py <db_file> [import_file]
+
+示例:
+    python3 db_bigram.py dict/sbzr.userdb.db ~/.local/share/nvim/sbzr_nvim_im_word_bigram.txt
+"""
+
+import os
+import sys
+
+import dbFunc
+
+
+def list_bigram(db_file, import_file):
+    """
+    输出 bigram 表
+
+    Args:
+        db_file: SQLite 数据库文件路径
+        import_file: 旧版的二元词频文件，不需要时为空
+    """
+    if not os.path.exists(db_file):
+        print(f'错误: 数据库文件不存在: {db_file}', file=sys.stderr)
+        return False
+
+    conn = dbFunc.dbSqliteOpen(db_file)
+    try:
+        dbFunc.dbSqliteBigramInit(conn)
+        dbFunc.dbSqliteBigramImport(conn, import_file)
+        conn.commit()
+        for prev, word, count in dbFunc.dbSqliteBigramList(conn):
+            print(f'{prev}\t{word}\t{count}')
+        return True
+    except Exception as e:
+        print(f'错误: {e}', file=sys.stderr)
+        return False
+    finally:
+        conn.close()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    db_file = sys.argv[1]
+    import_file = sys.argv[2] if len(sys.argv) > 2 else ''
+
+    success = list_bigram(db_file, import_file)
+    sys.exit(0 if success else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+把数据库升级到当前的表结构（words 表改为 WITHOUT ROWID，去掉多余的 idx_key 索引），
+然后 VACUUM 压缩数据库文件，已是当前结构时只输出版本；
+不指定选项时保持原来的结构，已规范化的数据库不会改回普通的 words 表
+
+升级在一个事务中完成，词库服务（dbServer.py）运行时也可以直接升级
+
+--normalize: 改用规范化的表结构（可选），编码和词各只存一次（keys / strings 表），
+    entries 表只存编号和词频，words 改为同名视图，其他脚本照常使用；
+    词库越大、同一个词对应的编码越多，文件越小
+--denormalize: 改回普通的 words 表（只有指定此选项时才会改回）
+
+用法:
+    python3 db_migrate.py [--normalize | --denormalize] <db_file>
+
+示例:
+    python3 db_migrate.py ~/.config/nvim/sbzr.nvim.im.db/sbzr.db
+    python3 db_migrate.py --normalize ~/.config/nvim/sbzr.nvim.im.db/sbzr.db
+    python3 db_migrate.py --denormalize ~/.config/nvim/sbzr.nvim.im.db/sbzr.db
+"""
+
+import os
+import sys
+import time
+
+import dbFunc
+
+
+def migrate_db(db_file, target_version=None):
+    """
+    升级数据库
+
+    Args:
+        db_file: SQLite 数据库文件路径
+        target_version: 目标版本，DB_SCHEMA_VERSION 或 DB_SCHEMA_NORMALIZED，
+            None 时保持原来的结构
+    """
+    if not os.path.exists(db_file):
+        print(f'错误: 数据库文件不存在: {db_file}', file=sys.stderr)
+        return False
+
+    size_before = os.path.getsize(db_file)
+    start_time = time.perf_counter()
+    conn = dbFunc.dbSqliteOpen(db_file)
+    try:
+        if target_version is None:
+            target_version = dbFunc.DB_SCHEMA_NORMALIZED if dbFunc.dbSqliteIsNormalized(conn) else dbFunc.DB_SCHEMA_VERSION
+        if target_version == dbFunc.DB_SCHEMA_NORMALIZED:
+            version = dbFunc.dbSqliteNormalize(conn)
+        elif dbFunc.dbSqliteIsNormalized(conn):
+            version = dbFunc.dbSqliteDenormalize(conn)
+        else:
+            version = dbFunc.dbSqliteMigrate(conn)
+        if version == target_version:
+            print(f'已是当前版本: {version}')
+            return True
+        # VACUUM 不能在事务中执行
+        conn.execute('VACUUM')
+    except Exception as e:
+        print(f'错误: {e}', file=sys.stderr)
+        return False
+    finally:
+        conn.close()
+
+    size_after = os.path.getsize(db_file)
+    print(f'版本: {version} -> {target_version}')
+    print(f'文件大小: {size_before / 1024 / 1024:.1f} MB -> {size_after / 1024 / 1024:.1f} MB')
+    print(f'耗时: {time.perf_counter() - start_time:.2f} s')
+    return True
+
+
+def main():
+    args = sys.argv[1:]
+    target_version = None
+    if len(args) > 0 and args[0] in ('--normalize', '--denormalize'):
+        if args[0] == '--normalize':
+            target_version = dbFunc.DB_SCHEMA_NORMALIZED
+        else:
+            target_version = dbFunc.DB_SCHEMA_VERSION
+        args = args[1:]
+    if len(args) < 1:
+        print(__doc__)
+        sys.exit(1)
+
+    db_file = args[0]
+
+    success = migrate_db(db_file, target_version)
+    sys.exit(0 if success else 1)
+
+
+if __name__ == '__main__':
+    main()
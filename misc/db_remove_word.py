@@ -13,7 +13,8 @@
 
 import sys
 import os
-import sqlite3
+
+import dbFunc
 
 
 def remove_words_from_db(db_file, words, fuzzy=False):
@@ -30,37 +31,22 @@ def remove_words_from_db(db_file, words, fuzzy=False):
         return False
     
     try:
-        conn = sqlite3.connect(db_file)
-        cursor = conn.cursor()
+        conn = dbFunc.dbSqliteOpen(db_file)
+        # 建立词的索引（如果还没有），模糊匹配通过 trigram 索引查找
+        dbFunc.dbSqliteInit(conn)
         
         removed_count = {}
         removed_words = {}  # 记录实际删除的词
         total_records = 0  # 记录实际删除的数据库记录数
         
         for word in words:
+            removed = dbFunc.dbSqliteWordRemove(conn, word, fuzzy)
+            count = sum(removed.values())
+            removed_count[word] = count
             if fuzzy:
-                # 模糊匹配：删除所有包含该词的记录
-                cursor.execute('SELECT word FROM words WHERE word LIKE ?', (f'%{word}%',))
-                matching_words = [row[0] for row in cursor.fetchall()]
-                
-                total_count = 0
-                for matching_word in matching_words:
-                    cursor.execute('DELETE FROM words WHERE word = ?', (matching_word,))
-                    count = cursor.rowcount
-                    total_count += count
-                    total_records += count
-                    if matching_word not in removed_words:
-                        removed_words[matching_word] = 0
-                    removed_words[matching_word] += count
-                
-                removed_count[word] = total_count
-            else:
-                # 精确匹配：删除完全匹配该词的记录
-                cursor.execute('DELETE FROM words WHERE word = ?', (word,))
-                count = cursor.rowcount
-                removed_count[word] = count
-                if count > 0:
-                    removed_words[word] = count
+                total_records += count
+            for removed_word, removed_word_count in removed.items():
+                removed_words[removed_word] = removed_words.get(removed_word, 0) + removed_word_count
         
         conn.commit()
         
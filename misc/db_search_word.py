@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+在数据库中搜索词，输出所有匹配的 编码 词 词频（每行一条，以 tab 分隔）
+
+默认精确匹配，包含匹配通过 trigram 索引查找（见 dbFunc.dbSqliteWordIndexInit）
+
+用法:
+    python3 db_search_word.py <db_file> [--prefix|-p] [--fuzzy|-f] <word1> [word2] ...
+
+示例:
+    python3 db_search_word.py dict/sbzr.userdb.db 测试
+    python3 db_search_word.py dict/sbzr.userdb.db --prefix 测
+    python3 db_search_word.py dict/sbzr.userdb.db --fuzzy 输入法
+"""
+
+import os
+import sys
+
+import dbFunc
+
+
+def search_words_in_db(db_file, words, mode):
+    """
+    在数据库中搜索词
+
+    Args:
+        db_file: SQLite 数据库文件路径
+        words: 要搜索的词列表
+        mode: dbFunc.DB_WORD_SEARCH_xxx
+    """
+    if not os.path.exists(db_file):
+        print(f'错误: 数据库文件不存在: {db_file}')
+        return False
+
+    conn = dbFunc.dbSqliteOpen(db_file)
+    try:
+        # 建立词的索引（如果还没有）
+        dbFunc.dbSqliteInit(conn)
+        conn.commit()
+
+        found = set()
+        for word in words:
+            for key, matching_word, frequency in dbFunc.dbSqliteWordSearch(conn, word, mode=mode):
+                if (key, matching_word) in found:
+                    continue
+                found.add((key, matching_word))
+                print(f'{key}\t{matching_word}\t{frequency}')
+        if not found:
+            print('NOT_FOUND')
+        return True
+    except Exception as e:
+        print(f'错误: {e}')
+        return False
+    finally:
+        conn.close()
+
+
+def main():
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    db_file = sys.argv[1]
+    mode = dbFunc.DB_WORD_SEARCH_EXACT
+    words = []
+    for arg in sys.argv[2:]:
+        if arg in ['--prefix', '-p']:
+            mode = dbFunc.DB_WORD_SEARCH_PREFIX
+        elif arg in ['--fuzzy', '-f']:
+            mode = dbFunc.DB_WORD_SEARCH_SUBSTRING
+        else:
+            words.append(arg)
+
+    if not words:
+        print('错误: 请提供要搜索的词')
+        sys.exit(1)
+
+    success = search_words_in_db(db_file, words, mode)
+    sys.exit(0 if success else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,13 +2,16 @@
 # -*- coding: utf-8 -*-
 """
 更新数据库中的词频
-当用户选择词后，调用此脚本更新数据库中的频率
+当用户选择词后，调用此脚本更新数据库中的频率（给出 used_time 时同时计入 usage 表，
+给出 prev_word 时同时计入 bigram 表）
 """
 import sys
 import os
 import sqlite3
 
-def update_word_frequency(db_file, key, word, increment=1):
+import dbFunc
+
+def update_word_frequency(db_file, key, word, increment=1, used_time=None, prev_word=None):
     """
     更新数据库中某个词的频率
     
@@ -17,6 +20,8 @@ def update_word_frequency(db_file, key, word, increment=1):
         key: 编码
         word: 词
         increment: 增加的频率值（默认1）
+        used_time: 该词被使用的时刻（unix 时间），None 表示不计入 usage 表
+        prev_word: 上一个上屏的词，None 表示不计入 bigram 表
     
     Returns:
         bool: 是否成功
@@ -27,37 +32,22 @@ def update_word_frequency(db_file, key, word, increment=1):
     
     try:
         conn = sqlite3.connect(db_file)
-        cursor = conn.cursor()
         
         # 检查是否有 frequency 字段
-        cursor.execute("PRAGMA table_info(words)")
-        columns = [col[1] for col in cursor.fetchall()]
-        if 'frequency' not in columns:
+        if not dbFunc.dbSqliteHasFrequency(conn):
             print('错误: 数据库表没有 frequency 字段')
             conn.close()
             return False
         
-        # 获取当前频率
-        cursor.execute('SELECT frequency FROM words WHERE key = ? AND word = ?', (key, word))
-        row = cursor.fetchone()
-        
-        if row is None:
-            # 词不存在，插入新记录（频率设为 increment）
-            cursor.execute(
-                'INSERT INTO words (key, word, frequency) VALUES (?, ?, ?)',
-                (key, word, increment)
-            )
-        else:
-            # 更新频率（增加 increment）
-            current_freq = row[0] or 0
-            new_freq = current_freq + increment
-            # 限制最大频率，防止溢出
-            if new_freq > 1000000:
-                new_freq = 1000000
-            cursor.execute(
-                'UPDATE words SET frequency = ? WHERE key = ? AND word = ?',
-                (new_freq, key, word)
-            )
+        dbFunc.dbSqliteFrequencyAdd(conn, key, word, increment)
+        if used_time is not None:
+            dbFunc.dbSqliteUsageInit(conn)
+            dbFunc.dbSqliteUsageApply(conn, [(key, word, 1, used_time)])
+            dbFunc.dbSqliteUsagePrune(conn)
+        if prev_word:
+            dbFunc.dbSqliteBigramInit(conn)
+            dbFunc.dbSqliteBigramAddBatch(conn, {(prev_word, word) : 1})
+            dbFunc.dbSqliteBigramPrune(conn)
         
         conn.commit()
         conn.close()
@@ -68,7 +58,7 @@ def update_word_frequency(db_file, key, word, increment=1):
 
 def main():
     if len(sys.argv) < 4:
-        print('用法: python3 db_update_frequency.py <db_file> <key> <word> [increment]')
+        print('用法: python3 db_update_frequency.py <db_file> <key> <word> [increment] [used_time] [prev_word]')
         print('示例: python3 db_update_frequency.py dict/sbzr.userdb.db zheng 正 1')
         sys.exit(1)
     
@@ -76,8 +66,10 @@ def main():
     key = sys.argv[2]
     word = sys.argv[3]
     increment = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+    used_time = int(sys.argv[5]) if len(sys.argv) > 5 else None
+    prev_word = sys.argv[6] if len(sys.argv) > 6 else None
     
-    success = update_word_frequency(db_file, key, word, increment)
+    success = update_word_frequency(db_file, key, word, increment, used_time, prev_word)
     if success:
         print('OK')
     else:
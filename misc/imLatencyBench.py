@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+输入法按键延迟测试：用 nvim --headless 加载插件和 dbGen.py 生成的词库，
+在插入模式中回放按键记录（经过输入法的按键映射，即 ZFVimIME_input / ZFVimIME_space 等），
+统计每次按键的延迟（p50 / p95 / p99），并分别统计其中 dbSearch、别名匹配、排序、浮动窗口绘制的耗时
+
+按键记录文件每行一段输入，每个字符是一次按键，`<bs>` 这样的写法是一个特殊键，
+空格选第一个候选，空行和 # 开头的行忽略，例如:
+    nihk ceui
+    ceui<bs>i
+不指定按键记录时，从生成的词库中随机取编码生成
+
+用法:
+    python3 imLatencyBench.py [选项]
+
+选项:
+    --rows N            词库的行数（编码-词对数），默认 100000
+    --trace FILE        按键记录文件
+    --traces N          不指定按键记录时，生成多少段输入，默认 200
+    --warmup N          前 N 段输入只用于预热，不计入结果，默认 5
+    --nvim PATH         nvim 可执行文件，默认 nvim
+    --out FILE          结果文件（JSON），默认 imLatencyBench_result.json
+    --data-dir DIR      生成的词库文件保存在这里，下次直接使用，默认每次重新生成
+    --timeout SECONDS   nvim 的最长运行时间，默认 600
+
+示例:
+    python3 imLatencyBench.py --rows 1000000
+    python3 imLatencyBench.py --trace my_trace.txt --warmup 0
+"""
+
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import dbGen
+
+
+DEFAULT_ROWS = 100000
+DEFAULT_TRACES = 200
+DEFAULT_WARMUP = 5
+DEFAULT_TIMEOUT = 600
+# sample names, see ZFVimIM_DEBUG_sampleStop, in order of report
+IM_LATENCY_METRICS = ['total', 'complete', 'dbSearch', 'aliasMatch', 'sort', 'floatRender']
+IM_LATENCY_PERCENTILES = [50, 95, 99]
+# (min, max) words of generated trace
+IM_LATENCY_TRACE_WORDS = (3, 8)
+IM_LATENCY_RESULT_VERSION = 1
+
+# sourced by nvim -u, `{...}` are replaced by json encoded values
+IM_LATENCY_INIT_VIM = r'''
+set nocompatible
+set noswapfile
+set shortmess+=I
+let &runtimepath = {pluginDir} . ',' . &runtimepath
+let g:ZFVimIM_cachePath = {cacheDir}
+
+function! s:imLatencyWrite(result)
+    call writefile([json_encode(a:result)], {resultFile})
+    qall!
+endfunction
+function! s:imLatencyError()
+    call s:imLatencyWrite({'error' : v:exception . ' @ ' . v:throwpoint})
+endfunction
+
+function! s:imLatencyStart()
+    try
+        let startTime = reltime()
+        call ZFVimIME_init()
+        let s:loadSeconds = reltimefloat(reltime(startTime, reltime()))
+        startinsert
+        call timer_start(0, function('s:imLatencyEnable'))
+    catch
+        call s:imLatencyError()
+    endtry
+endfunction
+function! s:imLatencyEnable(...)
+    try
+        call ZFVimIME_start()
+        call timer_start(0, function('s:imLatencyReplay'))
+    catch
+        call s:imLatencyError()
+    endtry
+endfunction
+function! s:imLatencyReplay(...)
+    try
+        if !ZFVimIME_enabled() || mode() !=# 'i'
+            throw 'IME not enabled, mode: ' . mode()
+        endif
+        let traceList = json_decode(join(readfile({traceFile}), "\n"))
+        call ZFVimIM_DEBUG_replay(traceList, function('s:imLatencyDone'))
+    catch
+        call s:imLatencyError()
+    endtry
+endfunction
+function! s:imLatencyDone(sampleList)
+    call s:imLatencyWrite({
+                \   'loadSeconds' : s:loadSeconds,
+                \   'nvimVersion' : matchstr(execute('version'), 'NVIM v\S\+'),
+                \   'sampleList' : a:sampleList,
+                \ })
+endfunction
+
+autocmd VimEnter * call s:imLatencyStart()
+'''
+
+
+def scriptPath(name):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+
+
+def repoDir():
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# return [trace, ...], see __doc__ for format
+def loadTraceFile(traceFile):
+    traceList = []
+    with io.open(traceFile, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.rstrip('\r\n')
+            if line.strip() == '' or line.startswith('#'):
+                continue
+            traceList.append(line)
+    return traceList
+
+
+# type the key and choose by space, sometimes by label (SBZR: 4 letters + a/e/u/i/o),
+# and sometimes mistype the last letter then <bs>
+def genTraces(rows, traceCount, seed):
+    keyList = []
+    for key, wordList in dbGen.dbGenRows(rows):
+        keyList.append((key, len(wordList)))
+    rand = random.Random(seed)
+    traceList = []
+    for _ in range(traceCount):
+        trace = ''
+        for _ in range(rand.randint(*IM_LATENCY_TRACE_WORDS)):
+            key, wordCount = rand.choice(keyList)
+            if rand.random() < 0.05:
+                trace += key[:-1] + rand.choice('abcdefghijklmnopqrstuvwxyz') + '<bs>' + key[-1]
+            else:
+                trace += key
+            if len(key) == 4 and wordCount >= 2 and rand.random() < 0.2:
+                trace += 'a'
+            else:
+                trace += ' '
+        traceList.append(trace)
+    return traceList
+
+
+# nvim's stdpath('data') . '/lazy/sbzr.nvim.im' is where the plugin looks for dict and misc
+def prepareNvim(rows, dataDir, workDir):
+    srcDir = dataDir if dataDir else workDir
+    txtFile = os.path.join(srcDir, f'dbBench_{rows}.yaml')
+    if not os.path.isfile(txtFile):
+        dbGen.dbGenTxt(rows, txtFile)
+
+    pluginDir = os.path.join(workDir, 'data', 'nvim', 'lazy', 'sbzr.nvim.im')
+    ignore = shutil.ignore_patterns('__pycache__', '*.pyc')
+    shutil.copytree(os.path.join(repoDir(), 'plugin'), os.path.join(pluginDir, 'plugin'), ignore=ignore)
+    shutil.copytree(os.path.join(repoDir(), 'misc'), os.path.join(pluginDir, 'misc'), ignore=ignore)
+    os.makedirs(os.path.join(pluginDir, 'dict'))
+    shutil.copyfile(txtFile, os.path.join(pluginDir, 'dict', 'sbzr.yaml'))
+
+    # import before starting nvim, so that nvim only loads the db
+    dbDir = os.path.join(workDir, 'config', 'nvim', 'sbzr.nvim.im.db')
+    os.makedirs(dbDir)
+    subprocess.run([sys.executable, scriptPath('import_txt_to_db.py'),
+            os.path.join(pluginDir, 'dict', 'sbzr.yaml'), os.path.join(dbDir, 'sbzr.db')],
+            stdout=subprocess.DEVNULL, check=True)
+    return pluginDir
+
+
+# return result of IM_LATENCY_INIT_VIM
+def runNvim(nvim, pluginDir, traceList, workDir, timeout):
+    traceFile = os.path.join(workDir, 'trace.json')
+    resultFile = os.path.join(workDir, 'result.json')
+    initFile = os.path.join(workDir, 'init.vim')
+    with io.open(traceFile, 'w', encoding='utf-8') as file:
+        json.dump(traceList, file, ensure_ascii=False)
+    initVim = IM_LATENCY_INIT_VIM
+    for name, value in [
+            ('pluginDir', pluginDir),
+            ('cacheDir', os.path.join(workDir, 'cache')),
+            ('resultFile', resultFile),
+            ('traceFile', traceFile),
+            ]:
+        # json string is also a valid vim string
+        initVim = initVim.replace('{' + name + '}', json.dumps(value))
+    with io.open(initFile, 'w', encoding='utf-8') as file:
+        file.write(initVim)
+
+    env = dict(os.environ)
+    for name in ['data', 'config', 'state', 'cache']:
+        env[f'XDG_{name.upper()}_HOME'] = os.path.join(workDir, name)
+    with io.open(os.path.join(workDir, 'nvim.log'), 'wb') as log:
+        subprocess.run([nvim, '--headless', '-n', '-i', 'NONE', '-u', initFile],
+                stdin=subprocess.DEVNULL, stdout=log, stderr=log, env=env, timeout=timeout)
+    if not os.path.isfile(resultFile):
+        raise RuntimeError(f'nvim exited without result, see {os.path.join(workDir, "nvim.log")}')
+    with io.open(resultFile, 'r', encoding='utf-8') as file:
+        result = json.load(file)
+    if 'error' in result:
+        raise RuntimeError(result['error'])
+    return result
+
+
+# nearest-rank percentile of sorted list
+def percentile(sortedList, p):
+    if len(sortedList) == 0:
+        return 0
+    index = max(0, -(-len(sortedList) * p // 100) - 1)
+    return sortedList[index]
+
+
+def keyKind(key):
+    if len(key) == 1 and 'a' <= key <= 'z':
+        return 'input'
+    elif key in (' ', '<space>'):
+        return 'space'
+    return 'other'
+
+
+# return {'all' : {metric : {'p50', 'p95', 'p99', 'max', 'mean'}}, 'input' : ..., ...}, in ms
+def summarize(sampleList):
+    groups = {'all' : sampleList}
+    for sample in sampleList:
+        groups.setdefault(keyKind(sample['key']), []).append(sample)
+    summary = {}
+    for group, samples in groups.items():
+        item = {'count' : len(samples)}
+        for metric in IM_LATENCY_METRICS:
+            values = sorted(sample.get(metric, 0) / 1000.0 for sample in samples)
+            stat = {f'p{p}' : round(percentile(values, p), 3) for p in IM_LATENCY_PERCENTILES}
+            stat['max'] = round(values[-1], 3) if values else 0
+            stat['mean'] = round(sum(values) / len(values), 3) if values else 0
+            item[metric] = stat
+        summary[group] = item
+    return summary
+
+
+def printSummary(summary):
+    for group in ['all', 'input', 'space', 'other']:
+        if group not in summary:
+            continue
+        item = summary[group]
+        print(f'{group} ({item["count"]} keys), ms')
+        header = ['p50', 'p95', 'p99', 'max', 'mean']
+        print(f'    {"":<12}' + ''.join(f'{name:>9}' for name in header))
+        for metric in IM_LATENCY_METRICS:
+            print(f'    {metric:<12}' + ''.join(f'{item[metric][name]:>9.3f}' for name in header))
+
+
+def parseArgs(argv):
+    option = {
+        'rows' : DEFAULT_ROWS,
+        'trace' : '',
+        'traces' : DEFAULT_TRACES,
+        'warmup' : DEFAULT_WARMUP,
+        'nvim' : 'nvim',
+        'out' : 'imLatencyBench_result.json',
+        'dataDir' : '',
+        'timeout' : DEFAULT_TIMEOUT,
+    }
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        value = argv[i + 1] if i + 1 < len(argv) else None
+        if arg in ('--rows', '--traces', '--warmup', '--timeout') and value is not None:
+            option[arg[2:]] = int(value)
+            i += 2
+        elif arg in ('--trace', '--nvim', '--out') and value is not None:
+            option[arg[2:]] = value
+            i += 2
+        elif arg == '--data-dir' and value is not None:
+            option['dataDir'] = value
+            i += 2
+        else:
+            return None
+    return option
+
+
+def main():
+    option = parseArgs(sys.argv[1:])
+    if option is None:
+        print(__doc__)
+        sys.exit(1)
+    if shutil.which(option['nvim']) is None:
+        print(f'错误: 找不到 nvim: {option["nvim"]}', file=sys.stderr)
+        sys.exit(1)
+    if option['dataDir']:
+        os.makedirs(option['dataDir'], exist_ok=True)
+
+    if option['trace']:
+        traceList = loadTraceFile(option['trace'])
+    else:
+        traceList = genTraces(option['rows'], option['traces'], option['rows'] + 3)
+    if len(traceList) <= option['warmup']:
+        print(f'错误: 按键记录只有 {len(traceList)} 段，不多于预热的段数', file=sys.stderr)
+        sys.exit(1)
+
+    workDir = tempfile.mkdtemp(prefix='imLatencyBench')
+    success = False
+    try:
+        startTime = time.perf_counter()
+        pluginDir = prepareNvim(option['rows'], option['dataDir'], workDir)
+        print(f'prepare: {time.perf_counter() - startTime:.2f} s')
+        result = runNvim(option['nvim'], pluginDir, traceList, workDir, option['timeout'])
+        sampleList = [sample for sample in result['sampleList'] if sample['trace'] >= option['warmup']]
+        summary = summarize(sampleList)
+        print(f'{result["nvimVersion"]}, {option["rows"]} rows, load: {result["loadSeconds"]:.3f} s')
+        printSummary(summary)
+
+        with io.open(option['out'], 'w', encoding='utf-8') as file:
+            json.dump({
+                'version' : IM_LATENCY_RESULT_VERSION,
+                'time' : datetime.datetime.now().isoformat(timespec='seconds'),
+                'platform' : platform.platform(),
+                'python' : platform.python_version(),
+                'nvim' : result['nvimVersion'],
+                'rows' : option['rows'],
+                'traceFile' : option['trace'],
+                'traceCount' : len(traceList),
+                'warmup' : option['warmup'],
+                'loadSeconds' : round(result['loadSeconds'], 4),
+                'summary' : summary,
+            }, file, ensure_ascii=False, indent=2)
+            file.write('\n')
+        print(f'result: {option["out"]}')
+        success = True
+    except (RuntimeError, subprocess.SubprocessError) as e:
+        print(f'错误: {e}', file=sys.stderr)
+    finally:
+        if success:
+            shutil.rmtree(workDir, ignore_errors=True)
+        else:
+            print(f'工作目录保留在: {workDir}', file=sys.stderr)
+    sys.exit(0 if success else 1)
+
+
+if __name__ == '__main__':
+    main()
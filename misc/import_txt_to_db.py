@@ -4,9 +4,12 @@
 从 YAML 文件完整导入到数据库（清空后重新导入）
 
 功能：
-1. 清空数据库中的所有数据
-2. 从 YAML 文件完整导入所有数据
-3. 确保数据库和 YAML 文件内容完全一致
+1. 整理 YAML 文件（去重、按词数排序）
+2. 将所有数据批量写入一个新的临时数据库（无索引的暂存表，关闭日志和同步）
+3. 按主键顺序写入 words 表后再建立索引
+4. 用临时数据库原子替换原数据库，确保数据库和 YAML 文件内容完全一致
+   （词频日志先写入原数据库，用词记录随后复制到新数据库；
+    运行中的词库服务（dbServer.py）发现数据库被替换后会重新打开）
 
 用法:
     python3 import_txt_to_db.py <txt_file> [db_file]
@@ -18,7 +21,9 @@
 import sys
 import os
 import sqlite3
-from collections import defaultdict
+
+import dbFunc
+import dbParse
 
 
 def clean_and_sort_txt_file(txt_file):
@@ -32,85 +37,31 @@ def clean_and_sort_txt_file(txt_file):
         txt_file: YAML 文件路径
     
     Returns:
-        bool: 是否成功
+        list: 整理后的 [(key, [(word, freq_str or None), ...]), ...]，失败时为 None
     """
     if not os.path.exists(txt_file):
         print(f'错误: YAML 文件不存在: {txt_file}')
-        return False
+        return None
     
     print('正在整理 YAML 文件...')
     print('=' * 60)
     
-    # 读取并处理文件
-    # key -> list of (word, freq_str or None), keep first-seen order
-    key_to_words = {}
-    total_lines = 0
-    processed_lines = 0
-    
-    with open(txt_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            total_lines += 1
-            line = line.rstrip('\n').strip()
-            
-            # 跳过空行和注释
-            if not line or line.startswith('#'):
-                continue
-            
-            # 处理转义空格
-            line_tmp = line.replace('\\ ', '_ZFVimIM_space_')
-            parts = line_tmp.split()
-            words = parts[1:]
-            
-            if len(parts) < 2:
-                continue
-            
-            key = parts[0]
-            processed_lines += 1
-            
-            # 去重：使用列表存储词，检查是否已存在
-            if key not in key_to_words:
-                key_to_words[key] = []
-            
-            # 添加到列表（保持顺序，但去重）
-            for word_part in words:
-                word_part = word_part.strip()
-                if not word_part:
-                    continue
-                if ':' in word_part:
-                    word_raw, freq_str = word_part.rsplit(':', 1)
-                else:
-                    word_raw, freq_str = word_part, None
-                word = word_raw.replace('_ZFVimIM_space_', ' ')
-                # Dedup by word, keep higher freq if provided
-                exists_index = None
-                for i, (existing_word, existing_freq) in enumerate(key_to_words[key]):
-                    if existing_word == word:
-                        exists_index = i
-                        break
-                if exists_index is None:
-                    key_to_words[key].append((word, freq_str))
-                else:
-                    if freq_str is not None:
-                        existing_word, existing_freq = key_to_words[key][exists_index]
-                        if existing_freq is None:
-                            key_to_words[key][exists_index] = (existing_word, freq_str)
-                        else:
-                            try:
-                                if int(freq_str) > int(existing_freq):
-                                    key_to_words[key][exists_index] = (existing_word, freq_str)
-                            except ValueError:
-                                # Keep existing if new freq is invalid
-                                pass
+    # 读取并处理文件（多进程解析，按文件顺序合并）
+    # [(key, [(word, freq_str or None), ...]), ...]，编码和词保持第一次出现的顺序，
+    # 重复的词保留较大的频率
+    key_to_words, parse_stats = dbParse.dbParseMerged(txt_file)
+    total_lines = parse_stats['lines']
+    processed_lines = parse_stats['parsedLines']
     
     print(f'读取完成: 总行数 {total_lines}, 处理行数 {processed_lines}')
     print(f'发现 {len(key_to_words)} 个编码')
     
     # 统计去重情况
-    total_words = sum(len(words) for words in key_to_words.values())
+    total_words = sum(len(words) for key, words in key_to_words)
     print(f'总词数（去重后）: {total_words}')
     
     # 按词数从多到少排序
-    sorted_keys = sorted(key_to_words.items(), key=lambda x: len(x[1]), reverse=True)
+    sorted_keys = sorted(key_to_words, key=lambda x: len(x[1]), reverse=True)
     if sorted_keys:
         max_words = len(sorted_keys[0][1])
         print(f'排序完成: 词数最多的编码有 {max_words} 个词')
@@ -133,69 +84,104 @@ def clean_and_sort_txt_file(txt_file):
     
     print(f'整理完成！')
     print('=' * 60)
-    return True
+    return sorted_keys
 
 
-def clear_database(db_file):
-    """清空数据库中的所有数据"""
-    if not os.path.exists(db_file):
-        print(f'数据库文件不存在，将创建新文件: {db_file}')
-        return True
-    
-    try:
-        conn = sqlite3.connect(db_file)
-        cursor = conn.cursor()
-        
-        # 删除所有数据
-        cursor.execute('DELETE FROM words')
-        
-        # 重置自增计数器（如果存在的话）
-        try:
-            cursor.execute('DELETE FROM sqlite_sequence WHERE name="words"')
-        except sqlite3.OperationalError:
-            # sqlite_sequence 表可能不存在，忽略错误
-            pass
-        
-        conn.commit()
-        conn.close()
-        
-        print(f'已清空数据库: {db_file}')
-        return True
-    except Exception as e:
-        print(f'清空数据库时出错: {e}')
-        return False
+def iter_import_rows(entries):
+    """
+    按 YAML 中的顺序生成 (key, word, frequency)
+    若词带有 :freq 则使用指定频次；否则按顺序递减：
+    第一个词频率 = 词数，依次递减到 1（例如 10 个词 -> 10, 9, ..., 1）
+    """
+    for key, words in entries:
+        word_count = len(words)
+        for idx, (word, freq_str) in enumerate(words):
+            if freq_str is None:
+                frequency = word_count - idx
+            else:
+                try:
+                    frequency = int(freq_str)
+                except ValueError:
+                    frequency = word_count - idx
+            yield (key, word, frequency)
 
 
-def init_database(db_file):
-    """初始化数据库表结构（如果不存在）"""
+def bulk_import(entries, db_file):
+    """
+    批量导入到新数据库，完成后原子替换 db_file
+
+    1. 在 db_file 同目录创建临时数据库，关闭回滚日志和同步
+    2. 写入无索引的临时暂存表（按文件顺序，seq 用于保留第一次出现的词）
+    3. 按主键顺序 INSERT ... SELECT 到 words 表，再建立索引
+    4. 把词频日志写入原数据库，再复制 usage（用词记录）、bigram 和 journal_state 表
+    5. os.replace 替换原数据库（失败时原数据库不受影响）
+    4、5 在词频日志的锁内完成，见 dbFunc.dbSqliteRebuildReplace
+
+    Returns:
+        tuple: (YAML 词数, 数据库记录数)
+    """
+    tmp_db_file = db_file + '.importing'
+    if os.path.exists(tmp_db_file):
+        os.remove(tmp_db_file)
+
+    # 保留原数据库的表结构（db_migrate.py --normalize）
+    normalized = False
+    if os.path.isfile(db_file):
+        old_conn = sqlite3.connect(db_file)
+        try:
+            normalized = dbFunc.dbSqliteIsNormalized(old_conn)
+        finally:
+            old_conn.close()
+
+    conn = sqlite3.connect(tmp_db_file)
     try:
-        conn = sqlite3.connect(db_file)
-        cursor = conn.cursor()
-        
-        # 创建表（如果不存在）
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS words (
+        conn.execute('PRAGMA journal_mode=OFF')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute('PRAGMA locking_mode=EXCLUSIVE')
+        conn.execute('PRAGMA cache_size=-256000')  # 256MB cache
+
+        conn.execute('''
+            CREATE TEMP TABLE staging (
+                seq INTEGER PRIMARY KEY,
                 key TEXT NOT NULL,
                 word TEXT NOT NULL,
-                frequency INTEGER DEFAULT 0,
-                PRIMARY KEY (key, word)
+                frequency INTEGER
             )
         ''')
-        
-        # 创建索引（如果不存在）
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_key ON words(key)
-        ''')
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_word ON words(word)
+        total_words = 0
+        batch_size = 10000
+        batch = []
+        for row in iter_import_rows(entries):
+            total_words += 1
+            batch.append(row)
+            if len(batch) >= batch_size:
+                conn.executemany('INSERT INTO staging (key, word, frequency) VALUES (?, ?, ?)', batch)
+                batch = []
+        if batch:
+            conn.executemany('INSERT INTO staging (key, word, frequency) VALUES (?, ?, ?)', batch)
+
+        dbFunc.dbSqliteWordsCreate(conn)
+        # 按主键顺序插入，重复的 (key, word) 保留文件中第一次出现的
+        conn.execute('''
+            INSERT OR IGNORE INTO words (key, word, frequency)
+            SELECT key, word, frequency FROM staging ORDER BY key, word, seq
         ''')
-        
+        conn.execute('DROP TABLE staging')
+        # 建立索引和 bucket_version 表
+        dbFunc.dbSqliteInit(conn)
         conn.commit()
+        if normalized:
+            dbFunc.dbSqliteNormalize(conn)
+        db_count = conn.execute('SELECT COUNT(*) FROM words').fetchone()[0]
+        # 用词记录不在 YAML 中，从原数据库保留，conn 在替换前关闭
+        dbFunc.dbSqliteRebuildReplace(conn, tmp_db_file, db_file)
+    except Exception:
         conn.close()
-        return True
-    except Exception as e:
-        print(f'初始化数据库时出错: {e}')
-        return False
+        if os.path.exists(tmp_db_file):
+            os.remove(tmp_db_file)
+        raise
+
+    return total_words, db_count
 
 
 def import_txt_to_db(txt_file, db_file):
@@ -206,123 +192,43 @@ def import_txt_to_db(txt_file, db_file):
         return False
     
     # Step 1: 清理和整理 YAML 文件
-    if not clean_and_sort_txt_file(txt_file):
+    entries = clean_and_sort_txt_file(txt_file)
+    if entries is None:
         print('错误: YAML 文件整理失败')
         return False
     
     print()
     
-    # 初始化数据库
-    if not init_database(db_file):
-        return False
-    
-    # 清空数据库
-    if not clear_database(db_file):
-        return False
-    
-    # 读取整理后的 YAML 文件并导入
-    print('正在读取整理后的 YAML 文件...')
-    conn = sqlite3.connect(db_file)
-    cursor = conn.cursor()
-    
-    # 准备批量插入
-    batch_size = 10000
-    batch = []
-    total_lines = 0
-    total_words = 0
+    db_dir = os.path.dirname(db_file)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir, exist_ok=True)
     
+    # Step 2: 批量导入并替换数据库
+    print('正在批量导入到数据库...')
     try:
-        with open(txt_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                total_lines += 1
-                
-                # 格式: key word1[:freq] word2[:freq] ...
-                # 处理转义空格
-                line_tmp = line.replace('\\ ', '_ZFVimIM_space_')
-                parts = line_tmp.split()
-                
-                if len(parts) <= 1:
-                    # 只有key，没有词，跳过
-                    continue
-                
-                key = parts[0]
-                words = parts[1:]
-                
-                # 处理每个词，按原始顺序设置词频
-                # 若词带有 :freq 则使用指定频次；否则按顺序递减
-                word_count = len(words)
-                
-                for idx, word_part in enumerate(words):
-                    if ':' in word_part:
-                        word_raw, freq_str = word_part.rsplit(':', 1)
-                    else:
-                        word_raw, freq_str = word_part, None
-                    word = word_raw.replace('_ZFVimIM_space_', ' ')
-                    total_words += 1
-                    if freq_str is None:
-                        # 按原始顺序设置词频：第一个词频率 = 词数，依次递减到 1
-                        # 例如：10个词 -> 10, 9, 8, 7, 6, 5, 4, 3, 2, 1
-                        frequency = word_count - idx
-                    else:
-                        try:
-                            frequency = int(freq_str)
-                        except ValueError:
-                            frequency = word_count - idx
-                    
-                    # 添加到批量插入列表
-                    batch.append((key, word, frequency))
-                    
-                    # 批量插入
-                    if len(batch) >= batch_size:
-                        cursor.executemany(
-                            'INSERT OR IGNORE INTO words (key, word, frequency) VALUES (?, ?, ?)',
-                            batch
-                        )
-                        batch = []
-        
-        # 插入剩余的数据
-        if batch:
-            cursor.executemany(
-                'INSERT OR IGNORE INTO words (key, word, frequency) VALUES (?, ?, ?)',
-                batch
-            )
-        
-        conn.commit()
-        
-        # 统计导入结果
-        cursor.execute('SELECT COUNT(*) FROM words')
-        db_count = cursor.fetchone()[0]
-        
-        conn.close()
-        
-        print()
-        print('=' * 60)
-        print('导入完成！')
-        print('=' * 60)
-        print(f'YAML 文件行数: {total_lines}')
-        print(f'YAML 文件词数: {total_words}')
-        print(f'数据库记录数: {db_count}')
-        print()
-        
-        if db_count == total_words:
-            print('✅ 数据库和 YAML 文件内容完全一致')
-        else:
-            print(f'⚠️  注意: 数据库记录数 ({db_count}) 与 TXT 词数 ({total_words}) 不一致')
-            print('   可能原因: 存在重复的 (key, word) 组合')
-        
-        print('=' * 60)
-        
-        return True
-        
+        total_words, db_count = bulk_import(entries, db_file)
     except Exception as e:
-        conn.rollback()
-        conn.close()
         print(f'导入时出错: {e}')
         return False
+    
+    print()
+    print('=' * 60)
+    print('导入完成！')
+    print('=' * 60)
+    print(f'YAML 文件行数: {len(entries)}')
+    print(f'YAML 文件词数: {total_words}')
+    print(f'数据库记录数: {db_count}')
+    print()
+    
+    if db_count == total_words:
+        print('✅ 数据库和 YAML 文件内容完全一致')
+    else:
+        print(f'⚠️  注意: 数据库记录数 ({db_count}) 与 TXT 词数 ({total_words}) 不一致')
+        print('   可能原因: 存在重复的 (key, word) 组合')
+    
+    print('=' * 60)
+    
+    return True
 
 
 def main():
@@ -337,7 +243,7 @@ def main():
         db_file = sys.argv[2]
     else:
         if txt_file.endswith('.yaml'):
-            db_file = txt_file[:-4] + '.db'
+            db_file = txt_file[:-5] + '.db'
         else:
             db_file = txt_file + '.db'
     
@@ -18,12 +18,20 @@ REQUIRED_SCRIPTS = {
     'db_export_for_edit.py',
     'db_add_word.py',
     'db_remove_word.py',
+    'db_batch_edit.py',
+    'db_search_word.py',
+    'db_usage.py',
+    'db_bigram.py',
+    'db_migrate.py',
     'dbLoad.py',
     'dbFunc.py',
     'dbSave.py',
     'dbNormalize.py',
     'dbCleanup.py',
     'db_update_frequency.py',
+    'dbServer.py',
+    'dbParse.py',
+    'dbSentence.py',
 }
 
 # 需要保留的 dict 文件（根据实际使用情况调整）
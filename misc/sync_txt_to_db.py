@@ -4,6 +4,9 @@
 将TXT文件中的新数据同步到SQLite数据库
 只插入TXT中存在但数据库中不存在的数据
 
+TXT 中的数据先流式写入临时表，再用一条 INSERT OR IGNORE ... SELECT 插入，
+不需要把数据库中的所有 (key, word) 读入内存
+
 用法:
     python3 sync_txt_to_db.py <txt_file> [db_file]
 
@@ -13,57 +16,31 @@
 
 import sys
 import os
-import sqlite3
 
+import dbFunc
+import dbParse
 
-def parse_line(line):
-    """
-    解析词库文件的一行
-    返回: (key, words_list) 或 None
-    """
-    line = line.rstrip('\n').strip()
-    
-    # 跳过空行和注释
-    if not line or line.startswith('#'):
-        return None
-    
-    # 处理转义的空格
-    line_tmp = line.replace('\\\\ ', '_ZFVimIM_space_')
-    parts = line_tmp.split()
-    words = parts[1:]
-    
-    if len(parts) < 2:
-        return None
-    
-    key = parts[0]
-    
-    # 解析词和频率
-    parsed_words = []
-    for word_part in words:
-        word_part = word_part.strip()
-        if not word_part:
-            continue
-        if ':' in word_part:
-            word_raw, freq_str = word_part.rsplit(':', 1)
-        else:
-            word_raw, freq_str = word_part, None
-        word = word_raw.replace('_ZFVimIM_space_', ' ')
-        parsed_words.append((word, freq_str))
-    
-    if not parsed_words:
-        return None
-    
-    return (key, parsed_words)
 
-
-def get_existing_data(conn):
+def iter_sync_rows(txt_file, stats):
     """
-    获取数据库中已存在的 (key, word) 对
-    返回一个set，元素为 (key, word) 元组
+    按文件顺序生成 (key, word, frequency)，同时统计行数
     """
-    cursor = conn.cursor()
-    cursor.execute('SELECT key, word FROM words')
-    return set(cursor.fetchall())
+    for key, words in dbParse.dbParseLines(txt_file, stats=stats):
+        stats['processed_lines'] += 1
+        
+        # 按原始顺序设置词频：第一个词频率 = 词数，依次递减到 1
+        # 例如：10个词 -> 10, 9, 8, 7, 6, 5, 4, 3, 2, 1
+        word_count = len(words)
+        for idx, (word, freq_str) in enumerate(words):
+            if freq_str is None:
+                frequency = word_count - idx
+            else:
+                try:
+                    frequency = int(freq_str)
+                except ValueError:
+                    frequency = word_count - idx
+            stats['total_words'] += 1
+            yield (key, word, frequency)
 
 
 def sync_txt_to_db(txt_file, db_file=None):
@@ -92,104 +69,56 @@ def sync_txt_to_db(txt_file, db_file=None):
     print('=' * 60)
     
     # 初始化数据库（如果不存在）
-    conn = sqlite3.connect(db_file)
+    conn = dbFunc.dbSqliteOpen(db_file)
+    # 临时表放在内存中
+    conn.execute('PRAGMA temp_store=MEMORY')
     cursor = conn.cursor()
     
-    # 创建表（如果不存在）
+    # 创建表和索引（如果不存在）
+    dbFunc.dbSqliteInit(conn)
+    conn.commit()
+    
+    cursor.execute('SELECT COUNT(*) FROM words')
+    db_before = cursor.fetchone()[0]
+    print(f'  数据库中已有 {db_before} 条记录')
+    
+    # 流式读取TXT文件写入临时表（同一 (key, word) 以第一次出现为准）
+    print('\n读取TXT文件...')
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS words (
+        CREATE TEMP TABLE incoming (
             key TEXT NOT NULL,
             word TEXT NOT NULL,
-            frequency INTEGER DEFAULT 0,
+            frequency INTEGER,
             PRIMARY KEY (key, word)
-        )
+        ) WITHOUT ROWID
     ''')
-    
-    # 创建索引（如果不存在）
-    cursor.execute('''
-        CREATE INDEX IF NOT EXISTS idx_key ON words(key)
-    ''')
-    cursor.execute('''
-        CREATE INDEX IF NOT EXISTS idx_word ON words(word)
-    ''')
-    
+    stats = {
+        'lines' : 0,
+        'processed_lines' : 0,
+        'total_words' : 0,
+    }
+    batch_size = 10000
+    batch = []
+    for row in iter_sync_rows(txt_file, stats):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            cursor.executemany('INSERT OR IGNORE INTO incoming (key, word, frequency) VALUES (?, ?, ?)', batch)
+            batch = []
+    if batch:
+        cursor.executemany('INSERT OR IGNORE INTO incoming (key, word, frequency) VALUES (?, ?, ?)', batch)
+    
+    # 对比并插入新数据（一条语句完成）
+    print('\n对比并插入新数据...')
+    inserted = dbFunc.dbSqliteWordsInsertFrom(conn, 'incoming')
+    
+    cursor.execute('SELECT COUNT(*) FROM incoming')
+    distinct_words = cursor.fetchone()[0]
+    # 数据库中有但TXT中没有的记录（不删除，只统计）
+    db_only = db_before - (distinct_words - inserted)
+    
+    cursor.execute('DROP TABLE incoming')
     conn.commit()
     
-    # 获取已存在的数据
-    print('读取数据库中已存在的数据...')
-    existing_data = get_existing_data(conn)
-    print(f'  数据库中已有 {len(existing_data)} 条记录')
-    
-    # 读取TXT文件并找出新数据
-    print('\n读取TXT文件并对比数据...')
-    new_data = []
-    total_lines = 0
-    processed_lines = 0
-    
-    with open(txt_file, 'r', encoding='utf-8') as f:
-        for line_num, line in enumerate(f, 1):
-            total_lines += 1
-            
-            if total_lines % 100000 == 0:
-                print(f'  处理中... 已处理 {total_lines} 行, 发现 {len(new_data)} 条新数据')
-            
-            result = parse_line(line)
-            if result is None:
-                continue
-            
-            key, words = result
-            processed_lines += 1
-            
-            # 检查每个词是否已存在，按原始顺序设置词频
-            # 根据词的数量动态计算词频：第一个词频率最高（等于词数），依次递减
-            word_count = len(words)
-            for idx, (word, freq_str) in enumerate(words):
-                if (key, word) not in existing_data:
-                    # 按原始顺序设置词频：第一个词频率 = 词数，依次递减到 1
-                    # 例如：10个词 -> 10, 9, 8, 7, 6, 5, 4, 3, 2, 1
-                    if freq_str is None:
-                        frequency = word_count - idx
-                    else:
-                        try:
-                            frequency = int(freq_str)
-                        except ValueError:
-                            frequency = word_count - idx
-                    new_data.append((key, word, frequency))
-                    # 添加到已存在集合中，避免同一批次重复
-                    existing_data.add((key, word))
-    
-    # 插入新数据
-    if new_data:
-        print(f'\n发现 {len(new_data)} 条新数据，开始插入...')
-        inserted = 0
-        skipped = 0
-        
-        for item in new_data:
-            try:
-                if len(item) == 3:
-                    # 包含频率信息
-                    key, word, frequency = item
-                else:
-                    # 兼容旧格式（只有 key 和 word）
-                    key, word = item
-                    frequency = 0
-                cursor.execute(
-                    'INSERT INTO words (key, word, frequency) VALUES (?, ?, ?)',
-                    (key, word, frequency)
-                )
-                inserted += 1
-            except sqlite3.IntegrityError:
-                # 如果因为并发等原因导致主键冲突，跳过
-                skipped += 1
-        
-        conn.commit()
-        
-        print(f'  成功插入: {inserted} 条')
-        if skipped > 0:
-            print(f'  跳过（已存在）: {skipped} 条')
-    else:
-        print('\n没有新数据需要插入')
-    
     # 获取最终统计
     cursor.execute('SELECT COUNT(*) FROM words')
     total_in_db = cursor.fetchone()[0]
@@ -199,9 +128,12 @@ def sync_txt_to_db(txt_file, db_file=None):
     # 输出统计信息
     print('\n' + '=' * 60)
     print('同步完成！')
-    print(f'  TXT文件总行数: {total_lines}')
-    print(f'  TXT文件有效行数: {processed_lines}')
-    print(f'  本次新增: {len(new_data)} 条')
+    print(f'  TXT文件总行数: {stats["lines"]}')
+    print(f'  TXT文件有效行数: {stats["processed_lines"]}')
+    print(f'  TXT文件词数: {stats["total_words"]}（重复 {stats["total_words"] - distinct_words} 条）')
+    print(f'  数据库中已存在: {distinct_words - inserted} 条')
+    print(f'  本次新增: {inserted} 条')
+    print(f'  数据库中有但TXT中没有: {db_only} 条（未删除）')
     print(f'  数据库总记录数: {total_in_db} 条')
     print(f'  数据库文件: {db_file}')
     
@@ -62,6 +62,19 @@ endif
 if !exists('g:ZFVimIM_sentence')
     let g:ZFVimIM_sentence = 1
 endif
+" sentence of key not shorter than this is segmented by misc/dbSentence.py
+" through the dictionary server, 0 to always use the greedy match in vim
+if !exists('g:ZFVimIM_sentenceEngineMinLen')
+    let g:ZFVimIM_sentenceEngineMinLen = 6
+endif
+" max time to wait for the server, in milliseconds
+if !exists('g:ZFVimIM_sentenceEngineTimeout')
+    let g:ZFVimIM_sentenceEngineTimeout = 50
+endif
+" number of sentence candidates
+if !exists('g:ZFVimIM_sentenceEngineCount')
+    let g:ZFVimIM_sentenceEngineCount = 3
+endif
 
 if !exists('g:ZFVimIM_crossable')
     let g:ZFVimIM_crossable = 2
@@ -317,6 +330,48 @@ function! ZFVimIM_wordReorder(db, word, ...)
     call s:dbEditWildKey(a:db, a:word, get(a:, 1, ''), 'reorder')
 endfunction
 
+" milliseconds to wait for the dictionary server, before falling back to the one-shot scripts
+let s:DB_SERVER_CALL_TIMEOUT = 5000
+
+" return response of ZFVimIM_dbServerCall, or v:null if the server is not available
+function! s:dbServerCall(dbPath, method, params)
+    if !exists('*ZFVimIM_dbServerCall')
+        return v:null
+    endif
+    return ZFVimIM_dbServerCall(a:dbPath, a:method, a:params, s:DB_SERVER_CALL_TIMEOUT)
+endfunction
+
+" remove words from db by the dictionary server,
+" which flushes pending frequency first, so the removed words are not brought back
+" return same output as misc/db_remove_word.py, or empty if the server is not available
+function! s:IMRemoveByServer(dbPath, words, fuzzyMatch)
+    let response = s:dbServerCall(a:dbPath, 'remove', {'words' : a:words, 'fuzzy' : a:fuzzyMatch ? v:true : v:false})
+    if response is v:null
+        return ''
+    endif
+    if has_key(response, 'error')
+        return response['error']
+    endif
+    let removed = response['result']
+    let result = []
+    for word in a:words
+        call add(result, word . '(' . get(removed, word, 0) . ')')
+    endfor
+    if a:fuzzyMatch && !empty(removed)
+        let wordList = keys(removed)
+        let total = 0
+        for removedCount in values(removed)
+            let total += removedCount
+        endfor
+        if len(wordList) > 20
+            let wordList = wordList[0 : 19] + ['... (共 ' . len(removed) . ' 个词)']
+        endif
+        call add(result, 'WORDS:' . join(wordList, ','))
+        call add(result, 'RECORDS:' . total)
+    endif
+    return 'OK:' . join(result, ':')
+endfunction
+
 function! IMAdd(bang, db, key, word)
     " Get dictionary file path (TXT file)
     let dictPath = ''
@@ -393,8 +448,15 @@ function! IMAdd(bang, db, key, word)
     let scriptPathAbs = CygpathFix_absPath(scriptPath)
     let dbPathAbs = CygpathFix_absPath(dbPath)
     let cmd = pythonCmd . ' "' . scriptPathAbs . '" "' . dbPathAbs . '" "' . a:key . '" "' . a:word . '"'
-    let result = system(cmd)
-    let result = substitute(result, '[\r\n]', '', 'g')
+    let response = s:dbServerCall(dbPath, 'add', {'key' : a:key, 'word' : a:word})
+    if response is v:null
+        let result = system(cmd)
+        let result = substitute(result, '[\r\n]', '', 'g')
+    elseif has_key(response, 'error')
+        let result = response['error']
+    else
+        let result = response['result'] ? 'OK' : 'EXISTS'
+    endif
     
     if result ==# 'OK'
         echom '[sbzr.nvim.im] Word added to database: ' . a:key . ' ' . a:word
@@ -643,8 +705,11 @@ function! IMRemove(bang, db, word, ...)
                         let cmd = cmd . ' "' . word . '"'
                     endfor
                     
-                    let dbResult = system(cmd)
-                    let dbResult = substitute(dbResult, '[\r\n]', '', 'g')
+                    let dbResult = s:IMRemoveByServer(dbPath, wordsToRemove, fuzzyMatch)
+                    if empty(dbResult)
+                        let dbResult = system(cmd)
+                        let dbResult = substitute(dbResult, '[\r\n]', '', 'g')
+                    endif
                     
                     if dbResult =~# '^OK:'
                         " Successfully removed from both TXT and DB
@@ -757,8 +822,101 @@ function! s:IMRemoveWrapper(bang, ...)
     endif
 endfunction
 
+" search words in database by the dictionary server, or misc/db_search_word.py if not available,
+" print all keys of them
+" flags: --prefix/-p (words starting with), --fuzzy/-f (words containing)
+function! IMSearch(...)
+    let flags = []
+    let words = []
+    for arg in a:000
+        if arg ==# '--prefix' || arg ==# '-p' || arg ==# '--fuzzy' || arg ==# '-f'
+            call add(flags, arg)
+        else
+            call add(words, arg)
+        endif
+    endfor
+    if empty(words)
+        echom '[sbzr.nvim.im] Error: Usage: IMSearch [--prefix|-p] [--fuzzy|-f] <word1> [word2] ...'
+        return
+    endif
+
+    let pluginDir = stdpath('data') . '/lazy/sbzr.nvim.im'
+    let sfileDir = expand('<sfile>:p:h:h')
+    if isdirectory(sfileDir . '/dict') && isdirectory(sfileDir . '/misc')
+        let pluginDir = sfileDir
+    endif
+    let dbPath = stdpath('config') . '/sbzr.nvim.im.db/sbzr.db'
+    if !filereadable(dbPath)
+        echom '[sbzr.nvim.im] Error: DB file not found: ' . dbPath
+        return
+    endif
+    let pythonCmd = executable('python3') ? 'python3' : 'python'
+    if !executable(pythonCmd)
+        echom '[sbzr.nvim.im] Error: Python not found'
+        return
+    endif
+    let scriptPath = pluginDir . '/misc/db_search_word.py'
+    if !filereadable(scriptPath)
+        echom '[sbzr.nvim.im] Error: script not found: ' . scriptPath
+        return
+    endif
+
+    let cmd = pythonCmd . ' "' . CygpathFix_absPath(scriptPath) . '" "' . CygpathFix_absPath(dbPath) . '"'
+    for arg in flags + words
+        let cmd = cmd . ' "' . arg . '"'
+    endfor
+    let lines = s:IMSearchByServer(dbPath, flags, words)
+    if lines is v:null
+        let lines = systemlist(cmd)
+        if v:shell_error != 0
+            echom '[sbzr.nvim.im] Error: ' . join(lines, ' ')
+            return
+        endif
+    endif
+    if empty(lines) || lines[0] ==# 'NOT_FOUND'
+        echom '[sbzr.nvim.im] Not found: ' . join(words, ' ')
+        return
+    endif
+    let limit = 100
+    for line in lines[0 : limit - 1]
+        let parts = split(line, "\t")
+        if len(parts) >= 3
+            echom printf('%-12s %s  (%s)', parts[0], parts[1], parts[2])
+        endif
+    endfor
+    if len(lines) > limit
+        echom '[sbzr.nvim.im] ... ' . (len(lines) - limit) . ' more, total ' . len(lines)
+    endif
+endfunction
+
+" return lines in the same format as misc/db_search_word.py, or v:null if the server is not available
+function! s:IMSearchByServer(dbPath, flags, words)
+    " the last flag wins, same as misc/db_search_word.py
+    let mode = 'exact'
+    for flag in a:flags
+        let mode = (flag ==# '--prefix' || flag ==# '-p') ? 'prefix' : 'substring'
+    endfor
+    let lines = []
+    let found = {}
+    for word in a:words
+        let response = s:dbServerCall(a:dbPath, 'search', {'word' : word, 'mode' : mode})
+        if response is v:null || has_key(response, 'error')
+            return v:null
+        endif
+        for row in response['result']
+            let line = row[0] . "\t" . row[1] . "\t" . row[2]
+            if !has_key(found, row[0] . "\t" . row[1])
+                let found[row[0] . "\t" . row[1]] = 1
+                call add(lines, line)
+            endif
+        endfor
+    endfor
+    return lines
+endfunction
+
 command! -nargs=* -bang IMAdd :call s:IMAddWrapper(<q-bang>, <f-args>)
 command! -nargs=+ -bang IMRemove :call s:IMRemoveWrapper(<q-bang>, <f-args>)
+command! -nargs=+ IMSearch :call IMSearch(<f-args>)
 
 let s:ZFVimIM_dbItemReorderThreshold = 1
 function! s:dbItemReorderFunc(item1, item2)
@@ -911,6 +1069,219 @@ function! s:dbClearBucketIndexCache(db) abort
     let implData = s:dbEnsureImplData(a:db)
     let implData['_bucketKeys'] = {}
     let implData['_bucketIndex'] = {}
+    let implData['_bucketTrie'] = {}
+    let implData['_bucketAlias'] = {}
+    let implData['_bucketTop'] = {}
+endfunction
+
+" read index file exported by dbLoad.py for one bucket,
+" return -1 if not exist, invalid or older than the bucket file
+function! s:dbLoadBucketIndexFile(cachePartFile, suffix) abort
+    let indexFile = a:cachePartFile . a:suffix
+    if !filereadable(indexFile) || getftime(indexFile) < getftime(a:cachePartFile)
+        return -1
+    endif
+    try
+        let ret = ZFVimIM_json_decode(join(readfile(indexFile), "\n"))
+    catch
+        return -1
+    endtry
+    return type(ret) == type({}) ? ret : -1
+endfunction
+
+" load prefix trie exported by dbLoad.py (see dbFunc.dbBucketTrieBuild)
+" {
+"   'a' : {
+"     'a' : [0, 3, 1],   " [start, end) range in bucket, and whether 'a' itself is a key
+"     'ai' : [1, 3, 1],
+"     ...
+"   },
+" }
+" only used when it matches the loaded bucket,
+" and dropped once keys of the bucket are changed
+function! s:dbLoadBucketTrie(db, pythonCachePath) abort
+    let implData = s:dbEnsureImplData(a:db)
+    let implData['_bucketTrie'] = {}
+    for c in keys(a:db['dbMap'])
+        let trie = s:dbLoadBucketIndexFile(a:pythonCachePath . '_' . c, '_trie')
+        if type(trie) != type({})
+            continue
+        endif
+        let root = get(trie, c, [])
+        if len(root) != 3 || root[0] != 0 || root[1] != len(a:db['dbMap'][c])
+            continue
+        endif
+        let implData['_bucketTrie'][c] = trie
+    endfor
+endfunction
+
+" load alias index exported by dbLoad.py (see dbFunc.dbBucketAliasBuild)
+" {
+"   's' : {
+"     'srfa' : [['surufa', '输入法'], ...],
+"   },
+" }
+" words added later are appended by s:dbBucketAliasAdd,
+" removed words are filtered out by ZFVimIM_dbAliasSearch
+function! s:dbLoadBucketAlias(db, pythonCachePath) abort
+    let implData = s:dbEnsureImplData(a:db)
+    let implData['_bucketAlias'] = {}
+    for c in keys(a:db['dbMap'])
+        let aliasMap = s:dbLoadBucketIndexFile(a:pythonCachePath . '_' . c, '_alias')
+        if type(aliasMap) == type({})
+            let implData['_bucketAlias'][c] = aliasMap
+        endif
+    endfor
+endfunction
+
+" same as dbFunc.dbAliasKey, empty if no alias
+function! s:dbAliasKey(key, word) abort
+    let wordLen = strchars(a:word)
+    let keyLen = strlen(a:key)
+    if wordLen == 3 && keyLen >= 6
+        return a:key[0] . a:key[2] . strpart(a:key, keyLen - 2)
+    elseif wordLen >= 4 && keyLen >= wordLen * 2
+        return a:key[0] . a:key[2] . a:key[4] . a:key[(wordLen - 1) * 2]
+    endif
+    return ''
+endfunction
+
+function! s:dbBucketAliasAdd(db, key, word) abort
+    let aliasKey = s:dbAliasKey(a:key, a:word)
+    if empty(aliasKey)
+        return
+    endif
+    let aliasMap = get(get(s:dbEnsureImplData(a:db), '_bucketAlias', {}), aliasKey[0], -1)
+    if type(aliasMap) != type({})
+        return
+    endif
+    if !has_key(aliasMap, aliasKey)
+        let aliasMap[aliasKey] = []
+    endif
+    if index(aliasMap[aliasKey], [a:key, a:word]) < 0
+        call add(aliasMap[aliasKey], [a:key, a:word])
+    endif
+endfunction
+
+" same as DB_BUCKET_TOP_K and DB_BUCKET_TOP_PREFIX_MAX in dbFunc.py
+let s:DB_BUCKET_TOP_K = 10
+let s:DB_BUCKET_TOP_PREFIX_MAX = 4
+
+" load best completions of each prefix exported by dbLoad.py (see dbFunc.dbBucketTopBuild)
+" {
+"   'a' : {
+"     'a' : [['ai', '爱', 12], ...],   " [key, word, count]
+"     'ai' : [['aiguo', '爱国', 3], ...],
+"   },
+" }
+" kept up to date by s:dbBucketTopUpdate,
+" prefixes that can not be updated in place are removed and built again by ZFVimIM_dbTopSearch
+function! s:dbLoadBucketTop(db, pythonCachePath) abort
+    let implData = s:dbEnsureImplData(a:db)
+    let implData['_bucketTop'] = {}
+    for c in keys(a:db['dbMap'])
+        let topMap = s:dbLoadBucketIndexFile(a:pythonCachePath . '_' . c, '_top')
+        if type(topMap) == type({})
+            let implData['_bucketTop'][c] = topMap
+        endif
+    endfor
+endfunction
+
+" same order as dbFunc.dbBucketTopRank:
+" shorter word first, then higher count, then by key and word
+function! s:dbBucketTopCompare(e1, e2) abort
+    let len1 = strchars(a:e1[1])
+    let len2 = strchars(a:e2[1])
+    if len1 != len2
+        return len1 < len2 ? -1 : 1
+    elseif a:e1[2] != a:e2[2]
+        return a:e1[2] > a:e2[2] ? -1 : 1
+    elseif a:e1[0] !=# a:e2[0]
+        return a:e1[0] <# a:e2[0] ? -1 : 1
+    elseif a:e1[1] !=# a:e2[1]
+        return a:e1[1] <# a:e2[1] ? -1 : 1
+    endif
+    return 0
+endfunction
+
+function! s:dbBucketTopEntries(dbItemEncoded) abort
+    if empty(a:dbItemEncoded)
+        return []
+    endif
+    let dbItem = ZFVimIM_dbItemDecode(a:dbItemEncoded)
+    let ret = []
+    for i in range(len(dbItem['wordList']))
+        call add(ret, [dbItem['key'], dbItem['wordList'][i], dbItem['countList'][i]])
+    endfor
+    return ret
+endfunction
+
+" scan keys starting with prefix, for prefixes removed by s:dbBucketTopUpdate
+function! s:dbBucketTopBuild(db, prefix) abort
+    let bucket = a:db['dbMap'][a:prefix[0]]
+    let ret = []
+    let index = ZFVimIM_dbSearch(a:db, a:prefix[0], '^' . a:prefix, 0)
+    while index >= 0 && index < len(bucket)
+        let entries = s:dbBucketTopEntries(bucket[index])
+        if empty(entries) || strpart(entries[0][0], 0, len(a:prefix)) !=# a:prefix
+            break
+        endif
+        if entries[0][0] !=# a:prefix
+            call extend(ret, entries)
+        endif
+        let index += 1
+    endwhile
+    call sort(ret, function('s:dbBucketTopCompare'))
+    if len(ret) > s:DB_BUCKET_TOP_K
+        call remove(ret, s:DB_BUCKET_TOP_K, -1)
+    endif
+    return ret
+endfunction
+
+"" words of key changed to dbItemEncoded (empty if key removed),
+" update completions of each prefix of key
+function! s:dbBucketTopUpdate(db, key, dbItemEncoded) abort
+    let topMap = get(get(s:dbEnsureImplData(a:db), '_bucketTop', {}), a:key[0], -1)
+    if type(topMap) != type({})
+        return
+    endif
+    let newEntries = s:dbBucketTopEntries(a:dbItemEncoded)
+    let n = min([len(a:key) - 1, s:DB_BUCKET_TOP_PREFIX_MAX])
+    for i in range(1, n)
+        let prefix = strpart(a:key, 0, i)
+        if !has_key(topMap, prefix)
+            continue
+        endif
+        let topList = topMap[prefix]
+        " words not in a full list may be ranked after other words not in the list,
+        " only words before the last one can be put into the list
+        let boundary = len(topList) >= s:DB_BUCKET_TOP_K ? topList[-1] : []
+        call filter(topList, 'v:val[0] !=# a:key')
+        for entry in newEntries
+            if empty(boundary) || s:dbBucketTopCompare(entry, boundary) <= 0
+                call add(topList, copy(entry))
+            endif
+        endfor
+        call sort(topList, function('s:dbBucketTopCompare'))
+        if len(topList) > s:DB_BUCKET_TOP_K
+            call remove(topList, s:DB_BUCKET_TOP_K, -1)
+        elseif !empty(boundary) && len(topList) < s:DB_BUCKET_TOP_K
+            call remove(topMap, prefix)
+        endif
+    endfor
+endfunction
+
+function! s:dbGetBucketTrie(db, c) abort
+    return get(get(s:dbEnsureImplData(a:db), '_bucketTrie', {}), a:c, {})
+endfunction
+
+" keys of the bucket changed, trie is no longer valid
+function! s:dbBucketKeysChanged(db, c) abort
+    let implData = s:dbEnsureImplData(a:db)
+    if has_key(get(implData, '_bucketTrie', {}), a:c)
+        call remove(implData['_bucketTrie'], a:c)
+    endif
+    call s:dbRebuildBucketIndex(a:db, a:c)
 endfunction
 
 function! s:dbRebuildBucketIndex(db, c) abort
@@ -946,9 +1317,14 @@ function! s:dbRebuildBucketIndex(db, c) abort
 endfunction
 
 function! s:dbBuildAllBucketIndexes(db) abort
-    call s:dbClearBucketIndexCache(a:db)
+    let implData = s:dbEnsureImplData(a:db)
+    let implData['_bucketKeys'] = {}
+    let implData['_bucketIndex'] = {}
     for c in keys(a:db['dbMap'])
-        call s:dbRebuildBucketIndex(a:db, c)
+        " buckets with trie are searched by trie, no need to build key list
+        if empty(s:dbGetBucketTrie(a:db, c))
+            call s:dbRebuildBucketIndex(a:db, c)
+        endif
     endfor
 endfunction
 
@@ -1021,6 +1397,19 @@ function! s:dbSearchUseIndex(db, c, pattern, startIndex) abort
         return s:ZFVimIM_DBSEARCH_FALLBACK
     endif
 
+    let trie = s:dbGetBucketTrie(a:db, a:c)
+    if !empty(trie)
+        let node = get(trie, prefixPattern, [])
+        if empty(node)
+            return -1
+        endif
+        if exactMatch
+            return (node[2] && node[0] >= a:startIndex) ? node[0] : -1
+        endif
+        let idx = node[0] > a:startIndex ? node[0] : a:startIndex
+        return idx < node[1] ? idx : -1
+    endif
+
     let bucketKeys = s:dbGetBucketKeys(a:db, a:c)
     if empty(bucketKeys)
         return -1
@@ -1076,12 +1465,12 @@ function! ZFVimIM_dbSearch(db, c, pattern, start)
         return -1
     endif
 
+    call ZFVimIM_DEBUG_profileStart('dbSearch')
     let searchResult = s:dbSearchUseIndex(a:db, a:c, a:pattern, startIndex)
     if searchResult == s:ZFVimIM_DBSEARCH_FALLBACK
-        call ZFVimIM_DEBUG_profileStart('dbSearch')
         let searchResult = match(bucket, a:pattern, startIndex)
-        call ZFVimIM_DEBUG_profileStop()
     endif
+    call ZFVimIM_DEBUG_profileStop()
 
     if a:start == 0
         let a:db['dbSearchCache'][patternKey] = searchResult
@@ -1098,6 +1487,97 @@ function! ZFVimIM_dbSearch(db, c, pattern, start)
     return searchResult
 endfunction
 
+" whether there's any key longer than prefix and starts with prefix
+function! ZFVimIM_dbHasLongerKey(db, prefix)
+    if empty(a:prefix)
+        return 0
+    endif
+    let c = a:prefix[0]
+    let bucket = get(a:db['dbMap'], c, [])
+    if empty(bucket)
+        return 0
+    endif
+    let trie = s:dbGetBucketTrie(a:db, c)
+    if !empty(trie)
+        let node = get(trie, a:prefix, [])
+        return !empty(node) && node[1] - node[0] > node[2]
+    endif
+    let idx = ZFVimIM_dbSearch(a:db, c, '^' . a:prefix, 0)
+    if idx < 0
+        return 0
+    endif
+    while idx < len(bucket)
+        let item = ZFVimIM_dbItemDecode(bucket[idx])
+        let k = get(item, 'key', '')
+        if k !~# '^' . a:prefix
+            break
+        endif
+        if k !=# a:prefix
+            return 1
+        endif
+        let idx += 1
+    endwhile
+    return 0
+endfunction
+
+" return list of {'key', 'word'} whose alias key is aliasKey (see dbFunc.dbAliasKey),
+" in the same order as the bucket, or -1 if alias index of the bucket is not loaded
+function! ZFVimIM_dbAliasSearch(db, aliasKey)
+    if empty(a:aliasKey)
+        return []
+    endif
+    let aliasMap = get(get(s:dbEnsureImplData(a:db), '_bucketAlias', {}), a:aliasKey[0], -1)
+    if type(aliasMap) != type({})
+        return -1
+    endif
+    " key -> {word : 1}
+    let wordMap = {}
+    for entry in get(aliasMap, a:aliasKey, [])
+        if !has_key(wordMap, entry[0])
+            let wordMap[entry[0]] = {}
+        endif
+        let wordMap[entry[0]][entry[1]] = 1
+    endfor
+    let ret = []
+    for key in sort(keys(wordMap))
+        let index = ZFVimIM_dbSearch(a:db, key[0], '^' . key . g:ZFVimIM_KEY_S_MAIN, 0)
+        if index < 0
+            continue
+        endif
+        let dbItem = ZFVimIM_dbItemDecode(a:db['dbMap'][key[0]][index])
+        for word in dbItem['wordList']
+            if has_key(wordMap[key], word)
+                call add(ret, {'key' : key, 'word' : word})
+            endif
+        endfor
+    endfor
+    return ret
+endfunction
+
+" return best completions of prefix (words of longer keys starting with prefix,
+" see dbFunc.dbBucketTopRank for the order), as list of {'key', 'word', 'count'},
+" or -1 if prefix is too long or completions of the bucket are not loaded
+function! ZFVimIM_dbTopSearch(db, prefix)
+    if empty(a:prefix) || len(a:prefix) > s:DB_BUCKET_TOP_PREFIX_MAX
+        return -1
+    endif
+    let topMap = get(get(s:dbEnsureImplData(a:db), '_bucketTop', {}), a:prefix[0], -1)
+    if type(topMap) != type({})
+        return -1
+    endif
+    if !has_key(topMap, a:prefix)
+        if !ZFVimIM_dbHasLongerKey(a:db, a:prefix)
+            return []
+        endif
+        let topMap[a:prefix] = s:dbBucketTopBuild(a:db, a:prefix)
+    endif
+    let ret = []
+    for entry in topMap[a:prefix]
+        call add(ret, {'key' : entry[0], 'word' : entry[1], 'count' : entry[2]})
+    endfor
+    return ret
+endfunction
+
 function! ZFVimIM_dbSearchCacheClear(db)
     let a:db['dbSearchCache'] = {}
     let a:db['dbSearchCacheKeys'] = []
@@ -1131,6 +1611,11 @@ function! ZFVimIM_cacheClearAll()
                 let deletedCount = deletedCount + 1
             endif
         endif
+        for suffix in ['_trie', '_alias', '_top']
+            if filereadable(cachePartFile . suffix)
+                call delete(cachePartFile . suffix)
+            endif
+        endfor
     endfor
     
     " Also clear all memory caches for all databases
@@ -1282,6 +1767,10 @@ function! s:dbLoad(db, dbFile, ...)
     call s:dbClearBucketIndexCache(a:db)
 
     let dbMap = a:db['dbMap']
+    " count file is applied when exporting by dbLoad.py,
+    " caches older than the count file are exported again
+    let dbCountFile = get(a:, 1, '')
+    let countMtime = filereadable(dbCountFile) ? getftime(dbCountFile) : -1
     
     " Try to find database file (prefer .db over .yaml)
     let actualDbFile = s:dbLoad_findDbFile(a:dbFile)
@@ -1293,6 +1782,7 @@ function! s:dbLoad(db, dbFile, ...)
     let cachePath = ZFVimIM_cachePath()
     let pythonCachePath = cachePath . '/dbLoadCache'
     let pythonCacheExists = 0
+    let pythonCacheLoaded = 0
     for c_ in range(char2nr('a'), char2nr('z'))
         let c = nr2char(c_)
         let cachePartFile = pythonCachePath . '_' . c
@@ -1311,7 +1801,7 @@ function! s:dbLoad(db, dbFile, ...)
             let cachePartFile = pythonCachePath . '_' . c
             if filereadable(cachePartFile)
                 let cacheMtime = getftime(cachePartFile)
-                if cacheMtime < 0 || dbMtime < 0 || cacheMtime < dbMtime
+                if cacheMtime < 0 || dbMtime < 0 || cacheMtime < dbMtime || cacheMtime < countMtime
                     let pythonCacheNewer = 0
                     break
                 endif
@@ -1335,24 +1825,24 @@ function! s:dbLoad(db, dbFile, ...)
                 endif
             endfor
             call ZFVimIM_DEBUG_profileStop()
+            let pythonCacheLoaded = 1
             " Save to unified cache for next time
             call s:dbLoad_saveToCache(dbMap, cacheFile)
         else
             " Python cache is outdated, regenerate
-            if s:dbLoad_tryUsePythonScript(dbMap, actualDbFile, cacheFile, get(a:, 1, ''))
-                call ZFVimIM_DEBUG_profileStart('dbLoadCountFile')
+            if s:dbLoad_tryUsePythonScript(dbMap, actualDbFile, cacheFile, dbCountFile)
+                let pythonCacheLoaded = 1
             else
                 return
             endif
         endif
-    elseif s:dbLoad_tryLoadFromCache(dbMap, actualDbFile, cacheFile)
+    elseif s:dbLoad_tryLoadFromCache(dbMap, actualDbFile, cacheFile, countMtime)
         " Fallback to unified cache file
-        call ZFVimIM_DEBUG_profileStart('dbLoadCountFile')
     else
         " Try to use Python script for faster loading if available
-        if s:dbLoad_tryUsePythonScript(dbMap, actualDbFile, cacheFile, get(a:, 1, ''))
+        if s:dbLoad_tryUsePythonScript(dbMap, actualDbFile, cacheFile, dbCountFile)
             " Successfully loaded using Python script
-            call ZFVimIM_DEBUG_profileStart('dbLoadCountFile')
+            let pythonCacheLoaded = 1
         else
             " SQLite file should be loaded by Python script
             " If we reach here, Python script failed, so return empty
@@ -1361,37 +1851,11 @@ function! s:dbLoad(db, dbFile, ...)
         endif
     endif
 
-    let dbCountFile = get(a:, 1, '')
-    if filereadable(dbCountFile)
-        call ZFVimIM_DEBUG_profileStart('dbLoadCountFile')
-        let lines = readfile(dbCountFile)
-        call ZFVimIM_DEBUG_profileStop()
-
-        call ZFVimIM_DEBUG_profileStart('dbLoadCount')
-        for line in lines
-            let countTextList = split(line)
-            if len(countTextList) <= 1
-                continue
-            endif
-            let key = countTextList[0]
-            let index = match(get(dbMap, key[0], []), '^' . key . g:ZFVimIM_KEY_S_MAIN)
-            if index < 0
-                continue
-            endif
-            let dbItem = ZFVimIM_dbItemDecode(dbMap[key[0]][index])
-            let wordListLen = len(dbItem['wordList'])
-            for i in range(len(countTextList) - 1)
-                if i >= wordListLen
-                    break
-                endif
-                let dbItem['countList'][i] = str2nr(countTextList[i + 1])
-            endfor
-            call ZFVimIM_dbItemReorder(dbItem)
-            let dbMap[key[0]][index] = ZFVimIM_dbItemEncode(dbItem)
-        endfor
-        call ZFVimIM_DEBUG_profileStop()
+    if pythonCacheLoaded
+        call s:dbLoadBucketTrie(a:db, pythonCachePath)
+        call s:dbLoadBucketAlias(a:db, pythonCachePath)
+        call s:dbLoadBucketTop(a:db, pythonCachePath)
     endif
-
     call s:dbBuildAllBucketIndexes(a:db)
 endfunction
 
@@ -1409,8 +1873,9 @@ function! s:dbLoad_getCacheFile(dbFile)
 endfunction
 
 " Try to load dbMap from cache file
+" countMtime: mtime of count file, -1 if none
 " Returns 1 if successful, 0 otherwise
-function! s:dbLoad_tryLoadFromCache(dbMap, dbFile, cacheFile)
+function! s:dbLoad_tryLoadFromCache(dbMap, dbFile, cacheFile, countMtime)
     " Check if cache file exists and is newer than source file
     if !filereadable(a:cacheFile) || !filereadable(a:dbFile)
         return 0
@@ -1419,7 +1884,7 @@ function! s:dbLoad_tryLoadFromCache(dbMap, dbFile, cacheFile)
     " Check if cache is newer than source file
     let cacheMtime = getftime(a:cacheFile)
     let sourceMtime = getftime(a:dbFile)
-    if cacheMtime < 0 || sourceMtime < 0 || cacheMtime < sourceMtime
+    if cacheMtime < 0 || sourceMtime < 0 || cacheMtime < sourceMtime || cacheMtime < a:countMtime
         return 0
     endif
     
@@ -1888,19 +2353,24 @@ function! s:dbEditMap(db, dbEdit)
                 else
                     call add(dbItem['wordList'], word)
                     call add(dbItem['countList'], 1)
+                    call s:dbBucketAliasAdd(a:db, key, word)
                 endif
                 call ZFVimIM_dbItemReorder(dbItem)
                 let dbMap[key[0]][index] = ZFVimIM_dbItemEncode(dbItem)
+                call s:dbBucketTopUpdate(a:db, key, dbMap[key[0]][index])
             else
-                call add(dbMap[key[0]], ZFVimIM_dbItemEncode({
+                let dbItemEncoded = ZFVimIM_dbItemEncode({
                             \   'key' : key,
                             \   'wordList' : [word],
                             \   'countList' : [1],
-                            \ }))
+                            \ })
+                call add(dbMap[key[0]], dbItemEncoded)
                 call sort(dbMap[key[0]])
                 call ZFVimIM_dbSearchCacheClear(a:db)
+                call s:dbBucketKeysChanged(a:db, key[0])
+                call s:dbBucketAliasAdd(a:db, key, word)
+                call s:dbBucketTopUpdate(a:db, key, dbItemEncoded)
             endif
-            call s:dbRebuildBucketIndex(a:db, key[0])
         elseif e['action'] == 'remove'
             let index = ZFVimIM_dbSearch(a:db, key[0],
                         \ '^' . key . g:ZFVimIM_KEY_S_MAIN,
@@ -1925,13 +2395,15 @@ function! s:dbEditMap(db, dbEdit)
                     call remove(dbMap, key[0])
                 endif
                 call ZFVimIM_dbSearchCacheClear(a:db)
+                call s:dbBucketKeysChanged(a:db, key[0])
+                call s:dbBucketTopUpdate(a:db, key, '')
                 echom '[sbzr.nvim.im] Key "' . key . '" removed (no words left)'
             else
                 " Update the item in dbMap after removing word
                 let dbMap[key[0]][index] = ZFVimIM_dbItemEncode(dbItem)
+                call s:dbBucketTopUpdate(a:db, key, dbMap[key[0]][index])
                 echom '[sbzr.nvim.im] Word removed. Remaining words: ' . join(dbItem['wordList'], ', ')
             endif
-            call s:dbRebuildBucketIndex(a:db, key[0])
         elseif e['action'] == 'reorder'
             let index = ZFVimIM_dbSearch(a:db, key[0],
                         \ '^' . key . g:ZFVimIM_KEY_S_MAIN,
@@ -1952,7 +2424,7 @@ function! s:dbEditMap(db, dbEdit)
             let dbItem['countList'][wordIndex] = float2nr(floor(sum / 3))
             call ZFVimIM_dbItemReorder(dbItem)
             let dbMap[key[0]][index] = ZFVimIM_dbItemEncode(dbItem)
-            call s:dbRebuildBucketIndex(a:db, key[0])
+            call s:dbBucketTopUpdate(a:db, key, dbMap[key[0]][index])
         endif
     endfor
 endfunction
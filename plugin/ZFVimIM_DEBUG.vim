@@ -75,6 +75,30 @@ function! ZFVimIM_DEBUG_profileStop()
     if data['max'] < cost
         let data['max'] = cost
     endif
+    if exists('s:ZFVimIM_DEBUG_sample')
+        let s:ZFVimIM_DEBUG_sample[name] = get(s:ZFVimIM_DEBUG_sample, name, 0) + cost
+    endif
+endfunction
+
+" cost of each keystroke, by ZFVimIM_DEBUG_sampleStart() before the keystroke
+" and ZFVimIM_DEBUG_sampleStop() after, which returns (in us):
+" {
+"   'total' : 'from sampleStart to sampleStop',
+"   'name' : 'sum of profileStart(name) ~ profileStop() during the keystroke',
+" }
+function! ZFVimIM_DEBUG_sampleStart()
+    let g:ZFVimIM_DEBUG_profile = 1
+    let s:ZFVimIM_DEBUG_sample = {}
+    let s:ZFVimIM_DEBUG_sampleStartTime = reltime()
+endfunction
+function! ZFVimIM_DEBUG_sampleStop()
+    if !exists('s:ZFVimIM_DEBUG_sample')
+        return {}
+    endif
+    let ret = s:ZFVimIM_DEBUG_sample
+    let ret['total'] = float2nr(reltimefloat(reltime(s:ZFVimIM_DEBUG_sampleStartTime, reltime())) * 1000 * 1000)
+    unlet s:ZFVimIM_DEBUG_sample
+    return ret
 endfunction
 
 function! s:ZFVimIM_DEBUG_profileInfo_sort(e0, e1)
@@ -157,3 +181,74 @@ function! ZFVimIM_DEBUG_stop()
     let g:ZFVimIM_DEBUG_profile = 0
 endfunction
 
+
+" ============================================================
+" replay keystrokes in insert mode (IME must be started),
+" each keystroke is sampled by ZFVimIM_DEBUG_sampleStart/Stop, see misc/imLatencyBench.py
+"
+" traceList: ['nihk ', 'ceshi<bs>i ', ...]
+"   each trace is typed on a new line, a char or `<xxx>` is one keystroke,
+"   keys go through the IME keymaps, so ' ' is ZFVimIME_space and 'a' is ZFVimIME_input
+" callback: func(sampleList) when all traces done, sampleList: [
+"   {
+"     'trace' : 'index of traceList',
+"     'key' : 'the keystroke',
+"     'total' : 'us',
+"     'name' : 'us, see ZFVimIM_DEBUG_sampleStop',
+"   },
+" ]
+"
+" the keystroke is fed by feedkeys(), and a 0ms timer is started at the same time,
+" the timer fires when the typeahead is processed and vim waits for input again,
+" which is when the user sees the result
+function! ZFVimIM_DEBUG_replay(traceList, callback)
+    let s:ZFVimIM_DEBUG_replayState = {
+                \   'keyList' : [],
+                \   'index' : 0,
+                \   'sampleList' : [],
+                \   'callback' : a:callback,
+                \ }
+    let iTrace = 0
+    for trace in a:traceList
+        let i = 0
+        while i < len(trace)
+            let key = matchstr(trace, '^<[^<>]\+>', i)
+            if empty(key)
+                let key = matchstr(trace, '^.', i)
+            endif
+            call add(s:ZFVimIM_DEBUG_replayState['keyList'], [iTrace, key])
+            let i += len(key)
+        endwhile
+        let iTrace += 1
+    endfor
+    call timer_start(0, function('s:ZFVimIM_DEBUG_replayNext'))
+endfunction
+function! s:ZFVimIM_DEBUG_replayNext(...)
+    let state = s:ZFVimIM_DEBUG_replayState
+    if state['index'] > 0
+        let sample = ZFVimIM_DEBUG_sampleStop()
+        call extend(sample, state['pending'])
+        call add(state['sampleList'], sample)
+    endif
+    if state['index'] >= len(state['keyList'])
+        unlet s:ZFVimIM_DEBUG_replayState
+        let g:ZFVimIM_DEBUG_profile = 0
+        call ZFVimIM_funcCall(state['callback'], [state['sampleList']])
+        return
+    endif
+    let [iTrace, key] = state['keyList'][state['index']]
+    if state['index'] == 0 || state['keyList'][state['index'] - 1][0] != iTrace
+        " new trace on new line, not measured
+        call ZFVimIM_core_api('float_close')
+        call append(line('.'), '')
+        call cursor(line('.') + 1, 1)
+    endif
+    let state['pending'] = {
+                \   'trace' : iTrace,
+                \   'key' : key,
+                \ }
+    let state['index'] += 1
+    call ZFVimIM_DEBUG_sampleStart()
+    call feedkeys(key =~ '^<.\+>$' ? eval('"\\' . key . '"') : key, 'mt')
+    call timer_start(0, function('s:ZFVimIM_DEBUG_replayNext'))
+endfunction
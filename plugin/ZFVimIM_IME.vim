@@ -19,6 +19,25 @@ if !exists('g:ZFVimIME_autoStopOnInsertLeave')
     let g:ZFVimIME_autoStopOnInsertLeave = 1
 endif
 
+" 使用常驻的 misc/dbServer.py 更新词库（需要 jobstart），
+" 0 时每次选词都启动一次 python 脚本
+if !exists('g:ZFVimIM_dbServer')
+    let g:ZFVimIM_dbServer = 1
+endif
+" 词频先写入日志，每隔多少毫秒批量写入数据库
+if !exists('g:ZFVimIM_dbServerFlushInterval')
+    let g:ZFVimIM_dbServerFlushInterval = 30000
+endif
+
+" 记录相邻上屏的两个词（二元词频），排序时优先上一个词之后常用的词
+if !exists('g:ZFVimIM_bigram')
+    let g:ZFVimIM_bigram = 1
+endif
+" 二元词频的加分 = 此值 * log(1 + 次数)，与使用次数相加后排序
+if !exists('g:ZFVimIM_bigramWeight')
+    let g:ZFVimIM_bigramWeight = 5
+endif
+
 " ============================================================
 " Get database directory path (in user config directory)
 function! s:ZFVimIM_getDbDir()
@@ -265,6 +284,8 @@ function! s:ZFVimIM_importDb(yamlPath, dbPath, force)
     endif
     
     " Run import script
+    " (the db file is replaced, the server must reopen it)
+    call s:dbServerStop()
     let cmd = pythonCmd . ' "' . scriptPath . '" "' . a:yamlPath . '" "' . a:dbPath . '"'
     let result = system(cmd)
     
@@ -1515,6 +1536,7 @@ function! s:floatRender(list)
         call s:floatClose()
         return
     endif
+    call ZFVimIM_DEBUG_profileStart('floatRender')
     let labelList = s:getLabelList()
     let label = 1
     let lines = []
@@ -1599,6 +1621,7 @@ function! s:floatRender(list)
             call nvim_win_set_cursor(s:float_winid, [s:float_index + 1, 0])
         endif
     endif
+    call ZFVimIM_DEBUG_profileStop()
 endfunction
 
 function! s:floatMove(delta)
@@ -2229,9 +2252,19 @@ function! s:asyncSaveDict(db, dictPath)
             return
         endif
         
-        " Add each word to database
+        " Add all words by the dictionary server if available, each word by the script otherwise
         let addedCount = 0
         let failedCount = 0
+        let edits = []
+        for wordItem in wordsToAdd
+            call add(edits, {'action' : 'add', 'key' : wordItem['key'], 'word' : wordItem['word']})
+        endfor
+        let response = ZFVimIM_dbServerCall(dbPath, 'edit', {'edits' : edits}, s:DB_SERVER_EDIT_TIMEOUT)
+        if response isnot v:null
+            let addedCount = len(filter(copy(get(response, 'result', [])), "type(v:val) == v:t_dict && has_key(v:val, 'result')"))
+            let failedCount = len(wordsToAdd) - addedCount
+            let wordsToAdd = []
+        endif
         for wordItem in wordsToAdd
             let cmd = pythonCmd . ' "' . scriptPath . '" "' . dbPath . '" "' . wordItem['key'] . '" "' . wordItem['word'] . '"'
             let result = system(cmd)
@@ -2531,8 +2564,11 @@ function! s:didChoose(item)
 
     let s:seamless_positions[2] = s:start_column + len(a:item['word'])
 
-    " 记录词的使用频率，用于智能排序
-    call s:recordWordUsage(a:item['key'], a:item['word'])
+    " 记录上一个词和这个词的二元词频
+    let prevWord = g:ZFVimIM_bigram ? get(s:last_commit, 'word', '') : ''
+    call s:recordWordBigram(prevWord, a:item['word'])
+    " 记录词的使用频率，用于智能排序（二元词频随之写入数据库）
+    call s:recordWordUsage(a:item['key'], a:item['word'], prevWord)
     
     " 更新最近提交的词记录（用于生成组合候选词）
     " 这会更新 s:prev_commit 和 s:last_commit
@@ -2704,8 +2740,18 @@ call s:init()
 call s:resetState()
 
 " ============================================================
-" Word frequency tracking for smart sorting
+" Word usage tracking for smart sorting
+" stored in the usage table of the db (see misc/dbFunc.py), loaded once when first needed,
+" each use is sent along with the frequency update, and written to db by batch
+"
+" {key<tab>word : [count, lastUsed]}, count is the count at lastUsed (localtime()),
+" which decays by half every s:USAGE_HALF_LIFE seconds, applied when read
 let s:word_frequency = {}
+let s:word_frequency_loaded = 0
+" same as DB_USAGE_xxx in misc/dbFunc.py
+let s:USAGE_HALF_LIFE = 14 * 24 * 3600
+let s:USAGE_COUNT_MAX = 1000
+" frequency file saved by older versions, imported to the usage table once
 let s:freq_file_path = ''
 
 function! s:initWordFrequency()
@@ -2717,45 +2763,408 @@ function! s:initWordFrequency()
             let s:freq_file_path = expand('<sfile>:p:h:h') . '/word_freq.txt'
         endif
     endif
-    
-    " Load frequency data
-    if filereadable(s:freq_file_path)
-        for line in readfile(s:freq_file_path)
-            let parts = split(line, "\t")
-            if len(parts) >= 2
-                let key = parts[0]
-                let word = parts[1]
-                let freq = len(parts) >= 3 ? str2nr(parts[2]) : 1
-                let s:word_frequency[key . "\t" . word] = freq
+endfunction
+
+" return {'pluginDir', 'dbPath'} of the db to record usage to, or {} if not available
+function! s:wordUsageDb()
+    let pluginDir = stdpath('data') . '/lazy/sbzr.nvim.im'
+    let sfileDir = expand('<sfile>:p:h:h')
+    if isdirectory(sfileDir . '/dict')
+        let pluginDir = sfileDir
+    endif
+    " Use sbzr.yaml as the only dictionary
+    let dbPath = s:ZFVimIM_getDbPath(pluginDir . '/dict/sbzr.yaml')
+    if empty(dbPath) || !filereadable(dbPath)
+        return {}
+    endif
+    return {'pluginDir' : pluginDir, 'dbPath' : dbPath}
+endfunction
+
+function! s:loadWordUsage()
+    if s:word_frequency_loaded
+        return
+    endif
+    let s:word_frequency_loaded = 1
+    let usageDb = s:wordUsageDb()
+    if empty(usageDb)
+        return
+    endif
+    let importFile = filereadable(s:freq_file_path) ? CygpathFix_absPath(s:freq_file_path) : ''
+    if s:dbServerStart(usageDb['pluginDir'], usageDb['dbPath']) > 0
+                \ && s:dbServerRequest('usage', {'importFile' : importFile}, function('s:loadWordUsageCallback'))
+        return
+    endif
+    " one-shot script if server not available
+    let pythonCmd = executable('python3') ? 'python3' : 'python'
+    let scriptPath = usageDb['pluginDir'] . '/misc/db_usage.py'
+    if !executable(pythonCmd) || !filereadable(scriptPath)
+        return
+    endif
+    let lines = systemlist(pythonCmd . ' "' . CygpathFix_absPath(scriptPath) . '" "' . CygpathFix_absPath(usageDb['dbPath']) . '" "' . importFile . '"')
+    if v:shell_error != 0
+        return
+    endif
+    let result = []
+    for line in lines
+        let parts = split(line, "\t")
+        if len(parts) >= 4
+            call add(result, [parts[0], parts[1], str2float(parts[2]), str2nr(parts[3])])
+        endif
+    endfor
+    call s:loadWordUsageCallback(result, '')
+endfunction
+
+function! s:loadWordUsageCallback(result, error)
+    if type(a:result) != type([])
+        return
+    endif
+    " uses recorded before the response are not in the result yet,
+    " add them up at the newer time, see s:wordUsageScore
+    for row in a:result
+        let key = row[0] . "\t" . row[1]
+        let usage = [row[2] * 1.0, row[3]]
+        if has_key(s:word_frequency, key)
+            let lastUsed = max([usage[1], s:word_frequency[key][1]])
+            let usageCount = s:wordUsageScore(usage, lastUsed) + s:wordUsageScore(s:word_frequency[key], lastUsed)
+            if usageCount > s:USAGE_COUNT_MAX
+                let usageCount = s:USAGE_COUNT_MAX * 1.0
             endif
-        endfor
+            let usage = [usageCount, lastUsed]
+        endif
+        let s:word_frequency[key] = usage
+    endfor
+    " imported, keep it as backup only
+    if filereadable(s:freq_file_path)
+        call rename(s:freq_file_path, s:freq_file_path . '.bak')
     endif
 endfunction
 
-function! s:recordWordUsage(key, word)
+" count of usage at time now, with decay applied
+function! s:wordUsageScore(usage, now)
+    if a:now <= a:usage[1]
+        return a:usage[0]
+    endif
+    return a:usage[0] * pow(0.5, (a:now - a:usage[1]) * 1.0 / s:USAGE_HALF_LIFE)
+endfunction
+
+" prevWord: optional, word committed right before, counted in the bigram table of the db
+function! s:recordWordUsage(key, word, ...)
+    call s:loadWordUsage()
     " Record word usage (key + word as unique identifier)
     let key = a:key . "\t" . a:word
-    if !has_key(s:word_frequency, key)
-        let s:word_frequency[key] = 0
+    let now = localtime()
+    let usageCount = s:wordUsageScore(get(s:word_frequency, key, [0.0, now]), now) + 1
+    if usageCount > s:USAGE_COUNT_MAX
+        let usageCount = s:USAGE_COUNT_MAX * 1.0
     endif
-    let s:word_frequency[key] += 1
+    let s:word_frequency[key] = [usageCount, now]
     call ZFVimIM_notifyHook('record_word_usage', [a:key, a:word])
     
-    " Save to file (limit frequency to prevent overflow)
-    if s:word_frequency[key] > 1000
-        let s:word_frequency[key] = 1000
+    " Update frequency, usage and bigram in database
+    call s:updateWordFrequencyInDb(a:key, a:word, 1, now, get(a:, 1, ''))
+endfunction
+
+" ============================================================
+" Bigram (previous word, word) counts for ranking the likely next word,
+" stored in the bigram table of the db (see misc/dbFunc.py), loaded once when first needed,
+" each pair is sent along with the frequency update of word, and written to db by batch
+"
+" {prevWord<tab>word : count}
+let s:word_bigram = {}
+let s:word_bigram_loaded = 0
+" same as DB_BIGRAM_COUNT_MAX in misc/dbFunc.py
+let s:BIGRAM_COUNT_MAX = 1000
+" bigram file saved by older versions, imported to the bigram table once
+let s:bigram_file_path = ''
+
+function! s:initWordBigram()
+    if empty(s:bigram_file_path)
+        let s:bigram_file_path = stdpath('data') . '/sbzr_nvim_im_word_bigram.txt'
+        if !isdirectory(stdpath('data'))
+            let s:bigram_file_path = expand('<sfile>:p:h:h') . '/word_bigram.txt'
+        endif
     endif
-    
-    " Update frequency in database
-    call s:updateWordFrequencyInDb(a:key, a:word, 1)
-    
-    " Auto-save frequency data (every 10 uses)
-    if s:word_frequency[key] % 10 == 0
-        call s:saveWordFrequency()
+endfunction
+
+function! s:loadWordBigram()
+    if s:word_bigram_loaded
+        return
+    endif
+    let s:word_bigram_loaded = 1
+    let usageDb = s:wordUsageDb()
+    if empty(usageDb)
+        return
+    endif
+    let importFile = filereadable(s:bigram_file_path) ? CygpathFix_absPath(s:bigram_file_path) : ''
+    if s:dbServerStart(usageDb['pluginDir'], usageDb['dbPath']) > 0
+                \ && s:dbServerRequest('bigram', {'importFile' : importFile}, function('s:loadWordBigramCallback'))
+        return
+    endif
+    " one-shot script if server not available
+    let pythonCmd = executable('python3') ? 'python3' : 'python'
+    let scriptPath = usageDb['pluginDir'] . '/misc/db_bigram.py'
+    if !executable(pythonCmd) || !filereadable(scriptPath)
+        return
+    endif
+    let lines = systemlist(pythonCmd . ' "' . CygpathFix_absPath(scriptPath) . '" "' . CygpathFix_absPath(usageDb['dbPath']) . '" "' . importFile . '"')
+    if v:shell_error != 0
+        return
+    endif
+    let result = []
+    for line in lines
+        let parts = split(line, "\t")
+        if len(parts) >= 3
+            call add(result, [parts[0], parts[1], str2nr(parts[2])])
+        endif
+    endfor
+    call s:loadWordBigramCallback(result, '')
+endfunction
+
+function! s:loadWordBigramCallback(result, error)
+    if type(a:result) != type([])
+        return
+    endif
+    " pairs recorded before the response are not in the result yet, add them up
+    for row in a:result
+        let pair = row[0] . "\t" . row[1]
+        let s:word_bigram[pair] = min([get(s:word_bigram, pair, 0) + row[2], s:BIGRAM_COUNT_MAX])
+    endfor
+    " imported, keep it as backup only
+    if filereadable(s:bigram_file_path)
+        call rename(s:bigram_file_path, s:bigram_file_path . '.bak')
     endif
 endfunction
 
-function! s:updateWordFrequencyInDb(key, word, increment)
+" in memory only, the db is updated by s:recordWordUsage
+function! s:recordWordBigram(prevWord, word)
+    if !g:ZFVimIM_bigram || empty(a:prevWord) || empty(a:word)
+        return
+    endif
+    call s:loadWordBigram()
+    let pair = a:prevWord . "\t" . a:word
+    let s:word_bigram[pair] = min([get(s:word_bigram, pair, 0) + 1, s:BIGRAM_COUNT_MAX])
+endfunction
+
+" how many times word was committed right after prevWord
+function! ZFVimIM_getWordBigram(prevWord, word)
+    call s:loadWordBigram()
+    return get(s:word_bigram, a:prevWord . "\t" . a:word, 0)
+endfunction
+
+" ============================================================
+" Long-lived dictionary server (misc/dbServer.py)
+" requests are one JSON object per line, see misc/dbServer.py
+let s:dbServerJob = -1
+let s:dbServerDbPath = ''
+let s:dbServerRequestId = 0
+let s:dbServerCallbacks = {}
+let s:dbServerStdoutPending = ''
+let s:dbServerFlushTimer = -1
+" milliseconds to wait for the server to exit, before it is killed
+let s:DB_SERVER_STOP_TIMEOUT = 3000
+" milliseconds to wait for the server to apply edits, before falling back to the one-shot scripts
+let s:DB_SERVER_EDIT_TIMEOUT = 5000
+
+" return job id, or -1 if server is not available
+function! s:dbServerStart(pluginDir, dbPath)
+    if !g:ZFVimIM_dbServer || !exists('*jobstart')
+        return -1
+    endif
+    if s:dbServerJob > 0
+        if s:dbServerDbPath ==# a:dbPath
+            return s:dbServerJob
+        endif
+        call s:dbServerStop()
+    endif
+    let pythonCmd = executable('python3') ? 'python3' : 'python'
+    if !executable(pythonCmd)
+        return -1
+    endif
+    let scriptPath = a:pluginDir . '/misc/dbServer.py'
+    if !filereadable(scriptPath)
+        return -1
+    endif
+    try
+        let job = jobstart([pythonCmd, CygpathFix_absPath(scriptPath), CygpathFix_absPath(a:dbPath)], {
+                    \   'on_stdout' : function('s:dbServerOnStdout'),
+                    \   'on_exit' : function('s:dbServerOnExit'),
+                    \ })
+    catch /.*/
+        let job = -1
+    endtry
+    if job <= 0
+        return -1
+    endif
+    let s:dbServerJob = job
+    let s:dbServerDbPath = a:dbPath
+    let s:dbServerRequestId = 0
+    let s:dbServerCallbacks = {}
+    let s:dbServerStdoutPending = ''
+    if g:ZFVimIM_dbServerFlushInterval > 0
+        let s:dbServerFlushTimer = timer_start(g:ZFVimIM_dbServerFlushInterval,
+                    \ function('s:dbServerFlushTimerCallback'), {'repeat' : -1})
+    endif
+    return job
+endfunction
+
+function! s:dbServerFlushTimerCallback(...)
+    call s:dbServerRequest('flush', {})
+endfunction
+
+function! s:dbServerStop()
+    if s:dbServerFlushTimer != -1
+        call timer_stop(s:dbServerFlushTimer)
+        let s:dbServerFlushTimer = -1
+    endif
+    if s:dbServerJob <= 0
+        return
+    endif
+    " let the server flush journal, commit and exit by itself,
+    " and wait for it, callers may replace the db file right after
+    let job = s:dbServerJob
+    let s:dbServerJob = -1
+    let s:dbServerDbPath = ''
+    silent! call chansend(job, json_encode({'method' : 'quit'}) . "\n")
+    silent! call chanclose(job, 'stdin')
+    if exists('*jobwait') && jobwait([job], s:DB_SERVER_STOP_TIMEOUT)[0] == -1
+        silent! call jobstop(job)
+        silent! call jobwait([job], s:DB_SERVER_STOP_TIMEOUT)
+    endif
+endfunction
+
+" callback: function(result, error), optional
+" return 1 if request sent
+function! s:dbServerRequest(method, params, ...)
+    if s:dbServerJob <= 0
+        return 0
+    endif
+    let s:dbServerRequestId += 1
+    let request = {
+                \   'id' : s:dbServerRequestId,
+                \   'method' : a:method,
+                \   'params' : a:params,
+                \ }
+    try
+        if chansend(s:dbServerJob, json_encode(request) . "\n") <= 0
+            return 0
+        endif
+    catch /.*/
+        return 0
+    endtry
+    if a:0 > 0
+        let s:dbServerCallbacks[s:dbServerRequestId] = a:1
+    endif
+    return 1
+endfunction
+
+function! s:dbServerOnStdout(jobId, data, event)
+    if empty(a:data)
+        return
+    endif
+    " data is split by newline, the last item is the incomplete line
+    let lines = copy(a:data)
+    let lines[0] = s:dbServerStdoutPending . lines[0]
+    let s:dbServerStdoutPending = remove(lines, -1)
+    for line in lines
+        if empty(line)
+            continue
+        endif
+        try
+            let response = json_decode(line)
+        catch /.*/
+            continue
+        endtry
+        let id = get(response, 'id', v:null)
+        if id is v:null || !has_key(s:dbServerCallbacks, id)
+            continue
+        endif
+        let Callback = remove(s:dbServerCallbacks, id)
+        try
+            call Callback(get(response, 'result', v:null), get(response, 'error', ''))
+        catch /.*/
+        endtry
+    endfor
+endfunction
+
+function! s:dbServerOnExit(jobId, code, event)
+    if a:jobId == s:dbServerJob
+        if s:dbServerFlushTimer != -1
+            call timer_stop(s:dbServerFlushTimer)
+            let s:dbServerFlushTimer = -1
+        endif
+        let s:dbServerJob = -1
+        let s:dbServerDbPath = ''
+    endif
+endfunction
+
+" segment key by the dictionary server (see misc/dbSentence.py),
+" only for the db the server is (or can be) opened for
+" return [[{'key', 'word'}, ...], ...], best first,
+" or v:null if server not available or no response within timeout (in milliseconds)
+function! ZFVimIM_dbServerSentence(db, key, count, timeout)
+    " the server may spend half of the time, the rest is for the round trip
+    let response = ZFVimIM_dbServerCall(get(get(a:db, 'implData', {}), 'dictPath', ''), 'sentence', {
+                \   'key' : a:key,
+                \   'count' : a:count,
+                \   'prev' : get(s:last_commit, 'word', ''),
+                \   'timeout' : a:timeout / 2,
+                \   'bigram' : g:ZFVimIM_bigram ? v:true : v:false,
+                \ }, a:timeout)
+    if response is v:null || !has_key(response, 'result') || type(response['result']) != type([])
+        return v:null
+    endif
+    let ret = []
+    for segments in response['result']
+        call add(ret, map(segments, "{'key' : v:val[0], 'word' : v:val[1]}"))
+    endfor
+    return ret
+endfunction
+
+" send a request to the dictionary server and wait for the response,
+" only for the db the server is (or can be) opened for, see misc/dbServer.py for methods
+" return {'result' : ...} or {'error' : '...'},
+" or v:null if server not available or no response within timeout (in milliseconds),
+" so that the caller can fall back to the one-shot scripts
+function! ZFVimIM_dbServerCall(dbPath, method, params, timeout)
+    if !exists('*wait')
+        return v:null
+    endif
+    if empty(a:dbPath) || (s:dbServerJob > 0 && s:dbServerDbPath !=# a:dbPath)
+        return v:null
+    endif
+    if s:dbServerJob <= 0
+        let pluginDir = stdpath('data') . '/lazy/sbzr.nvim.im'
+        let sfileDir = expand('<sfile>:p:h:h')
+        if isdirectory(sfileDir . '/dict')
+            let pluginDir = sfileDir
+        endif
+        if !filereadable(a:dbPath) || s:dbServerStart(pluginDir, a:dbPath) <= 0
+            return v:null
+        endif
+    endif
+    let response = {}
+    let sent = s:dbServerRequest(a:method, a:params,
+                \ {result, error -> extend(response, {'result' : result, 'error' : error})})
+    if !sent
+        return v:null
+    endif
+    let requestId = s:dbServerRequestId
+    if wait(a:timeout, {-> !empty(response)}, 1) != 0
+        " late response is dropped by s:dbServerOnStdout
+        if has_key(s:dbServerCallbacks, requestId)
+            call remove(s:dbServerCallbacks, requestId)
+        endif
+        return v:null
+    endif
+    if !empty(response['error'])
+        return {'error' : response['error']}
+    endif
+    return {'result' : response['result']}
+endfunction
+
+" usedTime: time the word is used at, optional, when the use should be counted in usage table
+" prevWord: word committed right before, optional, when the pair should be counted in bigram table
+function! s:updateWordFrequencyInDb(key, word, increment, ...)
     " Update word frequency in database
     " Get database file path
     let dictPath = ''
@@ -2779,24 +3188,44 @@ function! s:updateWordFrequencyInDb(key, word, increment)
         return
     endif
     
-    " Use Python to update frequency in database
-    let pythonCmd = executable('python3') ? 'python3' : 'python'
-    if !executable(pythonCmd)
-        return
-    endif
-    
-    " Get script path
-    let scriptPath = pluginDir . '/misc/db_update_frequency.py'
-    if !filereadable(scriptPath)
-        return
-    endif
-    
     " Execute update (silently, don't show errors)
     try
-        let scriptPathAbs = CygpathFix_absPath(scriptPath)
-        let dbPathAbs = CygpathFix_absPath(dbPath)
-        let cmd = pythonCmd . ' "' . scriptPathAbs . '" "' . dbPathAbs . '" "' . a:key . '" "' . a:word . '" ' . a:increment
-        let result = system(cmd)
+        " Prefer the long-lived server, fallback to one-shot script
+        let sent = 0
+        if s:dbServerStart(pluginDir, dbPath) > 0
+            let params = {
+                        \   'key' : a:key,
+                        \   'word' : a:word,
+                        \   'increment' : a:increment,
+                        \ }
+            if a:0 > 0
+                let params['time'] = a:1
+            endif
+            if a:0 > 1 && !empty(a:2)
+                let params['prev'] = a:2
+            endif
+            let sent = s:dbServerRequest('frequency', params)
+        endif
+        if !sent
+            let pythonCmd = executable('python3') ? 'python3' : 'python'
+            if !executable(pythonCmd)
+                return
+            endif
+            let scriptPath = pluginDir . '/misc/db_update_frequency.py'
+            if !filereadable(scriptPath)
+                return
+            endif
+            let scriptPathAbs = CygpathFix_absPath(scriptPath)
+            let dbPathAbs = CygpathFix_absPath(dbPath)
+            let cmd = pythonCmd . ' "' . scriptPathAbs . '" "' . dbPathAbs . '" "' . a:key . '" "' . a:word . '" ' . a:increment
+            if a:0 > 0
+                let cmd .= ' ' . a:1
+                if a:0 > 1 && !empty(a:2)
+                    let cmd .= ' "' . a:2 . '"'
+                endif
+            endif
+            let result = system(cmd)
+        endif
         " Update in-memory database if loaded
         if exists('g:ZFVimIM_db') && !empty(g:ZFVimIM_db)
             for db in g:ZFVimIM_db
@@ -2815,51 +3244,30 @@ function! s:updateWordFrequencyInDb(key, word, increment)
     endtry
 endfunction
 
-function! s:saveWordFrequency()
-    " Save frequency data to file
-    if empty(s:freq_file_path)
-        return
-    endif
-    
-    let lines = []
-    for key in keys(s:word_frequency)
-        let freq = s:word_frequency[key]
-        if freq > 0
-            call add(lines, key . "\t" . freq)
-        endif
-    endfor
-    
-    " Sort by frequency (descending) and keep top 10000 entries
-    call sort(lines, function('s:sortFreqDesc'))
-    if len(lines) > 10000
-        let lines = lines[0:9999]
-    endif
-    
-    call writefile(lines, s:freq_file_path)
-endfunction
-
-function! s:sortFreqDesc(line1, line2)
-    let parts1 = split(a:line1, "\t")
-    let parts2 = split(a:line2, "\t")
-    let freq1 = len(parts1) >= 3 ? str2nr(parts1[2]) : 0
-    let freq2 = len(parts2) >= 3 ? str2nr(parts2[2]) : 0
-    return freq2 - freq1
-endfunction
-
 function! s:getWordFrequency(key, word)
     " Get word frequency (0 if not found)
-    let key = a:key . "\t" . a:word
-    return get(s:word_frequency, key, 0)
+    call s:loadWordUsage()
+    let usage = get(s:word_frequency, a:key . "\t" . a:word, [])
+    return empty(usage) ? 0 : s:wordUsageScore(usage, localtime())
 endfunction
 
 " Global function to get word frequency (for use in other files)
 function! ZFVimIM_getWordFrequency(key, word)
     let override = ZFVimIM_callHookResult('word_frequency_override', [a:key, a:word])
     if override isnot# v:null
-        return override
+        let freq = override
+    else
+        let freq = s:getWordFrequency(a:key, a:word)
     endif
-    let keyWord = a:key . "\t" . a:word
-    return get(s:word_frequency, keyWord, 0)
+    if g:ZFVimIM_bigram && !empty(s:last_commit)
+        let bigram = ZFVimIM_getWordBigram(s:last_commit['word'], a:word)
+        " bounded like the bigram score of misc/dbSentence.py,
+        " so that a single co-occurrence is a nudge, not a jump to the top
+        if bigram > 0
+            let freq += g:ZFVimIM_bigramWeight * log(1 + bigram)
+        endif
+    endif
+    return freq
 endfunction
 
 " ============================================================
@@ -3275,13 +3683,15 @@ endfunction
 
 " Initialize word frequency on plugin load (after init)
 call s:initWordFrequency()
+call s:initWordBigram()
 
 " Save frequency on exit
 augroup ZFVimIM_frequency
     autocmd!
-    autocmd VimLeavePre * call s:saveWordFrequency()
     " Also save pending dictionaries on exit
     autocmd VimLeavePre * call s:savePendingDictsSync()
+    " Let the dictionary server commit and exit
+    autocmd VimLeavePre * call s:dbServerStop()
 augroup END
 
 " Cleanup dictionary on exit
@@ -3733,6 +4143,8 @@ function! ZFVimIM_importTxtToDb(...)
         let yamlPathAbs = CygpathFix_absPath(yamlPath)
         let dbPathAbs = CygpathFix_absPath(dbPath)
         
+        " the db file is replaced, the server must reopen it
+        call s:dbServerStop()
         let cmdList = [pythonCmd, scriptPathAbs, yamlPathAbs, dbPathAbs]
         let result = system(join(cmdList, ' '))
         
@@ -4400,7 +4812,7 @@ function! s:ZFVimIM_processBatchAdd()
         if isdirectory(sfileDir . '/misc')
             let pluginDir = sfileDir
         endif
-        let scriptPath = pluginDir . '/misc/db_add_word.py'
+        let scriptPath = pluginDir . '/misc/db_batch_edit.py'
         if !filereadable(scriptPath)
             echom '[sbzr.nvim.im] 错误: 脚本文件不存在: ' . scriptPath
             setlocal nomodified
@@ -4412,16 +4824,35 @@ function! s:ZFVimIM_processBatchAdd()
         let addedCount = 0
         let failedCount = 0
         
+        " All entries in one transaction, by the dictionary server if available,
+        " or by one process of the batch edit script, one JSON result per line
+        let edits = []
         for entry in newEntries
-            let cmd = pythonCmd . ' "' . scriptPath . '" "' . dbPath . '" "' . entry['encoding'] . '" "' . entry['word'] . '"'
-            let result = system(cmd)
-            let result = substitute(result, '[\r\n]', '', 'g')
-            if result ==# 'OK' || result ==# 'EXISTS'
+            call add(edits, {'action': 'add', 'key': entry['encoding'], 'word': entry['word']})
+        endfor
+        let response = ZFVimIM_dbServerCall(dbPath, 'edit', {'edits' : edits}, s:DB_SERVER_EDIT_TIMEOUT)
+        if response isnot v:null
+            let results = get(response, 'result', [])
+        else
+            let cmd = pythonCmd . ' "' . scriptPath . '" "' . dbPath . '"'
+            let resultLines = systemlist(cmd, map(copy(edits), 'json_encode(v:val)'))
+            if v:shell_error != 0
+                let resultLines = []
+            endif
+            let results = []
+            for line in resultLines
+                try
+                    call add(results, json_decode(line))
+                catch
+                endtry
+            endfor
+        endif
+        for result in results
+            if type(result) == v:t_dict && has_key(result, 'result')
                 let addedCount += 1
-            else
-                let failedCount += 1
             endif
         endfor
+        let failedCount = len(newEntries) - addedCount
         
         echom '[sbzr.nvim.im] ✅ 已同步 ' . addedCount . ' 个条目到数据库'
         if failedCount > 0
@@ -4701,6 +5132,8 @@ function! s:ZFVimIM_processEditDict()
     let tmpYamlPathAbs = CygpathFix_absPath(tmpYamlPath)
     let dbPathAbs = CygpathFix_absPath(dbPath)
     let cmd = pythonCmd . ' "' . scriptPathAbs . '" "' . tmpYamlPathAbs . '" "' . dbPathAbs . '"'
+    " the db file is replaced, the server must reopen it
+    call s:dbServerStop()
     let result = system(cmd)
     
     " Clean up temporary file
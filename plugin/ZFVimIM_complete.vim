@@ -41,6 +41,7 @@ function! s:complete_match_alias(ret, key, db, matchLimit)
     if len(a:key) != 4 || a:matchLimit <= 0
         return 0
     endif
+    call ZFVimIM_DEBUG_profileStart('aliasMatch')
     if !exists('s:alias_cache')
         let s:alias_cache = {}
         let s:alias_cache_keys = []
@@ -69,6 +70,7 @@ function! s:complete_match_alias(ret, key, db, matchLimit)
             break
         endif
     endfor
+    call ZFVimIM_DEBUG_profileStop()
     return added
 endfunction
 
@@ -77,6 +79,12 @@ function! s:buildAliasMatches(aliasKey, db)
     if empty(bucket)
         return []
     endif
+
+    " alias index exported by dbLoad.py, no search limit
+    let matches = ZFVimIM_dbAliasSearch(a:db, a:aliasKey)
+    if type(matches) == type([])
+        return matches
+    endif
     let matches = []
     
     " Performance optimization: limit search range for large buckets
@@ -336,6 +344,38 @@ function! s:complete_sentence(ret, key, option, db)
         return
     endif
 
+    " long key: best segmentations by the dictionary server,
+    " fallback to greedy match below if not available in time
+    if g:ZFVimIM_sentenceEngineMinLen > 0
+                \ && len(a:key) >= g:ZFVimIM_sentenceEngineMinLen
+                \ && exists('*ZFVimIM_dbServerSentence')
+        let segmentsList = ZFVimIM_dbServerSentence(a:db, a:key,
+                    \ g:ZFVimIM_sentenceEngineCount,
+                    \ g:ZFVimIM_sentenceEngineTimeout)
+        if type(segmentsList) == type([])
+            for segments in segmentsList
+                if len(segments) <= 1
+                    continue
+                endif
+                let sentence = {
+                            \   'dbId' : a:db['dbId'],
+                            \   'len' : 0,
+                            \   'key' : '',
+                            \   'word' : '',
+                            \   'type' : 'sentence',
+                            \   'sentenceList' : segments,
+                            \ }
+                for segment in segments
+                    let sentence['len'] += len(segment['key'])
+                    let sentence['key'] .= segment['key']
+                    let sentence['word'] .= segment['word']
+                endfor
+                call add(a:ret, sentence)
+            endfor
+            return
+        endif
+    endif
+
     let sentence = {
                 \   'dbId' : a:db['dbId'],
                 \   'len' : 0,
@@ -480,10 +520,48 @@ function! s:complete_predict(ret, key, option, db)
         endif
         " try to find
         let subKey = strpart(a:key, 0, p)
+
+        " words of subKey itself, then best completions of subKey,
+        " then the rest in order of key as below, {key<tab>word : 1} of those already added
+        let added = {}
+        let topList = ZFVimIM_dbTopSearch(a:db, subKey)
+        if type(topList) == type([])
+            let exactIndex = ZFVimIM_dbSearch(a:db, a:key[0],
+                        \ '^' . subKey . g:ZFVimIM_KEY_S_MAIN,
+                        \ 0)
+            if exactIndex < 0 && empty(topList)
+                let p -= 1
+                continue
+            endif
+            if exactIndex >= 0
+                let dbItem = ZFVimIM_dbItemDecode(a:db['dbMap'][a:key[0]][exactIndex])
+                for i in range(len(dbItem['wordList']))
+                    if len(a:ret) >= predictLimit
+                        break
+                    endif
+                    call add(a:ret, s:newCandidate(a:db['dbId'], subKey, dbItem['wordList'][i], p, 'predict'))
+                    let added[subKey . "\t" . dbItem['wordList'][i]] = 1
+                endfor
+            endif
+            for item in topList
+                if len(a:ret) >= predictLimit
+                    break
+                endif
+                call add(a:ret, s:newCandidate(a:db['dbId'], item['key'], item['word'], p, 'predict'))
+                let added[item['key'] . "\t" . item['word']] = 1
+            endfor
+            if len(a:ret) >= predictLimit
+                break
+            endif
+        endif
+
         let subMatchIndex = ZFVimIM_dbSearch(a:db, a:key[0],
                     \ '^' . subKey,
                     \ 0)
         if subMatchIndex < 0
+            if !empty(added)
+                break
+            endif
             let p -= 1
             continue
         endif
@@ -492,7 +570,9 @@ function! s:complete_predict(ret, key, option, db)
         " found things to predict
         let wordIndex = 0
         while len(a:ret) < predictLimit
-            call add(a:ret, s:newCandidate(a:db['dbId'], dbItem['key'], dbItem['wordList'][wordIndex], p, 'predict'))
+            if !has_key(added, dbItem['key'] . "\t" . dbItem['wordList'][wordIndex])
+                call add(a:ret, s:newCandidate(a:db['dbId'], dbItem['key'], dbItem['wordList'][wordIndex], p, 'predict'))
+            endif
             let wordIndex += 1
             if wordIndex < len(dbItem['wordList'])
                 continue
@@ -988,12 +1068,14 @@ function! s:mergeResult(data, key, option, db)
     endif
 
     " Sort match list with exact matches prioritized and length-aware ordering
+    call ZFVimIM_DEBUG_profileStart('sort')
     call s:sortMatchResults(matchRet, a:key)
     call s:sortByFrequencyPriority(sentenceRet)
     call s:sortByFrequencyPriority(subMatchLongestRet)
     call s:sortByFrequencyPriority(subMatchRet)
     call s:sortByFrequencyPriority(predictRet)
     call s:sortByFrequencyPriority(tailRet)
+    call ZFVimIM_DEBUG_profileStop()
 
     " order:
     "   exact match
@@ -360,14 +360,24 @@ function! s:sbzrHintItems(key, limit) abort
     let bucket = db['dbMap'][c]
     let limit = a:limit > 0 ? a:limit : 6
     let ret = []
-    let idx = ZFVimIM_dbSearch(db, c, '^' . a:key, 0)
-    if idx < 0
-        return []
-    endif
     let bestWord = ''
     let bestKey = ''
     let bestLen = 0
-    while idx < len(bucket) && len(ret) < limit
+    " completions are ordered by word length first, the first one is the shortest
+    let topList = ZFVimIM_dbTopSearch(db, a:key)
+    let idx = -1
+    if type(topList) == type([])
+        if !empty(topList)
+            let bestWord = topList[0]['word']
+            let bestKey = topList[0]['key']
+        endif
+    else
+        let idx = ZFVimIM_dbSearch(db, c, '^' . a:key, 0)
+        if idx < 0
+            return []
+        endif
+    endif
+    while idx >= 0 && idx < len(bucket) && len(ret) < limit
         let item = ZFVimIM_dbItemDecode(bucket[idx])
         let k = get(item, 'key', '')
         if k !~# '^' . a:key
@@ -422,27 +432,7 @@ function! s:sbzr_hasLongerKey(prefix) abort
     if empty(db) || !has_key(db, 'dbMap')
         return 0
     endif
-    let c = a:prefix[0]
-    if !has_key(db['dbMap'], c)
-        return 0
-    endif
-    let bucket = db['dbMap'][c]
-    let idx = ZFVimIM_dbSearch(db, c, '^' . a:prefix, 0)
-    if idx < 0
-        return 0
-    endif
-    while idx < len(bucket)
-        let item = ZFVimIM_dbItemDecode(bucket[idx])
-        let k = get(item, 'key', '')
-        if k !~# '^' . a:prefix
-            break
-        endif
-        if k !=# a:prefix
-            return 1
-        endif
-        let idx += 1
-    endwhile
-    return 0
+    return ZFVimIM_dbHasLongerKey(db, a:prefix)
 endfunction
 
 function! s:sbzr_hasExactKey(key) abort